@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, List, Literal, Optional, Tuple
+
+import orjson
+from fastapi import APIRouter, Cookie, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+
+from backend.app.api.v1.route_response import route_response_content, simplify_for_output
+from backend.app.api.v1.schemas import BatchItemResult, BatchRouteRequest, RouteFormat
+from backend.app.services.http_clients import UpstreamClients, get_upstream_clients
+from backend.app.services.metrics import stage
+from backend.app.services.resilience import request_deadline
+from backend.app.services.route_pipeline import PlannedRoute, plan_personal_route, plan_tourist_route, transcribe
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+router = APIRouter()
+
+_PLANNERS = {"personal": plan_personal_route, "tourist": plan_tourist_route}
+
+# (item id, planning of the item from the transcript or the audio on)
+BatchJob = Tuple[Optional[str], Callable[[], Awaitable[PlannedRoute]]]
+
+
+def _check_size(items: int) -> None:
+    if not items:
+        raise HTTPException(status_code=400, detail="The batch is empty.")
+    if items > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.batch_max_items} items per batch, got {items}."
+        )
+
+
+async def _run_item(
+    index: int,
+    item_id: Optional[str],
+    plan: Callable[[], Awaitable[PlannedRoute]],
+    limit: asyncio.Semaphore,
+    route_format: RouteFormat,
+    tolerance: Optional[float],
+    zoom: Optional[float],
+) -> dict:
+    """Plans one item under its own deadline; a failure becomes the item's result line."""
+    async with limit:
+        try:
+            with request_deadline(settings.request_deadline):
+                planned = await plan()
+            with stage("serialization"):
+                route_coords = simplify_for_output(
+                    planned.route_coords, planned.points_to_route, tolerance=tolerance, zoom=zoom
+                )
+                result = route_response_content(
+                    planned.route_type, planned.transcript, route_coords, planned.points_to_route,
+                    route_format, planned.schedule,
+                )
+            return {"index": index, "id": item_id, "status_code": 200, "result": result}
+        except HTTPException as e:
+            return {"index": index, "id": item_id, "status_code": e.status_code, "detail": str(e.detail)}
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {str(e)}", exc_info=True)
+            return {"index": index, "id": item_id, "status_code": 500, "detail": str(e)}
+
+
+async def _batch_lines(
+    jobs: List[BatchJob],
+    route_format: RouteFormat,
+    tolerance: Optional[float],
+    zoom: Optional[float],
+) -> AsyncIterator[bytes]:
+    """
+    Plans up to `batch_item_concurrency` items at once and yields a BatchItemResult line per
+    item as soon as it is done. The items share the geocoding, route and crew caches, and
+    their 2GIS requests count against the global `gis_max_concurrent_requests` bound.
+    """
+    limit = asyncio.Semaphore(settings.batch_item_concurrency)
+    tasks = [
+        asyncio.create_task(_run_item(index, item_id, plan, limit, route_format, tolerance, zoom))
+        for index, (item_id, plan) in enumerate(jobs)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield orjson.dumps(await next_done, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+    finally:
+        # The client went away: stop planning the items nobody will read.
+        for task in tasks:
+            task.cancel()
+
+
+def _ndjson_response(lines: AsyncIterator[bytes]) -> StreamingResponse:
+    return StreamingResponse(
+        lines,
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/batch-route",
+    response_class=StreamingResponse,
+    responses={200: {"model": BatchItemResult, "content": {"application/x-ndjson": {}}}},
+)
+async def batch_route_endpoint(
+    request: BatchRouteRequest,
+    user_location: Optional[str] = Cookie(None),
+    route_format: RouteFormat = Query("points"),
+    zoom: Optional[float] = Query(None, ge=0, le=22),
+    tolerance: Optional[float] = Query(None, ge=0),
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Plans many itineraries from transcripts, each with the planner of its `mode`. Streams one
+    NDJSON line per item (BatchItemResult) in completion order; a failed item reports its
+    status and detail without failing the batch. The route formatting options apply to every item.
+    """
+    _check_size(len(request.items))
+
+    def job(transcript: str, mode: str) -> Callable[[], Awaitable[PlannedRoute]]:
+        return lambda: _PLANNERS[mode](transcript, user_location, clients)
+
+    jobs = [(item.id, job(item.transcript, item.mode)) for item in request.items]
+    return _ndjson_response(_batch_lines(jobs, route_format, tolerance, zoom))
+
+
+@router.post(
+    "/batch-route/audio",
+    response_class=StreamingResponse,
+    responses={200: {"model": BatchItemResult, "content": {"application/x-ndjson": {}}}},
+)
+async def batch_route_audio_endpoint(
+    audio: List[UploadFile] = File(...),
+    mode: Literal["personal", "tourist"] = Form("personal"),
+    user_location: Optional[str] = Cookie(None),
+    route_format: RouteFormat = Query("points"),
+    zoom: Optional[float] = Query(None, ge=0, le=22),
+    tolerance: Optional[float] = Query(None, ge=0),
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Like /batch-route for recordings: every `audio` file is transcribed and planned with the
+    `mode` planner. The file names are the item ids of the result lines.
+    """
+    _check_size(len(audio))
+    planner = _PLANNERS[mode]
+
+    def job(audio_bytes: bytes, content_type: Optional[str]) -> Callable[[], Awaitable[PlannedRoute]]:
+        async def plan() -> PlannedRoute:
+            transcript = await transcribe(audio_bytes, content_type, clients)
+            return await planner(transcript, user_location, clients)
+        return plan
+
+    jobs = [(file.filename, job(await file.read(), file.content_type)) for file in audio]
+    return _ndjson_response(_batch_lines(jobs, route_format, tolerance, zoom))
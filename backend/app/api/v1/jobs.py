@@ -0,0 +1,31 @@
+import orjson
+from fastapi import APIRouter, HTTPException, Path, Query, Response
+
+from backend.app.api.v1.schemas import JobStatusResponse
+from backend.app.services.job_queue import job_queue
+from backend.app.settings.config import API_Settings
+
+settings = API_Settings()
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(
+    job_id: str = Path(...),
+    wait: float = Query(0, ge=0, description="Long-poll: seconds to wait for the job to finish"),
+):
+    """
+    Returns the status of a background job, and its result once it is done. With `wait`
+    the request is held until the job finishes or `wait` (at most `job_max_wait`) seconds pass.
+    """
+    job = await job_queue.wait(job_id, min(wait, settings.job_max_wait))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+
+    content = {"job_id": job.id, "status": job.status, "attempts": job.attempts, "status_url": f"/api/jobs/{job.id}"}
+    if job.status == "done":
+        # The result is stored as the serialized response body; embed it without parsing it again.
+        content["result"] = orjson.Fragment(job.result)
+    elif job.status == "failed":
+        content.update(status_code=job.status_code, detail=job.detail)
+    return Response(orjson.dumps(content), media_type="application/json")
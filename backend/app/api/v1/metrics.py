@@ -0,0 +1,84 @@
+from typing import Iterator
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+from backend.app.services.crew_executor import crew_executor
+from backend.app.services.crew_results import crew_result_cache
+from backend.app.services.fast_extract import extraction_paths
+from backend.app.services.geocoding import geocode_cache
+from backend.app.services.resilience import UPSTREAMS
+from backend.app.services.routing import route_cache
+
+router = APIRouter()
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _histogram(family: HistogramMetricFamily, labels: list, data: dict) -> None:
+    """Adds a metrics.LatencyHistogram snapshot (cumulative buckets) to a histogram family."""
+    buckets = list(data["buckets"].items()) + [("+Inf", data["count"])]
+    family.add_metric(labels, buckets, data["sum"])
+
+
+class BackendStatsCollector(Collector):
+    """
+    Exports the counters the caches, the crew pool and the upstream wrappers already keep
+    (the ones behind /api/stats). They are read at scrape time, so the hot path only
+    pays for its plain integer increments.
+    """
+
+    def collect(self) -> Iterator[Metric]:
+        lookups = CounterMetricFamily("voice_route_cache_lookups", "Cache lookups by result", labels=["cache", "result"])
+        evictions = CounterMetricFamily("voice_route_cache_evictions", "Cache entries evicted", labels=["cache"])
+        size = GaugeMetricFamily("voice_route_cache_size", "Entries in the in-memory cache tier", labels=["cache"])
+        for name, cache in (("geocode", geocode_cache), ("route", route_cache), ("crew", crew_result_cache)):
+            stats = cache.stats()
+            for result in ("hits", "negative_hits", "stale_hits", "misses"):
+                lookups.add_metric([name, result], stats[result])
+            if "fuzzy_hits" in stats:
+                lookups.add_metric([name, "fuzzy_hits"], stats["fuzzy_hits"])
+            evictions.add_metric([name], stats["evictions"])
+            size.add_metric([name], stats["size"])
+        yield from (lookups, evictions, size)
+
+        pool = crew_executor.stats()
+        yield GaugeMetricFamily("voice_route_crew_in_flight", "Crew kickoffs running", value=pool["in_flight"])
+        yield GaugeMetricFamily("voice_route_crew_queue_depth", "Crew kickoffs waiting for a slot", value=pool["queue_depth"])
+        kickoffs = CounterMetricFamily("voice_route_crew_kickoffs", "Crew kickoffs by outcome", labels=["outcome"])
+        for outcome in ("completed", "failed", "rejected"):
+            kickoffs.add_metric([outcome], pool[outcome])
+        yield kickoffs
+
+        paths = HistogramMetricFamily(
+            "voice_route_extraction_seconds", "Itinerary extraction time by path", labels=["path"]
+        )
+        for path, data in extraction_paths.as_dict().items():
+            _histogram(paths, [path], data)
+        yield paths
+
+        events = CounterMetricFamily(
+            "voice_route_upstream_events", "Upstream retries, hedged requests and breaker rejections",
+            labels=["upstream", "event"],
+        )
+        breaker = GaugeMetricFamily(
+            "voice_route_upstream_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+            labels=["upstream"],
+        )
+        for upstream in UPSTREAMS:
+            stats = upstream.stats()
+            for event in ("calls", "failures", "retries", "hedges", "hedge_wins", "rejected"):
+                events.add_metric([upstream.name, event], stats[event])
+            breaker.add_metric([upstream.name], _BREAKER_STATES[stats["breaker"]])
+        yield from (events, breaker)
+
+
+REGISTRY.register(BackendStatsCollector())
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of the pipeline stage, upstream, cache and LLM token metrics."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,83 @@
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import orjson
+from fastapi import Response
+
+from backend.app.api.v1.schemas import RouteFormat
+from backend.app.services.geometry import encode_polyline, simplify_route, zoom_tolerance
+from backend.app.settings.config import API_Settings
+
+settings = API_Settings()
+
+
+def simplify_for_output(
+    route_coords: np.ndarray,
+    points_to_route: List[List[float]],
+    tolerance: Optional[float] = None,
+    zoom: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Applies the optional simplification requested by the client: an explicit `tolerance`
+    in meters, or a map `zoom` converted to `route_simplify_pixel_tolerance` pixels.
+    The route vertices at the pivot points are always kept.
+    """
+    if tolerance is None and zoom is not None and len(route_coords):
+        tolerance = zoom_tolerance(zoom, float(route_coords[:, 1].mean()), settings.route_simplify_pixel_tolerance)
+    if not tolerance:
+        return route_coords
+    return simplify_route(route_coords, tolerance, keep_points=points_to_route)
+
+
+def route_response_content(
+    route_type: str,
+    transcript: str,
+    route_coords: np.ndarray,
+    points_to_route: List[List[float]],
+    route_format: RouteFormat = "points",
+    schedule: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    The response body as a dict. The default "points" format is the SttRouteResponse with a
+    {"coord": [lon, lat]} object per point; in the compact formats ("flat", "polyline") the
+    route stays a NumPy array or a string, to be serialized with orjson.
+    """
+    pivot_route_points = [{"coord": c} for c in points_to_route]
+
+    if route_format == "points":
+        return {
+            "route_type": route_type,
+            "transcript": transcript,
+            "route": [{"coord": c} for c in route_coords.tolist()],
+            "pivot_route_points": pivot_route_points,
+            "schedule": schedule
+        }
+
+    route = route_coords.ravel() if route_format == "flat" else encode_polyline(route_coords)
+    return {
+        "route_type": route_type,
+        "transcript": transcript,
+        "route_format": route_format,
+        "route": route,
+        "pivot_route_points": pivot_route_points,
+        "schedule": schedule
+    }
+
+
+def build_route_response(
+    route_type: str,
+    transcript: str,
+    route_coords: np.ndarray,
+    points_to_route: List[List[float]],
+    route_format: RouteFormat = "points",
+    schedule: Optional[Dict[str, Any]] = None,
+) -> Union[dict, Response]:
+    """
+    Formats the route for the frontend. The "points" format is returned as a dict for the
+    SttRouteResponse model; the compact formats ("flat", "polyline") are serialized straight
+    from the NumPy array with orjson, without per-point validation.
+    """
+    content = route_response_content(route_type, transcript, route_coords, points_to_route, route_format, schedule)
+    if route_format == "points":
+        return content
+    return Response(orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY), media_type="application/json")
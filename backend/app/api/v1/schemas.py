@@ -1,15 +1,137 @@
-from typing import List
+from typing import List, Literal, Optional, Union
 from pydantic import BaseModel
 
 class RoutePoint(BaseModel):
     coord: List[float]
 
+class ScheduledStop(BaseModel):
+    """A stop of the personal itinerary with its time window and estimated times ("HH:MM")."""
+    name: str
+    requested_time: Optional[str] = None
+    window_start: Optional[str] = None
+    window_end: Optional[str] = None
+    eta: str
+    departure: str
+    wait_minutes: int
+    late_minutes: int
+    on_time: bool
+
+class ItinerarySchedule(BaseModel):
+    start_time: str
+    stops: List[ScheduledStop]
+    total_travel_minutes: int
+    feasible: bool
+    unparsed_times: List[str] = []
+
 class SttRouteResponse(BaseModel):
     route_type: str
     transcript: str
     route: List[RoutePoint]
     pivot_route_points: List[RoutePoint]
+    schedule: Optional[ItinerarySchedule] = None
     
 class UserLocation(BaseModel):
     lat: float
-    lon: float
\ No newline at end of file
+    lon: float
+
+# Events of the streaming /stt-route/stream and /stt-route/ws endpoints, in the order they are emitted.
+
+class PartialTranscriptEvent(BaseModel):
+    """/stt-route/ws only: the transcript so far while the user speaks; `stable` once an utterance ended."""
+    event: Literal["partial_transcript"] = "partial_transcript"
+    transcript: str
+    stable: bool
+
+class TranscriptEvent(BaseModel):
+    event: Literal["transcript"] = "transcript"
+    transcript: str
+
+class LocationsEvent(BaseModel):
+    event: Literal["locations"] = "locations"
+    current_location: str
+    locations: List[str]
+
+class PivotPointEvent(BaseModel):
+    """A geocoded itinerary stop. Stops may arrive out of order, `index` is their position."""
+    event: Literal["pivot_point"] = "pivot_point"
+    index: int
+    name: str
+    point: RoutePoint
+
+class ScheduleEvent(BaseModel):
+    """Visiting order and ETAs, emitted after geocoding; pivot points of `complete` follow this order."""
+    event: Literal["schedule"] = "schedule"
+    schedule: ItinerarySchedule
+
+class RouteChunkEvent(BaseModel):
+    """A consecutive slice of the route geometry, `seq` starts at 0."""
+    event: Literal["route_chunk"] = "route_chunk"
+    seq: int
+    route: List[RoutePoint]
+
+class RouteCompleteEvent(BaseModel):
+    """
+    Final event. Together with the route chunks it carries the same data as SttRouteResponse;
+    the geometry itself is not repeated, `route_points` is its total length.
+    """
+    event: Literal["complete"] = "complete"
+    route_type: str
+    transcript: str
+    pivot_route_points: List[RoutePoint]
+    route_points: int
+
+class ErrorEvent(BaseModel):
+    event: Literal["error"] = "error"
+    status_code: int
+    detail: str
+
+# Opt-in compact route geometry: "flat" is [lon0, lat0, lon1, lat1, ...],
+# "polyline" is a Google Encoded Polyline (precision 5, lat/lon order).
+RouteFormat = Literal["points", "flat", "polyline"]
+
+class CompactSttRouteResponse(BaseModel):
+    route_type: str
+    transcript: str
+    route_format: RouteFormat
+    route: Union[List[float], str]
+    pivot_route_points: List[RoutePoint]
+    schedule: Optional[ItinerarySchedule] = None
+
+# Batch route API (/batch-route, /batch-route/audio)
+
+class BatchRouteItem(BaseModel):
+    """One itinerary of a batch: a transcript for the personal (/stt-route) or tourist (/stt-route-tourist) planner."""
+    id: Optional[str] = None
+    transcript: str
+    mode: Literal["personal", "tourist"] = "personal"
+
+class BatchRouteRequest(BaseModel):
+    items: List[BatchRouteItem]
+
+class BatchItemResult(BaseModel):
+    """
+    An NDJSON line of the batch response, one per item in completion order. `index` is the
+    position of the item in the request; a failed item has `status_code` and `detail` instead of `result`.
+    """
+    index: int
+    id: Optional[str] = None
+    status_code: int
+    result: Optional[Union[SttRouteResponse, CompactSttRouteResponse]] = None
+    detail: Optional[str] = None
+
+# Background jobs (/stt-route-tourist?async=1, /jobs/{job_id})
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+class JobStatusResponse(BaseModel):
+    """
+    A background job. `result` is the response the synchronous endpoint would have returned
+    once the job is done; a failed job has the `status_code` and `detail` of that error instead.
+    """
+    job_id: str
+    status: JobStatus
+    attempts: int = 0
+    status_url: str
+    result: Optional[Union[SttRouteResponse, CompactSttRouteResponse]] = None
+    status_code: Optional[int] = None
+    detail: Optional[str] = None
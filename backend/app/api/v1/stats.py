@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+
+from backend.app.services.crew_executor import crew_executor
+from backend.app.services.crew_results import crew_result_cache
+from backend.app.services.fast_extract import extraction_paths
+from backend.app.services.geocoding import geocode_cache
+from backend.app.services.job_queue import job_queue
+from backend.app.services.poi_index import poi_index_stats
+from backend.app.services.resilience import upstream_stats
+from backend.app.services.routing import route_cache
+from backend.app.services.singleflight import singleflight_stats
+
+router = APIRouter()
+
+@router.get("/stats")
+def get_stats():
+    """
+    Returns runtime counters of the backend caches (hits, misses, evictions, hit rate)
+    and of the crew execution pool (in-flight, queue depth, rejections), plus
+    how many extractions took the rule-based fast path vs. the LLM crew, and per
+    upstream API the retries, hedged requests, circuit breaker state and latencies,
+    how many geocoding, routing and crew calls joined an identical call in flight,
+    how many generic places the local POI index answered,
+    and the background job counts by status.
+    """
+    return {
+        "geocode_cache": geocode_cache.stats(),
+        "route_cache": route_cache.stats(),
+        "crew_cache": crew_result_cache.stats(),
+        "crew_pool": crew_executor.stats(),
+        "extraction_paths": extraction_paths.as_dict(),
+        "poi_index": poi_index_stats(),
+        "upstreams": upstream_stats(),
+        "singleflight": singleflight_stats(),
+        "jobs": job_queue.stats(),
+    }
@@ -1,161 +1,286 @@
-import os
-import tempfile
+import asyncio
+import json
+import time
 import uuid
-import shutil
-from fastapi import APIRouter, UploadFile, File, Cookie, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Cookie, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Awaitable, List, Optional, Union
 
 from pydantic import BaseModel
 
-from app.services.stt import stt
-from app.services.geocoding import geocode_locations
-from app.services.routing import get_2gis_route
+from backend.app.services.geocoding import geocode_locations
+from backend.app.services.routing import get_2gis_route
 from fastapi import APIRouter, UploadFile, File
 
-from route_planner_agent.crew import RoutePlannerAgent # type:ignore
-from app.api.v1.schemas import SttRouteResponse
+from backend.app.api.v1.route_response import build_route_response, simplify_for_output
+from backend.app.api.v1.schemas import (
+    CompactSttRouteResponse,
+    ErrorEvent,
+    LocationsEvent,
+    PartialTranscriptEvent,
+    PivotPointEvent,
+    RouteChunkEvent,
+    RouteCompleteEvent,
+    RouteFormat,
+    RoutePoint,
+    ScheduleEvent,
+    SttRouteResponse,
+    TranscriptEvent,
+)
+from backend.app.services.audio import stream_to_ogg_opus
+from backend.app.services.metrics import STAGE_SECONDS, current_endpoint, request_metrics, stage
+from backend.app.services.resilience import request_deadline
+from backend.app.services.route_pipeline import (
+    extract_locations,
+    geocode_prefetch,
+    plan_itinerary,
+    plan_personal_route,
+    schedule_stops,
+    transcribe,
+)
+from backend.app.services.streaming_stt import Speculation, create_recognizer
+from backend.app.services.tracing import SpanKind, annotate, span
+from backend.app.services.http_clients import UpstreamClients, get_upstream_clients
+from backend.app.settings.config import API_Settings
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+settings = API_Settings()
+
 router = APIRouter()
 
-@router.post("/stt-route", response_model=SttRouteResponse)
+@router.post(
+    "/stt-route",
+    response_model=SttRouteResponse,
+    responses={200: {"model": Union[SttRouteResponse, CompactSttRouteResponse]}},
+)
 async def stt_route_endpoint(
     audio: UploadFile = File(...),
-    user_location: Optional[str] = Cookie(None)
+    user_location: Optional[str] = Cookie(None),
+    route_format: RouteFormat = Query("points"),
+    zoom: Optional[float] = Query(None, ge=0, le=22),
+    tolerance: Optional[float] = Query(None, ge=0),
+    clients: UpstreamClients = Depends(get_upstream_clients)
 ):
     """
     Receives an audio file, mocks STT, geocodes text to points,
-    and returns the result.
+    and returns the result. `route_format=flat|polyline` returns a compact route geometry;
+    `zoom` (map zoom level) or `tolerance` (meters) simplify it with Douglas–Peucker.
     """
-    
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(audio.filename)[1]) as temp_file:
-        temp_path = temp_file.name
-        
-        # Save the uploaded audio to temporary file
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
+    audio_bytes = await audio.read()
 
     try:
         # 1. Mock Speech-to-Text
-        transcript = await stt(temp_path)
+        transcript = await transcribe(audio_bytes, audio.content_type, clients)
 
-        if not transcript:
-            raise HTTPException(
-                status_code=400, detail="Could not understand audio."
-            )
-        logger.debug("Transcript:", transcript)
-
-        # 2. Use the crew to process the transcript
-        inputs = {'text': transcript}
-        crew_result = RoutePlannerAgent().crew().kickoff(inputs=inputs)
-        
-        # 3. Extract locations from crew result
-        logger.debug("Raw crew result:", crew_result)
-        logger.debug("Type of crew result:", type(crew_result))
-        
-        location_names = []
-        current_location = "Unknown"
-        
-        if hasattr(crew_result, 'locations'):
-            logger.debug("Crew result has 'locations' attribute")
-            location_objects = crew_result.locations
-            if hasattr(crew_result, 'current_location'):
-                current_location = crew_result.current_location
-            
-            for loc in location_objects:
-                if hasattr(loc, 'name'):
-                    location_names.append(loc.name)
-                elif isinstance(loc, dict) and 'name' in loc:
-                    location_names.append(loc['name'])
-        
-        elif isinstance(crew_result, dict):
-            logger.debug("Crew result is a dictionary")
-            if 'locations' in crew_result:
-                location_objects = crew_result['locations']
-                current_location = crew_result.get('current_location', 'Unknown')
-                
-                for loc in location_objects:
-                    if isinstance(loc, dict) and 'name' in loc:
-                        location_names.append(loc['name'])
-                    elif isinstance(loc, str):
-                        location_names.append(loc)
-        
-        elif hasattr(crew_result, 'json_dict'):
-            logger.debug("Crew result has 'json_dict'")
-            result_data = crew_result.json_dict
-            if 'locations' in result_data:
-                location_objects = result_data['locations']
-                current_location = result_data.get('current_location', 'Unknown')
-                
-                for loc in location_objects:
-                    if isinstance(loc, dict) and 'name' in loc:
-                        location_names.append(loc['name'])
-        
-        elif isinstance(crew_result, str):
-            logger.debug("Crew result is a string, trying to parse as JSON")
-            import json
-            try:
-                result_data = json.loads(crew_result)
-                if 'locations' in result_data:
-                    location_objects = result_data['locations']
-                    current_location = result_data.get('current_location', 'Unknown')
-                    
-                    for loc in location_objects:
-                        if isinstance(loc, dict) and 'name' in loc:
-                            location_names.append(loc['name'])
-            except:
-                pass
-        
-        logger.debug("Extracted location names:", location_names)
-        logger.debug("Current location:", current_location)
-
-        # Если не удалось определить город из crew результата
-        if current_location == "Unknown":
-            current_location = user_location or "Москва"
-            logger.debug(f"Using fallback location: {current_location}")
-
-        if not location_names:
-            # Детальная отладка
-            logger.debug("DEBUG - Crew result structure:")
-            logger.debug(f"  Type: {type(crew_result)}")
-            logger.debug(f"  Dir: {[attr for attr in dir(crew_result) if not attr.startswith('_')]}")
-            if hasattr(crew_result, '__dict__'):
-                logger.debug(f"  Dict: {crew_result.__dict__}")
-            
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Could not find locations in the transcript. Crew result: {crew_result}"
+        # 2-6. Extraction, geocoding, scheduling and routing
+        planned = await plan_personal_route(transcript, user_location, clients)
+
+        # 7. Format for frontend
+        with stage("serialization"):
+            route_coords = simplify_for_output(planned.route_coords, planned.points_to_route, tolerance=tolerance, zoom=zoom)
+            return build_route_response(
+                planned.route_type, transcript, route_coords, planned.points_to_route, route_format, planned.schedule
             )
-        
-        # 4. Geocode the locations to get coordinates
-        logger.debug(f"Geocoding {len(location_names)} locations in {current_location}...")
-        points_to_route = await geocode_locations(location_names, city=current_location)
-        logger.debug("Geocoded coordinates:", points_to_route)
-
-        # 5. Get route from 2GIS API
-        logger.debug("Building route with 2GIS API...")
-        route_coords = await get_2gis_route(points_to_route)
-        logger.debug(f"Route built with {len(route_coords)} points")
-
-        # 6. Format for frontend
-        route_for_frontend = [{"coord": c} for c in route_coords]
-        pivot_route_points = [{"coord": c} for c in points_to_route]
-
-        return {
-            "route_type": "car",
-            "transcript": transcript,
-            "route": route_for_frontend, 
-            "pivot_route_points": pivot_route_points
-        }
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error in stt_route_endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+def _format_event(event: BaseModel, sse: bool) -> str:
+    """Serializes an event as an NDJSON line or as a Server-Sent Event."""
+    payload = event.model_dump_json()
+    if sse:
+        return f"event: {event.event}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+def _error_event(e: Exception) -> ErrorEvent:
+    """Reports a failure as the final event, since the response status is already sent."""
+    if isinstance(e, HTTPException):
+        return ErrorEvent(status_code=e.status_code, detail=str(e.detail))
+    logger.error(f"Error in the streaming pipeline: {str(e)}", exc_info=True)
+    return ErrorEvent(status_code=500, detail=str(e))
+
+async def _itinerary_events(
+    transcript: str,
+    user_location: Optional[str],
+    clients: UpstreamClients,
+    itinerary: Optional[Awaitable] = None,
+) -> AsyncIterator[BaseModel]:
+    """
+    Runs the pipeline after speech recognition, yielding each stage result as soon as it is known.
+    `itinerary` is extraction already started on this transcript (by /stt-route/ws while the user spoke).
+    """
+    geocoding_task = None
+    prefetch = None
+    try:
+        if itinerary is not None:
+            with stage("extraction_wait"):
+                crew_result = await itinerary
+        else:
+            prefetch = geocode_prefetch(clients, user_location)
+            crew_result = await plan_itinerary(transcript, prefetch)
+        location_names, location_times, current_location = extract_locations(crew_result, user_location)
+        yield LocationsEvent(current_location=current_location, locations=location_names)
+
+        # Forward every pivot point as soon as geocode_locations resolves it.
+        resolved: asyncio.Queue = asyncio.Queue()
+
+        async def run_geocoding() -> List[List[float]]:
+            try:
+                return await geocode_locations(
+                    location_names,
+                    city=current_location,
+                    client=clients.places,
+                    on_resolved=lambda index, coords: resolved.put_nowait((index, coords)),
+                )
+            finally:
+                resolved.put_nowait(None)
+
+        geocode_started = time.perf_counter()
+        if prefetch is not None:
+            await prefetch.wait()
+        geocoding_task = asyncio.create_task(run_geocoding())
+        while (item := await resolved.get()) is not None:
+            index, coords = item
+            yield PivotPointEvent(index=index, name=location_names[index], point=RoutePoint(coord=coords))
+        points_to_route = await geocoding_task
+        STAGE_SECONDS.labels(current_endpoint(), "geocode").observe(time.perf_counter() - geocode_started)
+
+        location_names, points_to_route, schedule = schedule_stops(
+            location_names, location_times, points_to_route, user_location
+        )
+        yield ScheduleEvent(schedule=schedule)
+
+        with stage("routing"):
+            route_coords = await get_2gis_route(points_to_route, client=clients.routing)
+        chunk_size = settings.stream_route_chunk_size
+        for seq, start in enumerate(range(0, len(route_coords), chunk_size)):
+            chunk = route_coords[start:start + chunk_size].tolist()
+            yield RouteChunkEvent(seq=seq, route=[RoutePoint(coord=c) for c in chunk])
+
+        yield RouteCompleteEvent(
+            route_type="car",
+            transcript=transcript,
+            pivot_route_points=[RoutePoint(coord=c) for c in points_to_route],
+            route_points=len(route_coords),
+        )
+    except Exception as e:
+        yield _error_event(e)
     finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
\ No newline at end of file
+        if geocoding_task is not None and not geocoding_task.done():
+            geocoding_task.cancel()
+
+async def _route_events(
+    audio_bytes: bytes,
+    content_type: Optional[str],
+    user_location: Optional[str],
+    clients: UpstreamClients,
+) -> AsyncIterator[BaseModel]:
+    """Runs the same pipeline as stt_route_endpoint, yielding each stage result as soon as it is known."""
+    try:
+        transcript = await transcribe(audio_bytes, content_type, clients)
+    except Exception as e:
+        yield _error_event(e)
+        return
+    yield TranscriptEvent(transcript=transcript)
+    async for event in _itinerary_events(transcript, user_location, clients):
+        yield event
+
+@router.post("/stt-route/stream")
+async def stt_route_stream_endpoint(
+    request: Request,
+    audio: UploadFile = File(...),
+    user_location: Optional[str] = Cookie(None),
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Streaming variant of /stt-route. Emits the transcript, the extracted locations,
+    every pivot point as it is geocoded, the schedule (visiting order and ETAs),
+    the route geometry in chunks and a final `complete` event. Responds with Server-Sent Events when the client sends
+    `Accept: text/event-stream`, and with NDJSON otherwise.
+    """
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    audio_bytes = await audio.read()
+
+    async def body() -> AsyncIterator[str]:
+        async for event in _route_events(audio_bytes, audio.content_type, user_location, clients):
+            yield _format_event(event, sse)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class _Recording:
+    """The audio chunks a /stt-route/ws client sends, until its {"type": "end"} message."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.ended_at: Optional[float] = None
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            message = await asyncio.wait_for(self.websocket.receive(), settings.streaming_stt_idle_timeout)
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                yield message["bytes"]
+            elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+                self.ended_at = time.perf_counter()
+                return
+
+async def _send_event(websocket: WebSocket, event: BaseModel) -> None:
+    await websocket.send_text(event.model_dump_json())
+
+@router.websocket("/stt-route/ws")
+async def stt_route_ws_endpoint(
+    websocket: WebSocket,
+    user_location: Optional[str] = Cookie(None),
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Streaming recognition: the client sends OGG (Opus) or WebM (Opus) chunks as binary
+    messages while the user speaks and {"type": "end"} when the recording stops. The
+    server answers with `partial_transcript` events during the recording, then with the
+    events of /stt-route/stream from `transcript` on, and closes the connection.
+    Extraction starts on finished utterances, one at a time, so by the end of the
+    recording it has usually run already.
+    """
+    await websocket.accept()
+    recording = _Recording(websocket)
+    speculation = Speculation(plan_itinerary)
+    with request_metrics("/stt-route/ws"), span("WS /api/stt-route/ws", kind=SpanKind.SERVER):
+        try:
+            transcript = ""
+            async for result in create_recognizer().recognize(stream_to_ogg_opus(recording.chunks())):
+                transcript = result.text
+                await _send_event(websocket, PartialTranscriptEvent(transcript=result.text, stable=result.stable))
+                if result.stable and settings.streaming_stt_speculative_extraction:
+                    speculation.update(result.text)
+            if recording.ended_at is not None:
+                # Only what is left after the user stopped speaking is on the critical path.
+                STAGE_SECONDS.labels(current_endpoint(), "stt").observe(time.perf_counter() - recording.ended_at)
+            if not transcript:
+                raise HTTPException(status_code=400, detail="Could not understand audio.")
+            annotate({"voice.transcript": transcript, "stt.speculations": speculation.started})
+            await _send_event(websocket, TranscriptEvent(transcript=transcript))
+
+            with request_deadline(settings.request_deadline):
+                events = _itinerary_events(transcript, user_location, clients, speculation.take(transcript))
+                async for event in events:
+                    await _send_event(websocket, event)
+        except WebSocketDisconnect:
+            logger.info("Client disconnected from /stt-route/ws before the route was built")
+            return
+        except asyncio.TimeoutError:
+            await _send_event(websocket, ErrorEvent(status_code=408, detail="No audio received in time."))
+        except Exception as e:
+            await _send_event(websocket, _error_event(e))
+        finally:
+            speculation.cancel()
+    await websocket.close()
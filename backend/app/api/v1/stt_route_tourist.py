@@ -1,89 +1,96 @@
-import os
-import tempfile
-import uuid
-import shutil
-from fastapi import APIRouter, UploadFile, File, Cookie, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Cookie, Depends, Query
+from fastapi.responses import JSONResponse
+from typing import Optional, Union
 
-from pydantic import BaseModel
+import orjson
 
-from app.services.stt import stt
-from app.services.geocoding import geocode_locations
-from app.services.routing import get_2gis_route
-from fastapi import APIRouter, UploadFile, File
-
-from backend.app.services.geocoding_tourist import geocode_locations_tourist
-from tourist_route_planner.crew import TouristRoutePlanner # type:ignore
-from app.api.v1.schemas import SttRouteResponse
+from backend.app.api.v1.route_response import build_route_response, route_response_content, simplify_for_output
+from backend.app.api.v1.schemas import CompactSttRouteResponse, JobStatusResponse, RouteFormat, SttRouteResponse
+from backend.app.repository.job_store import Job
+from backend.app.services.http_clients import UpstreamClients, get_upstream_clients
+from backend.app.services.job_queue import job_queue
+from backend.app.services.metrics import request_metrics, stage
+from backend.app.services.route_pipeline import plan_tourist_route, transcribe
+from backend.app.settings.config import API_Settings
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+settings = API_Settings()
+
 router = APIRouter()
 
-@router.post("/stt-route-tourist", response_model=SttRouteResponse)
+JOB_KIND = "stt-route-tourist"
+
+
+async def _run_job(job: Job, clients: UpstreamClients) -> bytes:
+    """The /stt-route-tourist pipeline for a job submitted with ?async=1; returns the response body."""
+    params = job.params
+    with request_metrics("/stt-route-tourist"):
+        transcript = await transcribe(job.audio, params["content_type"], clients)
+        planned = await plan_tourist_route(transcript, params["user_location"], clients)
+        with stage("serialization"):
+            route_coords = simplify_for_output(
+                planned.route_coords, planned.points_to_route, tolerance=params["tolerance"], zoom=params["zoom"]
+            )
+            content = route_response_content(
+                planned.route_type, transcript, route_coords, planned.points_to_route, params["route_format"]
+            )
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+job_queue.register(JOB_KIND, _run_job)
+
+@router.post(
+    "/stt-route-tourist",
+    response_model=SttRouteResponse,
+    responses={
+        200: {"model": Union[SttRouteResponse, CompactSttRouteResponse]},
+        202: {"model": JobStatusResponse, "description": "With ?async=1: the job to poll at `status_url`"},
+    },
+)
 async def stt_route_tourist_endpoint(
     audio: UploadFile = File(...),
-    user_location: Optional[str] = Cookie(None)
+    user_location: Optional[str] = Cookie(None),
+    route_format: RouteFormat = Query("points"),
+    zoom: Optional[float] = Query(None, ge=0, le=22),
+    tolerance: Optional[float] = Query(None, ge=0),
+    async_mode: bool = Query(False, alias="async"),
+    clients: UpstreamClients = Depends(get_upstream_clients)
 ):
     """
     Receives an audio file, mocks STT, geocodes text to points,
-    and returns the result.
+    and returns the result. `route_format=flat|polyline` returns a compact route geometry;
+    `zoom` (map zoom level) or `tolerance` (meters) simplify it with Douglas–Peucker.
+    With `async=1` the pipeline runs as a background job: the response (202) carries the
+    job id right away, and GET /api/jobs/{job_id} returns the result once it is done.
     """
-    
-     # Create a temporary file that works on all OS
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(audio.filename)[1]) as temp_file:
-        temp_path = temp_file.name
-        
-        # Save the uploaded audio to temporary file
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
+    audio_bytes = await audio.read()
 
-    try:
-        # 1. Mock Speech-to-Text
-        transcript = await stt(temp_path)
-
-        if not transcript:
-            raise HTTPException(
-                status_code=400, detail="Could not understand audio."
-            )
-
-        # Use the crew to get location names
-        inputs = {'location': transcript}
-        crew_result = TouristRoutePlanner().crew().kickoff(inputs=inputs)
-        
-        # The result from the crew is now a Pydantic model (Itinerary).
-        # We need to access the 'locations' attribute to get the list.
-        location_names = crew_result.json_dict['locations']
-        current_location = crew_result.json_dict['current_location']
-        if current_location == "Unknown":
-            raise HTTPException(
-                status_code=404, detail="Could not find current location in the transcript."
-            )
-
-
-        if not location_names:
-            raise HTTPException(
-                status_code=404, detail="Could not find locations in the transcript."
-            )
-        
-        # Geocode the locations to get coordinates, using user_location as the city context.
-        points_to_route = await geocode_locations_tourist(location_names, city=current_location)
+    if async_mode:
+        params = {
+            "content_type": audio.content_type,
+            "user_location": user_location,
+            "route_format": route_format,
+            "zoom": zoom,
+            "tolerance": tolerance,
+        }
+        job_id = await job_queue.submit(JOB_KIND, params, audio_bytes)
+        status_url = f"/api/jobs/{job_id}"
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job_id, "status": "queued", "attempts": 0, "status_url": status_url},
+            headers={"Location": status_url},
+        )
 
-        # Get route from 2GIS API
-        route_coords = await get_2gis_route(points_to_route)
+    # 1. Mock Speech-to-Text
+    transcript = await transcribe(audio_bytes, audio.content_type, clients)
 
-        # 5. Format for frontend
-        route_for_frontend = [{"coord": c} for c in route_coords]
-        pivot_route_points = [{"coord": c} for c in points_to_route]
+    # 2. Plan the walk: must-visit places, geocoding, stop order, route
+    planned = await plan_tourist_route(transcript, user_location, clients)
 
-        return {
-            "route_type": "pedestrian",
-            "transcript": transcript,
-            "route": route_for_frontend,
-            "pivot_route_points": pivot_route_points
-        }
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
\ No newline at end of file
+    # 3. Format for frontend
+    with stage("serialization"):
+        route_coords = simplify_for_output(planned.route_coords, planned.points_to_route, tolerance=tolerance, zoom=zoom)
+        return build_route_response(planned.route_type, transcript, route_coords, planned.points_to_route, route_format)
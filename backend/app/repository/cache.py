@@ -0,0 +1,325 @@
+import asyncio
+import copy
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """A cached value with its absolute expiry time (unix seconds)."""
+    value: Any
+    expires_at: float
+    negative: bool = False
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) >= self.expires_at
+
+    def is_usable_stale(self, stale_ttl: float, now: Optional[float] = None) -> bool:
+        """Whether the entry may still be served while the upstream is unavailable."""
+        return (now if now is not None else time.time()) < self.expires_at + stale_ttl
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how well a cache performs."""
+    hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+    stale_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+class MemoryCache:
+    """
+    In-process LRU tier. Entries carry their own expiry time, expired entries
+    are dropped lazily on access once they are older than the stale window.
+    """
+
+    def __init__(self, maxsize: int, stats: CacheStats, stale_ttl: float = 0):
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self._stats = stats
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.is_expired():
+                if not entry.is_usable_stale(self.stale_ttl):
+                    del self._entries[key]
+                    self._stats.expirations += 1
+                    return None
+                if not allow_stale:
+                    return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _json_default(value: Any) -> Any:
+    """Lets NumPy arrays (and other objects with `tolist`) be stored as JSON lists."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SQLiteCache:
+    """
+    Optional on-disk tier shared between restarts (and between workers on the same host).
+    Values must be JSON-serializable. Rows are evicted least-recently-used first
+    once the namespace grows beyond `maxsize`, expired rows once they leave the stale window.
+    """
+
+    def __init__(self, path: str, namespace: str, maxsize: int, stats: CacheStats, stale_ttl: float = 0):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self._stats = stats
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                negative INTEGER NOT NULL DEFAULT 0,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at)"
+        )
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, negative, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            value, negative, expires_at = row
+            if expires_at <= now:
+                if expires_at + self.stale_ttl <= now:
+                    self._conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+                    )
+                    self._stats.expirations += 1
+                    return None
+                if not allow_stale:
+                    return None
+            self._conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+        return CacheEntry(value=json.loads(value), expires_at=expires_at, negative=bool(negative))
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, negative, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(entry.value, ensure_ascii=False, default=_json_default), int(entry.negative),
+                 entry.expires_at, time.time()),
+            )
+            self._trim()
+
+    def _trim(self) -> None:
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        overflow = count - self.maxsize
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM cache_entries WHERE rowid IN ("
+            "SELECT rowid FROM cache_entries WHERE namespace = ? ORDER BY accessed_at LIMIT ?)",
+            (self.namespace, overflow),
+        )
+        self._stats.evictions += overflow
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+
+class TieredCache:
+    """
+    Two-tier cache: an in-process LRU in front of an optional SQLite store.
+    Supports positive entries and short-lived negative entries ("known not found").
+    Positive entries stay readable for `stale_ttl` after they expire, through `get_stale`,
+    for serving while the upstream is unavailable.
+
+    Values go in and come out as copies (see `_copy`), so callers may modify what they
+    stored or got. The `a`-prefixed coroutines are for the event loop: they read and
+    write the SQLite tier in a thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float,
+        db_path: Optional[str] = None,
+        db_maxsize: int = 100_000,
+        stale_ttl: float = 0,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._stats = CacheStats()
+        self._memory = MemoryCache(maxsize, self._stats, stale_ttl)
+        self._disk = SQLiteCache(db_path, name, db_maxsize, self._stats, stale_ttl) if db_path else None
+        if self._disk:
+            logger.info(f"Cache '{name}' is backed by SQLite at {db_path}")
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        """The copy of a value that is stored or handed out."""
+        return copy.deepcopy(value)
+
+    def _handed_out(self, entry: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        if entry is None:
+            return None
+        return CacheEntry(value=self._copy(entry.value), expires_at=entry.expires_at, negative=entry.negative)
+
+    def _counted(self, entry: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        if entry is None:
+            self._stats.misses += 1
+        elif entry.negative:
+            self._stats.negative_hits += 1
+        else:
+            self._stats.hits += 1
+        return self._handed_out(entry)
+
+    def _stale(self, entry: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        if entry is None or entry.negative:
+            return None
+        self._stats.stale_hits += 1
+        return self._handed_out(entry)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Returns a live entry (positive or negative) or None on a miss."""
+        entry = self._memory.get(key)
+        if entry is None and self._disk is not None:
+            entry = self._disk.get(key)
+            if entry is not None:
+                self._memory.set(key, entry)
+        return self._counted(entry)
+
+    async def aget(self, key: str) -> Optional[CacheEntry]:
+        """`get` for the event loop."""
+        entry = self._memory.get(key)
+        if entry is None and self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry is not None:
+                self._memory.set(key, entry)
+        return self._counted(entry)
+
+    def get_stale(self, key: str) -> Optional[CacheEntry]:
+        """Returns a positive entry even if it has expired (within `stale_ttl`), or None."""
+        entry = self._memory.get(key, allow_stale=True)
+        if entry is None and self._disk is not None:
+            entry = self._disk.get(key, allow_stale=True)
+        return self._stale(entry)
+
+    async def aget_stale(self, key: str) -> Optional[CacheEntry]:
+        """`get_stale` for the event loop."""
+        entry = self._memory.get(key, allow_stale=True)
+        if entry is None and self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key, True)
+        return self._stale(entry)
+
+    def _entry(self, value: Any, ttl: Optional[float]) -> CacheEntry:
+        return CacheEntry(value=self._copy(value), expires_at=time.time() + (ttl if ttl is not None else self.ttl))
+
+    def _negative_entry(self, detail: Any, ttl: Optional[float]) -> CacheEntry:
+        ttl = ttl if ttl is not None else self.negative_ttl
+        return CacheEntry(value=detail, expires_at=time.time() + ttl, negative=True)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._store(key, self._entry(value, ttl))
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """`set` for the event loop."""
+        await self._astore(key, self._entry(value, ttl))
+
+    def set_negative(self, key: str, detail: Any, ttl: Optional[float] = None) -> None:
+        """Remembers that `key` has no result, for a (short) negative TTL."""
+        self._store(key, self._negative_entry(detail, ttl))
+
+    async def aset_negative(self, key: str, detail: Any, ttl: Optional[float] = None) -> None:
+        """`set_negative` for the event loop."""
+        await self._astore(key, self._negative_entry(detail, ttl))
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        if entry.expires_at <= time.time():
+            return
+        self._memory.set(key, entry)
+        if self._disk is not None:
+            self._disk.set(key, entry)
+
+    async def _astore(self, key: str, entry: CacheEntry) -> None:
+        if entry.expires_at <= time.time():
+            return
+        self._memory.set(key, entry)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, entry)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats.as_dict(), "size": len(self._memory), "persistent": self._disk is not None}
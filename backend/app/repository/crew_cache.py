@@ -0,0 +1,238 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from backend.app.repository.cache import TieredCache
+from backend.app.repository.geocode_cache import normalize_query
+
+# Words that do not change what the user asks the planner for
+STOP_WORDS = frozenset({
+    "а", "и", "в", "во", "на", "по", "с", "к", "у", "ну", "вот", "же", "ли",
+    "я", "мы", "мне", "нам", "меня", "нас", "пожалуйста", "можно", "хочу", "хотим",
+    "хотелось", "бы", "покажи", "покажите", "расскажи", "расскажите", "подскажи",
+    "подскажите", "какие", "какой", "что", "где",
+})
+
+_WORD_RE = re.compile(r"[a-zа-я0-9]+")
+_RAW_WORD_RE = re.compile(r"[A-Za-zА-Яа-яЁё0-9]+")
+_SOFT_ENDING = "аеиоуыэюяйь"
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _stem(word: str) -> str:
+    """Very light stemming: 'перми', 'пермь' and 'пермью' all become 'перм'."""
+    if len(word) <= 4:
+        return word
+    stripped = word.rstrip(_SOFT_ENDING)
+    return stripped if len(stripped) >= 3 else word
+
+
+def transcript_shingles(transcript: str) -> FrozenSet[str]:
+    """
+    Word-stem unigrams and bigrams of the transcript without stop words.
+    Bigrams keep the order of the words relevant, so "от вокзала до кафе"
+    and "от кафе до вокзала" do not look like the same request.
+    """
+    stems = [_stem(word) for word in _WORD_RE.findall(normalize_query(transcript)) if word not in STOP_WORDS]
+    shingles = set(stems)
+    shingles.update(f"{first} {second}" for first, second in zip(stems, stems[1:]))
+    return frozenset(shingles)
+
+
+def transcript_entities(transcript: str) -> FrozenSet[str]:
+    """
+    Stems of the words that name something: capitalized words (cities, streets, places)
+    and numbers. Two transcripts that differ in one of them ask for a different route,
+    however similar the rest of the wording is.
+    """
+    return frozenset(
+        _stem(normalize_query(word)) for word in _RAW_WORD_RE.findall(transcript)
+        if word[0].isupper() or word[0].isdigit()
+    ) - STOP_WORDS
+
+
+class MinHasher:
+    """MinHash signatures over string shingles with `num_perm` universal hash functions."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        rng = hashlib.blake2b(str(seed).encode(), digest_size=64)
+        self._params: List[Tuple[int, int]] = []
+        while len(self._params) < num_perm:
+            rng.update(b".")
+            digest = rng.digest()
+            for offset in range(0, len(digest), 16):
+                a = int.from_bytes(digest[offset:offset + 8], "big") % (_MERSENNE_PRIME - 1) + 1
+                b = int.from_bytes(digest[offset + 8:offset + 16], "big") % _MERSENNE_PRIME
+                self._params.append((a, b))
+        del self._params[num_perm:]
+
+    def signature(self, shingles: FrozenSet[str]) -> Tuple[int, ...]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles]
+        if not hashes:
+            return tuple([_MERSENNE_PRIME] * self.num_perm)
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._params)
+
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of the two shingle sets."""
+        return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class MinHashIndex:
+    """
+    In-process LSH index (banded MinHash) from transcript signatures to cache keys.
+    Holds at most `maxsize` keys, the least recently added are dropped first.
+    """
+
+    def __init__(self, maxsize: int, num_perm: int = 64, bands: int = 16):
+        self.maxsize = maxsize
+        self.bands = bands
+        self._rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._signatures: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self._entities: Dict[str, FrozenSet[str]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+        self._lock = threading.Lock()
+
+    def signature(self, transcript: str) -> Tuple[int, ...]:
+        return self._hasher.signature(transcript_shingles(transcript))
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self._rows:(band + 1) * self._rows]
+
+    def add(self, key: str, signature: Tuple[int, ...], entities: FrozenSet[str] = frozenset()) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if key in self._signatures:
+                self._remove(key)
+            self._signatures[key] = signature
+            self._entities[key] = entities
+            for band_key in self._band_keys(signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._signatures) > self.maxsize:
+                self._remove(next(iter(self._signatures)))
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            if key in self._signatures:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        signature = self._signatures.pop(key)
+        del self._entities[key]
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def nearest(self, signature: Tuple[int, ...], threshold: float,
+                entities: FrozenSet[str] = frozenset()) -> Optional[Tuple[str, float]]:
+        """
+        Returns the most similar indexed key with similarity >= threshold, if any,
+        among the keys added with exactly the same `entities`.
+        """
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            best: Optional[Tuple[str, float]] = None
+            for key in candidates:
+                if self._entities[key] != entities:
+                    continue
+                similarity = MinHasher.similarity(signature, self._signatures[key])
+                if similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (key, similarity)
+            return best
+
+    def clear(self) -> None:
+        with self._lock:
+            self._signatures.clear()
+            self._entities.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+class CrewResultCache(TieredCache):
+    """
+    Cache of crew results (the `json_dict` of the final task).
+
+    The exact tier is keyed on the normalized transcript, the crew name and a hash of the
+    crew configuration, so editing a prompt or switching the model invalidates old entries.
+    The optional fuzzy tier finds near-duplicate transcripts with MinHash, one index per
+    crew and configuration; a near-duplicate only matches when it names the same places,
+    city and numbers (see `transcript_entities`). The index lives in process memory only:
+    entries loaded from SQLite are served by exact match.
+    """
+
+    def __init__(self, fuzzy_threshold: float = 0.8, **kwargs):
+        super().__init__(name="crew", negative_ttl=0, **kwargs)
+        self.fuzzy_threshold = fuzzy_threshold
+        self._indexes: Dict[str, MinHashIndex] = {}
+        self._indexes_lock = threading.Lock()
+        self._fuzzy_hits = 0
+
+    @staticmethod
+    def key(crew_name: str, config_hash: str, transcript: str) -> str:
+        raw = "|".join([crew_name, config_hash, normalize_query(transcript)])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _index(self, crew_name: str, config_hash: str) -> MinHashIndex:
+        scope = f"{crew_name}|{config_hash}"
+        with self._indexes_lock:
+            index = self._indexes.get(scope)
+            if index is None:
+                index = self._indexes[scope] = MinHashIndex(self._memory.maxsize)
+            return index
+
+    async def lookup(self, crew_name: str, config_hash: str, transcript: str, fuzzy: bool = False) -> Optional[Any]:
+        """Returns the cached result for the transcript or, if `fuzzy`, for a near-duplicate one."""
+        entry = await self.aget(self.key(crew_name, config_hash, transcript))
+        if entry is not None:
+            return entry.value
+        if not fuzzy:
+            return None
+
+        index = self._index(crew_name, config_hash)
+        match = index.nearest(index.signature(transcript), self.fuzzy_threshold, transcript_entities(transcript))
+        if match is None:
+            return None
+        matched_key, _ = match
+        entry = self._memory.get(matched_key)
+        if entry is None:
+            # Expired or evicted from memory, the signature is stale.
+            index.discard(matched_key)
+            return None
+        # The exact lookup above counted this lookup as a miss.
+        self._stats.misses -= 1
+        self._stats.hits += 1
+        self._fuzzy_hits += 1
+        return self._copy(entry.value)
+
+    async def store(self, crew_name: str, config_hash: str, transcript: str, result: Dict[str, Any],
+                    fuzzy: bool = False) -> None:
+        key = self.key(crew_name, config_hash, transcript)
+        await self.aset(key, result)
+        if fuzzy:
+            index = self._index(crew_name, config_hash)
+            index.add(key, index.signature(transcript), transcript_entities(transcript))
+
+    def clear(self) -> None:
+        super().clear()
+        with self._indexes_lock:
+            self._indexes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "fuzzy_hits": self._fuzzy_hits,
+            "fuzzy_index_size": sum(len(index) for index in self._indexes.values()),
+        }
@@ -0,0 +1,46 @@
+import re
+from typing import List, Optional
+
+from backend.app.repository.cache import TieredCache
+
+_PUNCTUATION_RE = re.compile(r"[«»\"'“”„.,;:!?()]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes a free-form place string so that trivially different spellings
+    ("Красная площадь", " красная  площадь.") share one cache entry.
+    """
+    text = text.lower().replace("ё", "е")
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def make_geocode_key(
+    kind: str,
+    query: str,
+    city: Optional[str] = None,
+    reference_point: Optional[List[float]] = None,
+    precision: int = 3,
+) -> str:
+    """
+    Builds a cache key from the normalized query, the city and the reference point
+    rounded to `precision` decimals (3 decimals is roughly 100 m).
+    """
+    parts = [kind, normalize_query(query), normalize_query(city) if city else ""]
+    if reference_point:
+        parts.append(f"{round(reference_point[0], precision)},{round(reference_point[1], precision)}")
+    return "|".join(parts)
+
+
+class GeocodeCache(TieredCache):
+    """Cache of Places API lookups: coordinates for hits, error details for 404s."""
+
+    def __init__(self, precision: int = 3, **kwargs):
+        super().__init__(name="geocode", **kwargs)
+        self.precision = precision
+
+    def key(self, kind: str, query: str, city: Optional[str] = None,
+            reference_point: Optional[List[float]] = None) -> str:
+        return make_geocode_key(kind, query, city=city, reference_point=reference_point, precision=self.precision)
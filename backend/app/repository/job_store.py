@@ -0,0 +1,207 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+@dataclass
+class Job:
+    """A background job; `result` is the JSON response body of a done job."""
+    id: str
+    kind: str
+    status: str
+    params: Dict[str, Any]
+    audio: Optional[bytes]
+    attempts: int
+    created_at: float
+    updated_at: float
+    result: Optional[bytes] = None
+    status_code: Optional[int] = None
+    detail: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+class JobStore:
+    """
+    SQLite-backed job queue shared by every process on the host (API processes and standalone
+    workers). A worker claims a queued job with a lease; a job whose lease expired, because its
+    worker died or was restarted, is claimed again until it has been tried `max_attempts` times.
+    A running job is identified by its id and attempt number, so a worker that lost its lease
+    can no longer record an outcome. For a queued job `lease_expires_at` is the time it may be
+    claimed at (after a `retry` backoff), NULL to run it right away.
+    """
+
+    def __init__(self, path: str, lease: float, max_attempts: int, result_ttl: float):
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                audio BLOB,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_expires_at REAL,
+                result BLOB,
+                status_code INTEGER,
+                detail TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, created_at)")
+        logger.info(f"Job queue is backed by SQLite at {path}")
+
+    def create(self, kind: str, params: Dict[str, Any], audio: Optional[bytes] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, audio, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params, ensure_ascii=False), audio, now, now),
+            )
+        return job_id
+
+    def claim(self) -> Optional[Job]:
+        """Takes the oldest queued job (or one whose lease expired) and marks it running."""
+        now = time.time()
+        with self._lock:
+            self._fail_exhausted(now)
+            row = self._conn.execute(
+                """
+                UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                                lease_expires_at = ?, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE (status = 'queued' AND (lease_expires_at IS NULL OR lease_expires_at <= ?))
+                       OR (status = 'running' AND lease_expires_at < ?)
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING *
+                """,
+                (now + self.lease, now, now, now),
+            ).fetchone()
+        if row is None:
+            return None
+        job = self._to_job(row)
+        if job.attempts > 1:
+            logger.info(f"Running job {job.id} again (attempt {job.attempts})")
+        return job
+
+    def _fail_exhausted(self, now: float) -> None:
+        """Gives up on jobs whose worker died on every attempt, e.g. because the job itself kills it."""
+        self._conn.execute(
+            "UPDATE jobs SET status = 'failed', status_code = 500, audio = NULL, updated_at = ?, "
+            "detail = 'The job was interrupted ' || attempts || ' times' "
+            "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+            (now, now, self.max_attempts),
+        )
+
+    def release(self, job: Job) -> None:
+        """Puts back a job its worker stopped on shutdown, without counting the attempt."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (time.time(), job.id, job.attempts),
+            )
+
+    def retry(self, job: Job, delay: float, detail: str) -> bool:
+        """
+        Puts back a job that failed transiently, to be claimed again after `delay` seconds.
+        False if the job has no attempts left (or its worker lost the lease).
+        """
+        if job.attempts >= self.max_attempts:
+            return False
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_expires_at = ?, detail = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (now + delay, detail, now, job.id, job.attempts),
+            )
+        return cursor.rowcount > 0
+
+    def finish(self, job: Job, result: bytes) -> bool:
+        return self._complete(job, "done", result=result, status_code=200)
+
+    def fail(self, job: Job, status_code: int, detail: str) -> bool:
+        return self._complete(job, "failed", status_code=status_code, detail=detail)
+
+    def _complete(self, job: Job, status: str, result: Optional[bytes] = None,
+                  status_code: Optional[int] = None, detail: Optional[str] = None) -> bool:
+        """Records the outcome of the attempt; False if its lease expired and the job was claimed again."""
+        # The audio is not needed any more once the job has an outcome.
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, status_code = ?, detail = ?, audio = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (status, result, status_code, detail, time.time(), job.id, job.attempts),
+            )
+        if cursor.rowcount == 0:
+            logger.warning(f"Job {job.id} lost its lease (attempt {job.attempts}), its outcome is dropped")
+            return False
+        return True
+
+    def get(self, job_id: str, with_audio: bool = False) -> Optional[Job]:
+        columns = "*" if with_audio else (
+            "id, kind, status, params, NULL AS audio, attempts, lease_expires_at, result, "
+            "status_code, detail, created_at, updated_at"
+        )
+        with self._lock:
+            row = self._conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def purge(self) -> int:
+        """Deletes finished jobs older than `result_ttl`."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - self.result_ttl,),
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict(rows)
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+    @staticmethod
+    def _to_job(row: tuple) -> Job:
+        (job_id, kind, status, params, audio, attempts, _lease, result,
+         status_code, detail, created_at, updated_at) = row
+        return Job(
+            id=job_id,
+            kind=kind,
+            status=status,
+            params=json.loads(params),
+            audio=audio,
+            attempts=attempts,
+            created_at=created_at,
+            updated_at=updated_at,
+            result=result,
+            status_code=status_code,
+            detail=detail,
+        )
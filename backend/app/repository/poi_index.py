@@ -0,0 +1,124 @@
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.app.services.geometry import EARTH_RADIUS_M
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+POINTS = "points.npy"
+CELLS = "cells.npy"
+FORMAT_VERSION = 1
+
+# Cell columns and rows are shifted to be non-negative and packed as column << 32 | row,
+# so the cells of one column over a range of rows are a contiguous range of ids.
+_CELL_OFFSET = 1 << 24
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+def _cell_ids(lon: np.ndarray, lat: np.ndarray, cell_size: float) -> np.ndarray:
+    columns = np.floor(lon / cell_size).astype(np.int64) + _CELL_OFFSET
+    rows = np.floor(lat / cell_size).astype(np.int64) + _CELL_OFFSET
+    return (columns << 32) | rows
+
+
+def build_poi_index(records: Iterable[Tuple[str, float, float]], path: str, cell_size: float = 0.01) -> Dict[str, int]:
+    """
+    Writes the index of (category, lon, lat) records to the directory `path`: the points of
+    every category bucketed by grid cell (`cell_size` degrees, 0.01 is about 1.1 km of latitude)
+    and sorted by cell, as .npy arrays, plus a manifest with each category's slice.
+    Duplicate points of a category are dropped. Returns the point count per category.
+    """
+    by_category: Dict[str, List[Tuple[float, float]]] = {}
+    for category, lon, lat in records:
+        by_category.setdefault(category, []).append((lon, lat))
+
+    points_parts, cells_parts, categories, start = [], [], {}, 0
+    for category in sorted(by_category):
+        points = np.unique(np.asarray(by_category[category], dtype=np.float64), axis=0)
+        cells = _cell_ids(points[:, 0], points[:, 1], cell_size)
+        order = np.argsort(cells, kind="stable")
+        points_parts.append(points[order])
+        cells_parts.append(cells[order])
+        categories[category] = [start, start + len(points)]
+        start += len(points)
+
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / POINTS, np.concatenate(points_parts) if points_parts else np.empty((0, 2)))
+    np.save(directory / CELLS, np.concatenate(cells_parts) if cells_parts else np.empty(0, dtype=np.int64))
+    manifest = {"version": FORMAT_VERSION, "cell_size": cell_size, "categories": categories}
+    (directory / MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+    return {category: end - begin for category, (begin, end) in categories.items()}
+
+
+class PoiIndex:
+    """
+    Read-only index of POI coordinates per category for nearest-neighbour lookups. The arrays
+    are memory-mapped, so all worker processes on the host share one copy in the page cache.
+
+    A lookup visits only the grid cells that intersect the search radius: each column of
+    cells is one `searchsorted` range in the category's sorted cell ids, and the candidates
+    in those ranges are compared by great-circle distance.
+    """
+
+    def __init__(self, path: str):
+        directory = Path(path)
+        manifest = json.loads((directory / MANIFEST).read_text(encoding="utf-8"))
+        if manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported POI index version {manifest.get('version')} in {path}")
+        self.path = path
+        self.cell_size = manifest["cell_size"]
+        self.categories: Dict[str, Tuple[int, int]] = {
+            category: (begin, end) for category, (begin, end) in manifest["categories"].items()
+        }
+        self.points = np.load(directory / POINTS, mmap_mode="r")
+        self.cells = np.load(directory / CELLS, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __contains__(self, category: str) -> bool:
+        return category in self.categories
+
+    def nearest(self, category: str, point: List[float], radius: float) -> Optional[Tuple[List[float], float]]:
+        """
+        The [lon, lat] of the POI of `category` closest to `point` and its distance in meters,
+        or None when the category has no POI within `radius` meters (or is not indexed).
+        """
+        span = self.categories.get(category)
+        if span is None:
+            return None
+        begin, end = span
+        lon, lat = point
+        dlat = radius / _METERS_PER_DEGREE
+        dlon = radius / (_METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+
+        cells = self.cells[begin:end]
+        row_from = math.floor((lat - dlat) / self.cell_size) + _CELL_OFFSET
+        row_to = math.floor((lat + dlat) / self.cell_size) + _CELL_OFFSET
+        first_column = math.floor((lon - dlon) / self.cell_size) + _CELL_OFFSET
+        last_column = math.floor((lon + dlon) / self.cell_size) + _CELL_OFFSET
+        columns = np.arange(first_column, last_column + 1, dtype=np.int64) << 32
+        lows = np.searchsorted(cells, columns | row_from, side="left")
+        highs = np.searchsorted(cells, columns | row_to, side="right")
+
+        ranges = [(begin + low, begin + high) for low, high in zip(lows.tolist(), highs.tolist()) if high > low]
+        if not ranges:
+            return None
+        candidates = np.concatenate([self.points[low:high] for low, high in ranges])
+
+        lon1, lat1 = math.radians(lon), math.radians(lat)
+        lon2, lat2 = np.radians(candidates[:, 0]), np.radians(candidates[:, 1])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        distances = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        closest = int(np.argmin(distances))
+        if distances[closest] > radius:
+            return None
+        return candidates[closest].tolist(), float(distances[closest])
@@ -0,0 +1,45 @@
+from typing import Any, Dict, Sequence
+
+from backend.app.repository.cache import TieredCache
+
+
+def quantize_points(points: Sequence[Sequence[float]], precision: int = 5) -> str:
+    """
+    Serializes a coordinate sequence with `precision` decimals (5 decimals is roughly 1 m),
+    so that the same itinerary geocoded twice maps to the same key.
+    """
+    return ";".join(f"{round(p[0], precision)},{round(p[1], precision)}" for p in points)
+
+
+def make_route_key(points: Sequence[Sequence[float]], transport: str, precision: int = 5) -> str:
+    return f"{transport}|{quantize_points(points, precision)}"
+
+
+class RouteCache(TieredCache):
+    """
+    Cache of Routing API geometries: whole routes keyed on the quantized point
+    sequence and transport mode, and single legs (point pairs) for composing
+    routes of which only some legs changed.
+    """
+
+    def __init__(self, precision: int = 5, **kwargs):
+        super().__init__(name="route", negative_ttl=0, **kwargs)
+        self.precision = precision
+        self.legs_fetched = 0
+        self.legs_reused = 0
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        # Route arrays are made read-only before they are cached (and lists read back from
+        # SQLite are turned into new arrays), so they are shared instead of copied.
+        return value
+
+    def key(self, points: Sequence[Sequence[float]], transport: str) -> str:
+        return "route|" + make_route_key(points, transport, self.precision)
+
+    def leg_key(self, start: Sequence[float], end: Sequence[float], transport: str) -> str:
+        return "leg|" + make_route_key([start, end], transport, self.precision)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "legs_fetched": self.legs_fetched, "legs_reused": self.legs_reused}
+
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import multiprocessing
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+OGG_OPUS_CONTENT_TYPE = "audio/ogg;codecs=opus"
+
+# Container formats recognised by sniffing the first bytes of the upload
+OGG_OPUS = "ogg_opus"
+WEBM_OPUS = "webm_opus"
+OTHER = "other"
+
+_EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+# Most bytes of a streamed recording to wait for while sniffing its format
+_STREAM_HEAD_BYTES = 4096
+
+
+def detect_audio_format(data: bytes, content_type: Optional[str] = None) -> str:
+    """
+    Detects whether the audio is already Opus in an Ogg container (what SpeechKit accepts as is),
+    Opus in a WebM container (what Chrome's MediaRecorder produces), or anything else.
+    The magic bytes win over the declared content type, which browsers do not always set right.
+    """
+    head = data[:4096]
+    if head.startswith(b"OggS"):
+        # The first Ogg page of an Opus stream carries the "OpusHead" identification header.
+        return OGG_OPUS if b"OpusHead" in head[:128] else OTHER
+    if head.startswith(_EBML_MAGIC):
+        return WEBM_OPUS if b"A_OPUS" in head else OTHER
+    if content_type and content_type.replace(" ", "").lower() == OGG_OPUS_CONTENT_TYPE:
+        return OGG_OPUS
+    return OTHER
+
+
+def _remux_to_ogg(data: bytes) -> bytes:
+    """Moves the Opus stream from WebM to Ogg without decoding it (runs in a worker process)."""
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-vn", "-c:a", "copy", "-f", "ogg", "pipe:1"],
+        input=data,
+        capture_output=True,
+        check=True,
+    )
+    return result.stdout
+
+
+def _transcode_to_ogg(data: bytes) -> bytes:
+    """Decodes any ffmpeg-readable audio and re-encodes it to OGG (Opus) (runs in a worker process)."""
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(BytesIO(data))
+    with BytesIO() as ogg_buffer:
+        audio.export(ogg_buffer, format="ogg", codec="libopus")
+        return ogg_buffer.getvalue()
+
+
+async def _remux_stream_to_ogg(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Moves a WebM (Opus) stream to Ogg page by page through an ffmpeg pipe, as the chunks arrive."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "webm", "-i", "pipe:0",
+        "-vn", "-c:a", "copy", "-f", "ogg", "-page_duration", "200000", "-flush_packets", "1", "pipe:1",
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+
+    async def feed() -> None:
+        try:
+            async for chunk in chunks:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while data := await process.stdout.read(65536):
+            yield data
+        await feeder
+    finally:
+        feeder.cancel()
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+
+async def stream_to_ogg_opus(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Streamed counterpart of AudioTranscoder.to_ogg_opus for live recordings: OGG (Opus)
+    passes through, WebM (Opus) is remuxed on the fly. Other formats cannot be streamed
+    (the browser then falls back to uploading the recording).
+    """
+    # Just enough of the stream to recognize the container headers, however small the chunks are
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if detect_audio_format(head) != OTHER or len(head) >= _STREAM_HEAD_BYTES:
+            break
+    if not head:
+        return
+
+    async def all_chunks() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in chunks:
+            yield chunk
+
+    audio_format = detect_audio_format(head)
+    if audio_format == OGG_OPUS:
+        async for chunk in all_chunks():
+            yield chunk
+    elif audio_format == WEBM_OPUS:
+        async for chunk in _remux_stream_to_ogg(all_chunks()):
+            yield chunk
+    else:
+        raise HTTPException(status_code=415, detail="Streaming recognition needs Opus audio in Ogg or WebM")
+
+
+class AudioTranscoder:
+    """
+    Converts uploads to OGG (Opus) off the event loop.
+    ffmpeg work runs in a bounded process pool; at most `max_pending` conversions
+    are queued or running at once, further callers wait for a free slot.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def to_ogg_opus(self, data: bytes, content_type: Optional[str] = None) -> bytes:
+        audio_format = detect_audio_format(data, content_type)
+        if audio_format == OGG_OPUS:
+            logger.info("Audio is already OGG (Opus), skipping transcoding")
+            return data
+
+        convert = _remux_to_ogg if audio_format == WEBM_OPUS else _transcode_to_ogg
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._get_pool(), convert, data)
+            except subprocess.CalledProcessError:
+                # Some MediaRecorder WebM files cannot be remuxed as is, fall back to a full transcode.
+                logger.warning("Remuxing WebM (Opus) failed, transcoding instead")
+                return await loop.run_in_executor(self._get_pool(), _transcode_to_ogg, data)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+audio_transcoder = AudioTranscoder(
+    workers=settings.audio_transcode_workers,
+    max_pending=settings.audio_transcode_max_pending,
+)
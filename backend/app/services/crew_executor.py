@@ -0,0 +1,92 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from fastapi import HTTPException
+
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+T = TypeVar("T")
+
+
+class CrewExecutor:
+    """
+    Runs synchronous crewAI kickoffs in a dedicated thread pool so they never block the event loop.
+
+    At most `max_in_flight` kickoffs run at once; up to `max_queue` more wait for a slot
+    in an admission queue. Beyond that the request is rejected with 503 and Retry-After.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, retry_after: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="crew")
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if self._in_flight + self._queued >= self.max_in_flight + self.max_queue:
+            self._rejected += 1
+            logger.warning(f"Crew pool saturated ({self._in_flight} running, {self._queued} queued), rejecting request")
+            raise HTTPException(
+                status_code=503,
+                detail="Route planner is busy, please retry later.",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self._queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        loop = asyncio.get_running_loop()
+        # Copy the context so that context variables (request metadata) are visible in the worker thread.
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        future = loop.run_in_executor(self._pool, call)
+        # The slot is held until the thread finishes, even if the caller goes away.
+        future.add_done_callback(self._release)
+        return await asyncio.shield(future)
+
+    def _release(self, future: asyncio.Future) -> None:
+        self._in_flight -= 1
+        self._slots.release()
+        if future.cancelled() or future.exception() is not None:
+            self._failed += 1
+        else:
+            self._completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+crew_executor = CrewExecutor(
+    max_in_flight=settings.crew_max_in_flight,
+    max_queue=settings.crew_queue_size,
+    retry_after=settings.crew_retry_after,
+)
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import threading
+from typing import Callable, Dict
+
+from crewai import Crew
+
+from route_planner_agent.crew import RoutePlannerAgent # type:ignore
+from tourist_route_planner.crew import TouristRoutePlanner # type:ignore
+
+from backend.app.services.tracing import instrument_crew_tasks
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ROUTE_PLANNER = "route_planner"
+ROUTE_EXTRACTOR = "route_extractor"
+TOURIST_PLANNER = "tourist_planner"
+
+
+class CrewFactory:
+    """
+    Builds every crew once per process and hands out cheap per-request copies.
+
+    Constructing a crew re-parses agents.yaml/tasks.yaml and re-creates the agents,
+    tasks and LLM clients. The factory keeps one never-kicked-off template per crew
+    and returns `template.copy()`, crewAI's own cloning used by `kickoff_for_each`:
+    agents and tasks are cloned (so concurrent kickoffs do not share state) while
+    the LLM objects and their HTTP clients are shared.
+    """
+
+    def __init__(self, builders: Dict[str, Callable[[], Crew]]):
+        self._builders = builders
+        self._templates: Dict[str, Crew] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _template(self, name: str) -> Crew:
+        template = self._templates.get(name)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(name)
+                if template is None:
+                    logger.info(f"Building crew template '{name}'")
+                    template = self._builders[name]()
+                    self._templates[name] = template
+        return template
+
+    def create(self, name: str) -> Crew:
+        """Returns a fresh crew instance, ready for `kickoff(inputs=...)`."""
+        return self._template(name).copy()
+
+    def fingerprint(self, name: str) -> str:
+        """
+        Hash of everything that shapes the crew output: agent prompts, LLM models,
+        task descriptions and the output model schema. Used to scope cached results.
+        """
+        fingerprint = self._fingerprints.get(name)
+        if fingerprint is None:
+            template = self._template(name)
+            parts = []
+            for agent in template.agents:
+                llm = getattr(agent, "llm", None)
+                parts += [agent.role, agent.goal, agent.backstory, getattr(llm, "model", str(llm))]
+            for task in template.tasks:
+                output_model = task.output_json or task.output_pydantic
+                schema = json.dumps(output_model.model_json_schema(), sort_keys=True) if output_model else ""
+                parts += [task.description, task.expected_output, schema]
+            fingerprint = hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()[:16]
+            self._fingerprints[name] = fingerprint
+        return fingerprint
+
+    def warmup(self) -> None:
+        """Builds all templates up front (meant for the application lifespan)."""
+        for name in self._builders:
+            self._template(name)
+
+
+crew_factory = CrewFactory({
+    ROUTE_PLANNER: lambda: RoutePlannerAgent().crew(),
+    ROUTE_EXTRACTOR: lambda: RoutePlannerAgent().extract_crew(),
+    TOURIST_PLANNER: lambda: TouristRoutePlanner().crew(),
+})
+
+# Trace the tasks of every kickoff (a no-op unless a tracing exporter is configured).
+instrument_crew_tasks()
@@ -0,0 +1,169 @@
+import functools
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.app.repository.crew_cache import CrewResultCache
+from backend.app.repository.geocode_cache import normalize_query
+from backend.app.services.crew_executor import crew_executor
+from backend.app.services.crew_factory import crew_factory
+from backend.app.services.metrics import record_token_usage, stage
+from backend.app.services.singleflight import crew_flights
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+crew_result_cache = CrewResultCache(
+    fuzzy_threshold=settings.crew_cache_fuzzy_threshold,
+    maxsize=settings.crew_cache_size,
+    ttl=settings.crew_cache_ttl,
+    db_path=settings.crew_cache_db_path,
+    db_maxsize=settings.crew_cache_db_size,
+)
+
+
+TaskCallbacks = Dict[str, Callable[[Any], None]]
+
+
+class _TaskOutputs:
+    """
+    The task outputs of one shared kickoff, passed to the task callbacks of every caller
+    waiting for it. A caller that joins after some tasks finished gets their outputs replayed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outputs: Dict[str, Any] = {}
+        self._subscribers: List[TaskCallbacks] = []
+
+    def subscribe(self, task_callbacks: Optional[TaskCallbacks]) -> None:
+        if not task_callbacks:
+            return
+        with self._lock:
+            self._subscribers.append(task_callbacks)
+            finished = dict(self._outputs)
+        for name, output in finished.items():
+            _call(task_callbacks, name, output)
+
+    def unsubscribe(self, task_callbacks: Optional[TaskCallbacks]) -> None:
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not task_callbacks]
+
+    def publish(self, name: str, output: Any) -> None:
+        """crewAI task callback; runs in the crew pool thread."""
+        with self._lock:
+            self._outputs[name] = output
+            subscribers = list(self._subscribers)
+        for task_callbacks in subscribers:
+            _call(task_callbacks, name, output)
+
+
+def _call(task_callbacks: TaskCallbacks, name: str, output: Any) -> None:
+    callback = task_callbacks.get(name)
+    if callback is None:
+        return
+    try:
+        callback(output)
+    except Exception:
+        # One caller's hook must not fail the kickoff the other callers share.
+        logger.exception(f"Task callback for '{name}' failed")
+
+
+# The task outputs of the kickoffs in flight, by singleflight key
+_flight_outputs: Dict[Tuple[str, str], _TaskOutputs] = {}
+
+
+async def _kickoff(
+    crew_name: str,
+    inputs: Dict[str, Any],
+    on_task_output: Optional[Callable[[str, Any], None]] = None,
+) -> Any:
+    """
+    Runs a fresh copy of the crew in the crew pool, timing it and counting its LLM tokens.
+    `on_task_output` is called (in the pool thread) with each task's name and output.
+    """
+    def run() -> Any:
+        crew = crew_factory.create(crew_name)
+        if on_task_output is not None:
+            for task in crew.tasks:
+                task.callback = functools.partial(on_task_output, task.name)
+        return crew.kickoff(inputs=inputs)
+
+    with stage("crew_kickoff"):
+        crew_result = await crew_executor.run(run)
+    record_token_usage(crew_name, crew_result)
+    return crew_result
+
+
+async def kickoff_cached(
+    crew_name: str,
+    transcript: str,
+    inputs: Dict[str, Any],
+    task_callbacks: Optional[TaskCallbacks] = None,
+) -> Any:
+    """
+    Runs the crew for the transcript, or returns the cached result of an identical
+    (or, for crews listed in `crew_cache_fuzzy_crews`, near-identical) earlier transcript.
+    The result is the final task's `json_dict`; raw crew output is returned uncached
+    when the task produced no JSON. `task_callbacks` only run when the crew does,
+    for every caller sharing the kickoff.
+    """
+    if settings.crew_cache_enabled:
+        config_hash = crew_factory.fingerprint(crew_name)
+        fuzzy = crew_name in settings.crew_cache_fuzzy_crews
+        cached = await crew_result_cache.lookup(crew_name, config_hash, transcript, fuzzy=fuzzy)
+        if cached is not None:
+            logger.info(f"Crew '{crew_name}' result served from cache")
+            return cached
+
+    # Concurrent requests with the same transcript, up to case and spacing like the crew
+    # cache key, share one kickoff and each get their task callbacks called.
+    key = (crew_name, normalize_query(transcript))
+    outputs = _flight_outputs.get(key) if crew_flights.in_flight(key) else None
+    if outputs is None:
+        outputs = _TaskOutputs()
+
+    def start():
+        _flight_outputs[key] = outputs
+        return _shared_kickoff(key, outputs, crew_name, transcript, inputs)
+
+    outputs.subscribe(task_callbacks)
+    try:
+        return await crew_flights.do(key, start)
+    finally:
+        outputs.unsubscribe(task_callbacks)
+
+
+async def _shared_kickoff(
+    key: Tuple[str, str],
+    outputs: _TaskOutputs,
+    crew_name: str,
+    transcript: str,
+    inputs: Dict[str, Any],
+) -> Any:
+    try:
+        return await _kickoff_and_store(crew_name, transcript, inputs, outputs.publish)
+    finally:
+        if _flight_outputs.get(key) is outputs:
+            del _flight_outputs[key]
+
+
+async def _kickoff_and_store(
+    crew_name: str,
+    transcript: str,
+    inputs: Dict[str, Any],
+    on_task_output: Optional[Callable[[str, Any], None]] = None,
+) -> Any:
+    crew_result = await _kickoff(crew_name, inputs, on_task_output)
+    if not settings.crew_cache_enabled:
+        return crew_result
+    json_dict = getattr(crew_result, "json_dict", None)
+    if not json_dict:
+        return crew_result
+    config_hash = crew_factory.fingerprint(crew_name)
+    fuzzy = crew_name in settings.crew_cache_fuzzy_crews
+    await crew_result_cache.store(crew_name, config_hash, transcript, json_dict, fuzzy=fuzzy)
+    return json_dict
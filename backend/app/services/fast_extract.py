@@ -0,0 +1,317 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from route_planner_agent.models import ExtractedPlaces, Itinerary, LocationWithTime # type:ignore
+
+from backend.app.services.geocoding import PLACE_TYPE_MAPPING
+from backend.app.services.metrics import PathStats
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Per-path counters and latency of the place extraction stage ("fast_path" vs "crew").
+extraction_paths = PathStats()
+
+# Landmark nouns that are not searchable place types, but make a phrase a recognizable place.
+LANDMARK_WORDS = [
+    'вокзал', 'аэропорт', 'станция', 'метро', 'площадь', 'офис', 'работа', 'дом',
+    'университет', 'институт', 'школа', 'садик', 'бассейн', 'стадион', 'рынок',
+    'библиотека', 'почта', 'собор', 'храм', 'церковь', 'кремль', 'набережная', 'мост',
+    'сквер', 'бульвар', 'площадка', 'галерея', 'выставка', 'отель', 'гостиница',
+    'салон', 'парикмахерская', 'химчистка', 'лавка', 'бар', 'пекарня', 'центр', 'клуб',
+]
+
+# Words that carry no place information at the start of a clause ("обед в ...", "затем зайти в ...").
+FILLER_WORDS = {
+    'начинаю', 'начну', 'начинаем', 'начать', 'сначала', 'потом', 'затем', 'далее', 'дальше',
+    'еще', 'и', 'а', 'я', 'мы', 'хочу', 'хотим', 'нужно', 'надо', 'заехать', 'заеду', 'зайти',
+    'зайду', 'сходить', 'схожу', 'поехать', 'поеду', 'пойти', 'пойду', 'съездить', 'едем',
+    'идем', 'в', 'во', 'на', 'к', 'ко', 'от', 'из', 'с', 'со', 'по', 'через', 'до', 'обед',
+    'обедать', 'пообедать', 'ужин', 'ужинать', 'поужинать', 'завтрак', 'завтракать',
+    'позавтракать', 'встреча', 'встретиться', 'прогулка', 'погулять', 'подъем', 'вечер',
+    'вечером', 'утром', 'днем', 'культурный', 'маршрут', 'построй', 'покажи', 'мне',
+    'ближайший', 'ближайшую', 'ближайшее', 'ближайшая', 'какой-нибудь', 'какую-нибудь',
+    'любой', 'любую', 'потом', 'туда', 'оттуда', 'закончить', 'закончу', 'заканчиваю',
+}
+
+# Sentence ends that are not part of a time ("9.30").
+_SENTENCE_SPLIT_RE = re.compile(r"(?<!\d)[.!?;]+|[.!?;]+(?!\d)")
+# Clause separators inside a sentence: colons that are not part of a time ("9:30"),
+# commas that are not followed by a house number, dashes, connectives and "от X через Y до Z".
+_CLAUSE_SPLIT_RE = re.compile(
+    r"(?<!\d):|:(?!\d)"
+    r"|,(?!\s*\d)"
+    r"|\s[—–-]\s"
+    r"|\s(?:а\s)?(?:затем|потом|после этого)\s"
+    r"|\sот\s"
+    r"|\sдо\s(?!\d|этого)"
+    r"|\sчерез\s"
+    r"|\sи\s"
+)
+_WORD_RE = re.compile(r"[а-яa-z0-9-]+")
+_QUOTED_RE = re.compile(r"[«\"“]([^»\"”]+)[»\"”]")
+_ADDRESS_RE = re.compile(
+    r"(?:[а-я-]+(?:ий|ый|ой|ая)\s+)?"
+    r"(?:улиц\w*|ул\.?|проспект\w*|пр-т|переул\w*|бульвар\w*|шоссе|набережн\w*)"
+    r"(?:\s+[а-я-]+){0,3}?,?\s*(?:дом\s*|д\.\s*)?\d+[а-я]?"
+    r"(?:\s*(?:корпус|к\.?)\s*\d+)?"
+)
+_RELATIVE_RE = re.compile(r"^(?:после|перед)\s")
+# Ordering that refers backwards ("до этого", "перед этим") needs real reasoning about the sequence.
+_BACKWARD_ORDER_RE = re.compile(r"\b(?:до|перед)\s+(?:этого|этим|того)\b")
+
+_DAYPART = r"(?:\s+(утра|дня|вечера|ночи))?"
+_HOUR_WORDS = {
+    'час': 1, 'один': 1, 'два': 2, 'двух': 2, 'три': 3, 'трех': 3, 'четыре': 4, 'четырех': 4,
+    'пять': 5, 'пяти': 5, 'шесть': 6, 'шести': 6, 'семь': 7, 'семи': 7, 'восемь': 8, 'восьми': 8,
+    'девять': 9, 'девяти': 9, 'десять': 10, 'десяти': 10, 'одиннадцать': 11, 'одиннадцати': 11,
+    'двенадцать': 12, 'двенадцати': 12,
+}
+# "полдесятого" is half past nine: the ordinal names the hour that is running.
+_HALF_PAST_WORDS = {
+    'первого': 0, 'второго': 1, 'третьего': 2, 'четвертого': 3, 'пятого': 4, 'шестого': 5,
+    'седьмого': 6, 'восьмого': 7, 'девятого': 8, 'десятого': 9, 'одиннадцатого': 10, 'двенадцатого': 11,
+}
+_TIME_PATTERNS = [
+    ("clock", re.compile(r"(?:\b(?:в|к|до|около|на)\s+)?\b(\d{1,2})[:.](\d{2})\b" + _DAYPART)),
+    ("half_past", re.compile(r"(?:\b(?:в|к|до|около)\s+)?\bпол\s?-?(" + "|".join(_HALF_PAST_WORDS) + r")\b" + _DAYPART)),
+    ("hour", re.compile(r"\b(?:в|к|до|около)\s+(\d{1,2})(?:\s*(?:час(?:а|ов|ам)?|ч)\b)?" + _DAYPART + r"(?![\d:.])")),
+    ("hour_word", re.compile(r"\b(?:в|к|до|около)\s+(" + "|".join(_HOUR_WORDS) + r")(?:\s+час(?:а|ов|ам)?)?\b" + _DAYPART)),
+    ("noon", re.compile(r"\b(?:в|к|до|около)\s+(полдень|полночь)\b")),
+]
+
+
+@dataclass
+class FastExtraction:
+    """Result of the rule-based extractor: places in utterance order and a confidence in [0, 1]."""
+    places: ExtractedPlaces
+    confidence: float
+
+
+def _apply_daypart(hour: int, daypart: Optional[str]) -> int:
+    if daypart == 'утра':
+        return 0 if hour == 12 else hour
+    if daypart == 'ночи':
+        return 0 if hour == 12 else hour
+    if daypart in ('дня', 'вечера'):
+        return hour + 12 if hour < 12 and (daypart == 'вечера' or hour <= 5) else hour
+    # No daypart: an itinerary is planned for the daytime, so "в 2" / "в час" mean the afternoon.
+    if hour == 0:
+        return 12
+    return hour + 12 if 1 <= hour <= 6 else hour
+
+
+def parse_time_expression(text: str) -> Optional[Tuple[str, Tuple[int, int]]]:
+    """
+    Finds the first Russian time expression in lowercase `text`.
+    Returns the time as "HH:MM" and the span of the expression, or None.
+    Supports "в 9:00", "в 9.30", "к 10", "в 2 часа дня", "в восемь вечера", "полдесятого", "в полдень".
+    """
+    found = None
+    for kind, pattern in _TIME_PATTERNS:
+        match = pattern.search(text)
+        if match is None or (found is not None and match.start() >= found[0].start()):
+            continue
+        found = (match, kind)
+    if found is None:
+        return None
+
+    match, kind = found
+    if kind == "clock":
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if match.group(3):
+            hour = _apply_daypart(hour, match.group(3))
+    elif kind == "half_past":
+        hour, minute = _apply_daypart(_HALF_PAST_WORDS[match.group(1)], match.group(2)), 30
+    elif kind == "hour":
+        hour, minute = _apply_daypart(int(match.group(1)), match.group(2)), 0
+    elif kind == "hour_word":
+        hour, minute = _apply_daypart(_HOUR_WORDS[match.group(1)], match.group(2)), 0
+    else:
+        hour, minute = (12 if match.group(1) == 'полдень' else 0), 0
+
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return None
+    return f"{hour:02d}:{minute:02d}", match.span()
+
+
+def _word_stem(word: str) -> str:
+    """Crude stem: drops the final vowel / soft sign of longer words ("аптека" -> "аптек")."""
+    if len(word) > 4 and word[-1] in "аяоеуюыийь":
+        return word[:-1]
+    return word
+
+
+def _matches_vocabulary(tokens: List[str], phrase: str) -> bool:
+    """Checks whether the (possibly inflected) multi-word `phrase` occurs in `tokens`."""
+    stems = [_word_stem(word) for word in phrase.split()]
+    for start in range(len(tokens) - len(stems) + 1):
+        if all(
+            tokens[start + i].startswith(stem) and len(tokens[start + i]) <= len(stem) + 3
+            for i, stem in enumerate(stems)
+        ):
+            return True
+    return False
+
+
+def _strip_fillers(tokens: List[str]) -> int:
+    """Returns how many leading tokens are filler words."""
+    count = 0
+    while count < len(tokens) and tokens[count] in FILLER_WORDS:
+        count += 1
+    return count
+
+
+def _clause_place(clause: str, normalized: str, previous: List[str]) -> Tuple[Optional[str], bool]:
+    """
+    Extracts the place from one clause. Returns (place name or None, recognized).
+    A clause without any place words (e.g. "вечер культурный") yields (None, True).
+    """
+    address = _ADDRESS_RE.search(normalized)
+    if address:
+        return clause[address.start():address.end()].strip(" ,"), True
+
+    words = [(m.group(0), m.start()) for m in _WORD_RE.finditer(normalized)]
+    words = words[_strip_fillers([word for word, _ in words]):]
+    if not words:
+        return None, True
+    tokens = [word for word, _ in words]
+
+    if _RELATIVE_RE.match(normalized[words[0][1]:]):
+        # "после музея" only refers to an earlier stop, it does not add a new one.
+        previous_words = {word for place in previous for word in _WORD_RE.findall(place.lower()) if len(word) > 3}
+        return None, any(_matches_vocabulary(tokens[1:], word) for word in previous_words)
+
+    quoted = _QUOTED_RE.search(clause)
+    if quoted:
+        phrase = clause[words[0][1]:quoted.end()].strip(" ,")
+    else:
+        phrase = clause[words[0][1]:].strip(" ,")
+
+    for vocabulary in (sorted(PLACE_TYPE_MAPPING, key=len, reverse=True), LANDMARK_WORDS):
+        for word in vocabulary:
+            if _matches_vocabulary(tokens, word):
+                if len(tokens) == len(word.split()) and not quoted:
+                    # Only the noun itself ("аптеку") -> dictionary form, so that geocoding
+                    # recognizes generic places and searches near the previous stop.
+                    return word, True
+                return phrase, True
+    if quoted:
+        return phrase, True
+    return phrase, False
+
+
+def extract_places(text: str) -> FastExtraction:
+    """
+    Rule-based extraction of places and their times from a transcript.
+    Every clause must be recognized as a place type, a landmark, a quoted name or an address
+    for the confidence to be 1.0; anything else lowers it.
+    """
+    text = re.sub(r"\s+", " ", text).strip()
+    normalized_text = text.lower().replace("ё", "е")
+    places: dict = {}
+    clauses = 0
+    recognized = 0
+
+    for sentence, sentence_start, _ in _split(normalized_text, _SENTENCE_SPLIT_RE, 0):
+        # A time without a place ("К 10:00 — музей") belongs to the next place of the sentence.
+        pending_time = None
+        sentence_places: List[List] = []
+        destination = None
+        for part, start, separator in _split(sentence, _CLAUSE_SPLIT_RE, sentence_start):
+            clause = text[start:start + len(part)]
+            normalized = part
+
+            time = None
+            parsed = parse_time_expression(normalized)
+            if parsed:
+                time, (time_start, time_end) = parsed
+                blank = " " * (time_end - time_start)
+                clause = clause[:time_start] + blank + clause[time_end:]
+                normalized = normalized[:time_start] + blank + normalized[time_end:]
+
+            name, ok = _clause_place(clause, normalized, list(places) + [p[0] for p in sentence_places])
+            if name is None and ok:
+                if time:
+                    pending_time = time
+                continue
+            clauses += 1
+            recognized += int(ok)
+            if name:
+                if separator == "до":
+                    destination = len(sentence_places)
+                sentence_places.append([name, time or pending_time])
+                pending_time = None
+
+        if pending_time and sentence_places:
+            # "..., в 10." at the end of a sentence refers to the place mentioned before it.
+            sentence_places[-1][1] = sentence_places[-1][1] or pending_time
+        if destination is not None:
+            # "от дома до работы через аптеку": the "до" place ends the sentence's route.
+            sentence_places.append(sentence_places.pop(destination))
+        for name, time in sentence_places:
+            places.setdefault(name, time)
+
+    confidence = recognized / clauses if clauses else 0.0
+    if len(places) < 2:
+        # A route needs at least two stops; leave odd requests to the LLM.
+        confidence = min(confidence, 0.5)
+    if re.search(r"\bгород\w*\b", normalized_text) or _BACKWARD_ORDER_RE.search(normalized_text):
+        # An explicitly named city or backward references are better left to the crew.
+        confidence = min(confidence, 0.5)
+    return FastExtraction(places=ExtractedPlaces(places=places), confidence=confidence)
+
+
+def _split(text: str, pattern: re.Pattern, offset: int) -> List[Tuple[str, int, str]]:
+    """
+    Splits `text` by `pattern`. Returns non-blank parts with their offsets (shifted by `offset`)
+    and the stripped separator that preceded each part.
+    """
+    parts = []
+    position = 0
+    separator = ""
+    for match in pattern.finditer(text):
+        if text[position:match.start()].strip():
+            parts.append((text[position:match.start()], offset + position, separator))
+        position = match.end()
+        separator = match.group(0).strip()
+    if text[position:].strip():
+        parts.append((text[position:], offset + position, separator))
+    return parts
+
+
+def _time_key(time: Optional[str]) -> Optional[int]:
+    if not time:
+        return None
+    hour, minute = time.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def to_itinerary(extracted: ExtractedPlaces, current_location: str = "Unknown") -> Itinerary:
+    """
+    Orders extracted places the way time_sorting_task does: places with explicit times
+    chronologically, places without a time right after the place mentioned before them.
+    """
+    keyed = []
+    last_key = -1
+    for index, (name, time) in enumerate(extracted.places.items()):
+        key = _time_key(time)
+        if key is not None:
+            last_key = key
+        keyed.append(((last_key if key is None else key, index), name, time))
+    keyed.sort(key=lambda item: item[0])
+    return Itinerary(
+        locations=[LocationWithTime(name=name, time=time) for _, name, time in keyed],
+        current_location=current_location,
+    )
+
+
+def fast_extract_itinerary(text: str, min_confidence: float) -> Optional[Itinerary]:
+    """Returns an itinerary when the rule-based extractor is confident enough, None otherwise."""
+    extraction = extract_places(text)
+    logger.info(f"Fast-path extraction confidence {extraction.confidence:.2f}: {extraction.places.places}")
+    if extraction.confidence < min_confidence:
+        return None
+    return to_itinerary(extraction.places)
@@ -0,0 +1,59 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Optional
+
+import httpx
+
+from route_planner_agent.models import ExtractedPlaces # type:ignore
+
+from backend.app.services.geocoding import geocode_locations
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class GeocodePrefetch:
+    """
+    Geocodes the places found by `extract_task` as soon as that task completes, while the
+    crew still runs `time_sorting_task` (a second LLM call that only reorders them).
+
+    The results land in the geocoding cache, so geocoding the final itinerary afterwards
+    costs cache lookups: only places the second task renamed, and generic places whose
+    preceding stop changed (they are searched near it), are geocoded again.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient], fallback_city: str):
+        self.client = client
+        self.fallback_city = fallback_city
+        self._loop = asyncio.get_running_loop()
+        # The request's context (metrics endpoint label, trace, deadline) for the geocoding task
+        self._context = contextvars.copy_context()
+        self._task: Optional[asyncio.Task] = None
+
+    def on_extract_task(self, output: Any) -> None:
+        """crewAI task callback; runs in the crew pool thread right after extract_task."""
+        try:
+            extracted = ExtractedPlaces.model_validate(output.json_dict)
+        except Exception as e:
+            logger.info(f"No places to prefetch from extract_task output: {e}")
+            return
+        names = list(extracted.places)
+        city = extracted.current_location or self.fallback_city
+        self._loop.call_soon_threadsafe(self._start, names, city, context=self._context)
+
+    def _start(self, names: list, city: str) -> None:
+        logger.debug("Prefetching geocodes of %s in %s", names, city)
+        self._task = asyncio.create_task(self._geocode(names, city))
+
+    async def _geocode(self, names: list, city: str) -> None:
+        try:
+            await geocode_locations(names, city=city, client=self.client)
+        except Exception as e:
+            # The final geocoding reports failures for the places that are still in the itinerary.
+            logger.info(f"Geocode prefetch failed: {e}")
+
+    async def wait(self) -> None:
+        """Lets the prefetch finish, so that the final geocoding does not repeat its requests."""
+        if self._task is not None:
+            await self._task
@@ -1,9 +1,16 @@
+import asyncio
 import logging
 import os
-from typing import List, Optional
+from typing import Callable, List, Optional
 import httpx
 from fastapi import HTTPException
 
+from backend.app.repository.geocode_cache import GeocodeCache
+from backend.app.services.http_clients import client_or_default
+from backend.app.services.poi_index import find_local_poi
+from backend.app.services.resilience import UpstreamUnavailable, places_upstream
+from backend.app.services.singleflight import geocode_flights
+from backend.app.services.tracing import annotate, span
 from backend.app.settings.config import API_Settings
 
 settings = API_Settings()
@@ -11,6 +18,16 @@ settings = API_Settings()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+geocode_cache = GeocodeCache(
+    precision=settings.geocode_cache_point_precision,
+    maxsize=settings.geocode_cache_size,
+    ttl=settings.geocode_cache_ttl,
+    negative_ttl=settings.geocode_cache_negative_ttl,
+    db_path=settings.geocode_cache_db_path,
+    db_maxsize=settings.geocode_cache_db_size,
+    stale_ttl=settings.stale_cache_ttl,
+)
+
 PLACE_TYPE_MAPPING = {
     'кафе': 'кафе',
     'кофейня': 'кофейня', 
@@ -64,30 +81,64 @@ def get_place_search_query(location: str) -> str:
             return search_query
     return location 
 
+async def _lookup_cached_coordinates(cache_key: str) -> Optional[List[float]]:
+    """
+    Returns cached coordinates, raises 404 for a cached "not found" and None on a miss.
+    """
+    entry = await geocode_cache.aget(cache_key)
+    if entry is None:
+        return None
+    annotate({"cache.hit": True, "cache.negative": entry.negative})
+    if entry.negative:
+        logger.info(f"Geocode cache negative hit for '{cache_key}'")
+        raise HTTPException(status_code=404, detail=entry.value)
+    logger.info(f"Geocode cache hit for '{cache_key}'")
+    return entry.value
+
+async def _serve_stale(cache_key: str, error: UpstreamUnavailable) -> List[float]:
+    """
+    Falls back to expired cached coordinates while the Places API is unavailable,
+    re-raises the error when there are none.
+    """
+    entry = await geocode_cache.aget_stale(cache_key)
+    if entry is None:
+        raise error
+    logger.warning(f"{error.detail}. Serving stale coordinates for '{cache_key}'")
+    return entry.value
+
 async def _find_poi_nearby(location: str, near_coordinates: List[float], client: httpx.AsyncClient) -> List[float]:
     """
     Searches for a POI (Point of Interest) of a certain type near the specified coordinates.
-    Returns the coordinates of the first POI found.
+    Returns the coordinates of the first POI found. The local POI index answers first when
+    it is configured; the Places API is asked when it has no such POI nearby.
     """
+    search_query = get_place_search_query(location)
+    local = find_local_poi(search_query, near_coordinates)
+    if local is not None:
+        return local
+
+    cache_key = geocode_cache.key("poi", search_query, reference_point=near_coordinates)
+    cached = await _lookup_cached_coordinates(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        search_query = get_place_search_query(location)
-        
         params = {
             "q": search_query,
             "key": settings.gis_key,
             "fields": "items.point,items.name",
             "point": f"{near_coordinates[0]},{near_coordinates[1]}",
-            "radius": 2000,
+            "radius": int(settings.poi_search_radius),
             "sort": "distance",
             "page_size": 1
         }
         
         logger.info(f"Searching for POI: '{search_query}' near {near_coordinates}")
         
-        response = await client.get(
-            settings.places_api_url,
-            params=params,
-            timeout=10.0
+        response = await places_upstream.call(
+            lambda timeout: client.get(settings.places_api_url, params=params, timeout=timeout),
+            retry=True,
+            hedge=True,
         )
         response.raise_for_status()
         data = response.json()
@@ -95,6 +146,7 @@ async def _find_poi_nearby(location: str, near_coordinates: List[float], client:
         if data.get("meta", {}).get("code") != 200 or not data.get("result", {}).get("items"):
             error_detail = f"POI search API returned no results for: '{location}'. Response: {data}"
             logger.error(error_detail)
+            await geocode_cache.aset_negative(cache_key, error_detail)
             raise HTTPException(status_code=404, detail=error_detail)
 
         item = data["result"]["items"][0] 
@@ -102,14 +154,23 @@ async def _find_poi_nearby(location: str, near_coordinates: List[float], client:
         if "point" not in item:
             error_detail = f"POI '{location}' found, but no coordinates. Full item: {item}"
             logger.error(error_detail)
+            await geocode_cache.aset_negative(cache_key, error_detail)
             raise HTTPException(status_code=404, detail=error_detail)
 
-        logger.info(f"Found POI: '{item.get('name', 'Unknown')}' at {[item['point']['lon'], item['point']['lat']]}")
-        return [item["point"]["lon"], item["point"]["lat"]]
+        coords = [item["point"]["lon"], item["point"]["lat"]]
+        logger.info(f"Found POI: '{item.get('name', 'Unknown')}' at {coords}")
+        await geocode_cache.aset(cache_key, coords)
+        return coords
 
+    except UpstreamUnavailable as e:
+        return await _serve_stale(cache_key, e)
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         error_detail = f"Error from 2GIS POI API for '{location}': {e.response.status_code} - {e.response.text}"
         logger.error(error_detail, exc_info=True)
+        if e.response.status_code == 404:
+            await geocode_cache.aset_negative(cache_key, error_detail)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
     except Exception as e:
         error_detail = f"Internal error during POI search for '{location}': {str(e)}"
@@ -118,8 +179,13 @@ async def _find_poi_nearby(location: str, near_coordinates: List[float], client:
 
 async def _geocode_specific_address(location: str, client: httpx.AsyncClient, city: Optional[str] = None) -> List[float]:
     """
-    eocodes a specific address or place name.
+    Geocodes a specific address or place name.
     """
+    cache_key = geocode_cache.key("address", location, city=city)
+    cached = await _lookup_cached_coordinates(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         search_query = f"{city}, {location}" if city else location
         params = {
@@ -131,10 +197,10 @@ async def _geocode_specific_address(location: str, client: httpx.AsyncClient, ci
         
         logger.info(f"Geocoding specific address: '{search_query}'")
         
-        response = await client.get(
-            settings.places_api_url,
-            params=params,
-            timeout=10.0
+        response = await places_upstream.call(
+            lambda timeout: client.get(settings.places_api_url, params=params, timeout=timeout),
+            retry=True,
+            hedge=True,
         )
         response.raise_for_status()
         data = response.json()
@@ -142,6 +208,7 @@ async def _geocode_specific_address(location: str, client: httpx.AsyncClient, ci
         if data.get("meta", {}).get("code") != 200 or not data.get("result", {}).get("items"):
             error_detail = f"Geocoding API returned no results for location: '{location}'. Response: {data}"
             logger.error(error_detail)
+            await geocode_cache.aset_negative(cache_key, error_detail)
             raise HTTPException(status_code=404, detail=error_detail)
 
         item = data["result"]["items"][0]
@@ -149,14 +216,23 @@ async def _geocode_specific_address(location: str, client: httpx.AsyncClient, ci
         if "point" not in item:
             error_detail = f"Location '{location}' found, but no coordinates. Full item: {item}"
             logger.error(error_detail)
+            await geocode_cache.aset_negative(cache_key, error_detail)
             raise HTTPException(status_code=404, detail=error_detail)
 
-        logger.info(f"Geocoded '{item.get('name', location)}' to {[item['point']['lon'], item['point']['lat']]}")
-        return [item["point"]["lon"], item["point"]["lat"]]
+        coords = [item["point"]["lon"], item["point"]["lat"]]
+        logger.info(f"Geocoded '{item.get('name', location)}' to {coords}")
+        await geocode_cache.aset(cache_key, coords)
+        return coords
 
+    except UpstreamUnavailable as e:
+        return await _serve_stale(cache_key, e)
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         error_detail = f"Error from 2GIS Geocoding API for location '{location}': {e.response.status_code} - {e.response.text}"
         logger.error(error_detail, exc_info=True)
+        if e.response.status_code == 404:
+            await geocode_cache.aset_negative(cache_key, error_detail)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
     except Exception as e:
         error_detail = f"Internal error during geocoding for location '{location}': {str(e)}"
@@ -167,42 +243,81 @@ async def _geocode_one_location(location: str, client: httpx.AsyncClient, city:
     """
     Geocodes a single location by specifying the type (a specific address or a general concept).
     """
+    generic = bool(is_generic_place(location) and reference_point)
+    attributes = {"geocode.query": location, "geocode.city": city, "geocode.kind": "poi" if generic else "address"}
+    with span("geocode_one_location", attributes):
+        # Concurrent requests for the same place share one lookup, keyed like its cache entry;
+        # each of them gets its own copy of the coordinates.
+        if generic:
+            logger.info(f"'{location}' identified as generic place, searching nearby POI")
+            key = geocode_cache.key("poi", get_place_search_query(location), reference_point=reference_point)
+            return list(await geocode_flights.do(key, lambda: _find_poi_nearby(location, reference_point, client)))
+        else:
 
-    if is_generic_place(location) and reference_point:
-        logger.info(f"'{location}' identified as generic place, searching nearby POI")
-        return await _find_poi_nearby(location, reference_point, client)
-    else:
-
-        logger.info(f"'{location}' identified as specific address/name")
-        return await _geocode_specific_address(location, client, city)
+            logger.info(f"'{location}' identified as specific address/name")
+            key = geocode_cache.key("address", location, city=city)
+            return list(await geocode_flights.do(key, lambda: _geocode_specific_address(location, client, city)))
 
-async def geocode_locations(locations: List[str], city: Optional[str] = None) -> List[List[float]]:
+async def geocode_locations(
+    locations: List[str],
+    city: Optional[str] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    on_resolved: Optional[Callable[[int, List[float]], None]] = None,
+) -> List[List[float]]:
     """
     Geocodes a list of locations into coordinates.
     For general concepts, it uses previous coordinates as a reference point.
+    Uses the shared Places client when one is given.
+
+    Specific addresses do not depend on each other and are resolved concurrently
+    (bounded by `geocode_concurrency`). A general concept waits only for the
+    coordinate of its anchor (the previous location) and is resolved as soon as
+    that one is known. The output order matches the input order.
+    `on_resolved(index, coords)` is called as soon as each location is resolved.
     """
-    async with httpx.AsyncClient() as client:
-        coordinates = []
-        
-        for i, location in enumerate(locations):
-            logger.info(f"Processing location {i+1}/{len(locations)}: '{location}'")
-            
+    async with client_or_default(client, settings.places_timeout) as client:
+        semaphore = asyncio.Semaphore(settings.geocode_concurrency)
+        tasks: List[asyncio.Task] = []
+
+        async def resolve(i: int, location: str) -> List[float]:
             # For the first location, we use the city as the context.
-            # For subsequent locations, we use the previous coordinate as the reference point.
-            reference_point = coordinates[-1] if coordinates else None
-            
-            try:
+            # For subsequent generic places, we use the previous coordinate as the reference point.
+            reference_point = None
+            if i > 0 and is_generic_place(location):
+                reference_point = await asyncio.shield(tasks[i - 1])
+
+            async with semaphore:
+                logger.info(f"Processing location {i+1}/{len(locations)}: '{location}'")
                 coords = await _geocode_one_location(
                     location, 
                     client, 
                     city=city, 
                     reference_point=reference_point
                 )
-                coordinates.append(coords)
-                logger.info(f"Successfully geocoded '{location}' to {coords}")
-                
-            except Exception as e:
-                logger.error(f"Failed to geocode '{location}': {str(e)}")
-                raise
-        
-        return coordinates
\ No newline at end of file
+            logger.info(f"Successfully geocoded '{location}' to {coords}")
+            if on_resolved is not None:
+                on_resolved(i, coords)
+            return coords
+
+        for i, location in enumerate(locations):
+            tasks.append(asyncio.create_task(resolve(i, location)))
+
+        try:
+            # Stop at the first failure: the lookups still pending would only spend
+            # Places API quota and the request deadline on a request that fails anyway.
+            if tasks:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+        # Let the cancelled lookups unwind before the client is closed.
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Report the failure earliest in the itinerary; the cancelled lookups
+        # end with CancelledError, which is not an Exception.
+        for location, result in zip(locations, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to geocode '{location}': {str(result)}")
+                raise result
+
+        return results
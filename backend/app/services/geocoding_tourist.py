@@ -1,16 +1,21 @@
 import logging
-import os
 from typing import List, Optional
 import httpx
 from fastapi import HTTPException
 import asyncio
 
+from backend.app.services.geocoding import geocode_cache, _lookup_cached_coordinates, _serve_stale
+from backend.app.services.http_clients import client_or_default
+from backend.app.services.resilience import UpstreamUnavailable, places_upstream
+from backend.app.services.singleflight import geocode_flights
+from backend.app.services.tracing import span
+from backend.app.settings.config import API_Settings
+
+settings = API_Settings()
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
-API_KEY = os.getenv("2GIS_API_KEY", "28d221a8-de07-4498-8136-3b345e2e4b99")
-PLACES_API_URL = "https://catalog.api.2gis.com/3.0/items"
-
 
 def mock_llm_geocoding(text: str) -> List[str]:
     """
@@ -25,15 +30,28 @@ async def _geocode_one_location(location: str, client: httpx.AsyncClient, city:
     """
     Geocodes a single location string to coordinates using 2GIS Places API.
     Helper for geocode_locations.
+    Uses the geocoding cache of the personal route planner under its own "tourist" keys,
+    since it sends a different query for the same location.
     """
+    with span("geocode_one_location", {"geocode.query": location, "geocode.city": city, "geocode.kind": "tourist"}):
+        cache_key = geocode_cache.key("tourist", location, city=city)
+        cached = await _lookup_cached_coordinates(cache_key)
+        if cached is not None:
+            return cached
+        # Concurrent requests for the same place share one Places request, each gets its own copy.
+        return list(await geocode_flights.do(cache_key, lambda: _request_location(location, client, city, cache_key)))
+
+
+async def _request_location(location: str, client: httpx.AsyncClient, city: Optional[str], cache_key: str) -> List[float]:
+    """Places API request of _geocode_one_location, caching the outcome under `cache_key`."""
     try:
         search_query = f"{city}, {location}" if city else location
-        params = {"q": search_query, "key": API_KEY, "fields": "items.point"}
-        
-        response = await client.get(
-            PLACES_API_URL,
-            params=params,
-            timeout=10.0
+        params = {"q": search_query, "key": settings.gis_key, "fields": "items.point"}
+
+        response = await places_upstream.call(
+            lambda timeout: client.get(settings.places_api_url, params=params, timeout=timeout),
+            retry=True,
+            hedge=True,
         )
         response.raise_for_status()
         data = response.json()
@@ -41,20 +59,30 @@ async def _geocode_one_location(location: str, client: httpx.AsyncClient, city:
         if data.get("meta", {}).get("code") != 200 or not data.get("result", {}).get("items"):
             error_detail = f"Geocoding API returned success status but no valid data for location: '{location}'. Response: {data}"
             logger.error(error_detail)
+            await geocode_cache.aset_negative(cache_key, error_detail)
             raise HTTPException(status_code=404, detail=error_detail)
 
         item = data["result"]["items"][0]
-        
+
         if "point" not in item:
             error_detail = f"Location '{location}' found, but it does not have coordinate information. Full item response: {item}"
             logger.error(error_detail)
+            await geocode_cache.aset_negative(cache_key, error_detail)
             raise HTTPException(status_code=404, detail=error_detail)
 
-        return [item["point"]["lon"], item["point"]["lat"]]
+        coords = [item["point"]["lon"], item["point"]["lat"]]
+        await geocode_cache.aset(cache_key, coords)
+        return coords
 
+    except UpstreamUnavailable as e:
+        return await _serve_stale(cache_key, e)
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         error_detail = f"Error from 2GIS Geocoding API for location '{location}': {e.response.status_code} - {e.response.text}"
         logger.error(error_detail, exc_info=True)
+        if e.response.status_code == 404:
+            await geocode_cache.aset_negative(cache_key, error_detail)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
     except Exception as e:
         error_detail = f"Internal error during geocoding for location '{location}': {str(e)}"
@@ -62,11 +90,12 @@ async def _geocode_one_location(location: str, client: httpx.AsyncClient, city:
         raise HTTPException(status_code=500, detail=error_detail)
 
 
-async def geocode_locations_tourist(locations: List[str], city: Optional[str] = None) -> List[List[float]]:
+async def geocode_locations_tourist(locations: List[str], city: Optional[str] = None, client: Optional[httpx.AsyncClient] = None) -> List[List[float]]:
     """
     Geocodes a list of location strings to a list of coordinates.
+    Uses the shared Places client when one is given.
     """
-    async with httpx.AsyncClient() as client:
+    async with client_or_default(client, settings.places_timeout) as client:
         tasks = [_geocode_one_location(loc, client, city=city) for loc in locations]
         coordinates = await asyncio.gather(*tasks)
         return coordinates
\ No newline at end of file
@@ -0,0 +1,158 @@
+import math
+import re
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+_LINESTRING_WRAPPER_RE = re.compile(r"LINESTRING\s*\(|\)")
+
+EARTH_RADIUS_M = 6_371_008.8
+# Ground resolution of a 256 px Web Mercator tile at zoom 0 on the equator, in meters per pixel
+_METERS_PER_PIXEL_Z0 = 2 * math.pi * 6_378_137 / 256
+
+# Upper bound of 5-bit chunks per polyline value: 7 * 5 bits covers any 32-bit value.
+_POLYLINE_MAX_CHUNKS = 7
+
+
+def parse_linestrings(linestrings: Iterable[str]) -> np.ndarray:
+    """
+    Parses WKT 'LINESTRING(lon1 lat1, lon2 lat2, ...)' strings into one float64 (N, 2) array.
+    All geometries are joined and parsed in a single NumPy call instead of a float() per coordinate.
+    """
+    body = _LINESTRING_WRAPPER_RE.sub(" ", " ".join(linestrings)).replace(",", " ")
+    coords = np.fromstring(body, dtype=np.float64, sep=" ")
+    if coords.size % 2:
+        raise ValueError("LINESTRING contains an odd number of coordinates")
+    return coords.reshape(-1, 2)
+
+
+def join_paths(paths: Iterable[np.ndarray]) -> np.ndarray:
+    """Concatenates (N, 2) paths, dropping the duplicated point where two paths meet."""
+    parts = []
+    for path in paths:
+        if len(path) == 0:
+            continue
+        if parts and np.array_equal(parts[-1][-1], path[0]):
+            path = path[1:]
+        parts.append(path)
+    return np.concatenate(parts) if parts else np.empty((0, 2))
+
+
+def encode_polyline(coords: np.ndarray, precision: int = 5) -> str:
+    """
+    Encodes (lon, lat) pairs with the Google Encoded Polyline Algorithm (lat, lon order
+    on the wire, as expected by common decoders), vectorized over all values at once.
+    """
+    if len(coords) == 0:
+        return ""
+    scaled = np.round(coords[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = (deltas << 1) ^ (deltas >> 63)
+
+    shifts = np.arange(_POLYLINE_MAX_CHUNKS, dtype=np.int64) * 5
+    chunks = (values[:, None] >> shifts) & 0x1F
+    # A value needs chunks up to its highest non-zero one, and always at least one.
+    remaining = values[:, None] >> shifts
+    used = (remaining > 0) | (shifts == 0)
+    last = used & ~np.roll(used, -1, axis=1)
+    last[:, -1] = used[:, -1]
+    chunks = np.where(last, chunks, chunks | 0x20) + 63
+    return chunks[used].astype(np.uint8).tobytes().decode("ascii")
+
+
+def decode_polyline(polyline: str, precision: int = 5) -> np.ndarray:
+    """Inverse of encode_polyline, returns (lon, lat) pairs."""
+    values = []
+    value, shift = 0, 0
+    for char in polyline.encode("ascii"):
+        chunk = char - 63
+        value |= (chunk & 0x1F) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    coords = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return coords[:, ::-1]
+
+
+def _to_local_meters(coords: np.ndarray, latitude: float) -> np.ndarray:
+    """Equirectangular projection around `latitude`, accurate enough within a city."""
+    radians = np.radians(coords)
+    return np.column_stack((radians[:, 0] * EARTH_RADIUS_M * math.cos(math.radians(latitude)),
+                            radians[:, 1] * EARTH_RADIUS_M))
+
+
+def douglas_peucker_mask(xy: np.ndarray, tolerance: float, keep: Iterable[int] = ()) -> np.ndarray:
+    """
+    Douglas–Peucker over planar points: returns a boolean mask of the points to keep.
+    The indices in `keep` (and both ends) are always kept and split the line into
+    independently simplified spans. The recursion runs level by level: all spans of
+    a level are measured in one NumPy pass, so there are O(log N) passes instead of
+    one Python iteration per kept point.
+    """
+    n = len(xy)
+    mask = np.zeros(n, dtype=bool)
+    if n <= 2:
+        mask[:] = True
+        return mask
+
+    breaks = np.array(sorted({0, n - 1, *(int(i) for i in keep)}))
+    mask[breaks] = True
+    starts, ends = breaks[:-1], breaks[1:]
+    while True:
+        open_spans = ends - starts >= 2
+        starts, ends = starts[open_spans], ends[open_spans]
+        if not len(starts):
+            return mask
+
+        # Interior point indices of every span, laid out span after span.
+        counts = ends - starts - 1
+        offsets = np.cumsum(counts) - counts
+        span_of_point = np.repeat(np.arange(len(starts)), counts)
+        indices = starts[span_of_point] + 1 + np.arange(counts.sum()) - offsets[span_of_point]
+
+        a, b = xy[starts][span_of_point], xy[ends][span_of_point]
+        ab = b - a
+        length_sq = np.einsum("ij,ij->i", ab, ab)
+        t = np.einsum("ij,ij->i", xy[indices] - a, ab) / np.where(length_sq == 0, 1.0, length_sq)
+        projections = a + np.clip(t, 0.0, 1.0)[:, None] * ab
+        distances = np.hypot(*(xy[indices] - projections).T)
+
+        # The farthest point of each span (the first one on ties).
+        max_distances = np.maximum.reduceat(distances, offsets)
+        is_max = distances == max_distances[span_of_point]
+        _, first = np.unique(span_of_point[is_max], return_index=True)
+        farthest = indices[np.flatnonzero(is_max)[first]]
+
+        split = max_distances > tolerance
+        farthest = farthest[split]
+        mask[farthest] = True
+        starts, ends = np.concatenate((starts[split], farthest)), np.concatenate((farthest, ends[split]))
+
+
+def zoom_tolerance(zoom: float, latitude: float, pixels: float = 1.0) -> float:
+    """Ground distance in meters covered by `pixels` screen pixels at the given map zoom."""
+    return pixels * _METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def simplify_route(
+    coords: np.ndarray,
+    tolerance: float,
+    keep_points: Optional[Sequence[Sequence[float]]] = None,
+) -> np.ndarray:
+    """
+    Simplifies a (N, 2) [lon, lat] route with Douglas–Peucker, `tolerance` in meters.
+    For every point in `keep_points` (the itinerary stops) the nearest route vertex is
+    kept as is, so the simplified line still passes exactly where it did at each stop.
+    """
+    if len(coords) <= 2 or tolerance <= 0:
+        return coords
+    latitude = float(coords[:, 1].mean())
+    xy = _to_local_meters(coords, latitude)
+
+    keep = []
+    if keep_points:
+        stops = _to_local_meters(np.asarray(keep_points, dtype=np.float64).reshape(-1, 2), latitude)
+        keep = [int(np.argmin(np.einsum("ij,ij->i", xy - stop, xy - stop))) for stop in stops]
+
+    return coords[douglas_peucker_mask(xy, tolerance, keep)]
@@ -0,0 +1,71 @@
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+from fastapi.requests import HTTPConnection
+
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UpstreamClients:
+    """App-scoped, connection-pooled HTTP clients, one per upstream API."""
+    places: httpx.AsyncClient
+    routing: httpx.AsyncClient
+    stt: httpx.AsyncClient
+
+    async def aclose(self) -> None:
+        for client in (self.places, self.routing, self.stt):
+            await client.aclose()
+
+
+def _build_client(settings: API_Settings, timeout: float, http2: bool) -> httpx.AsyncClient:
+    """
+    Creates a pooled client with the shared pool limits and an upstream-specific timeout.
+    """
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=httpx.Timeout(timeout, connect=settings.http_connect_timeout),
+        http2=http2,
+    )
+
+
+def create_upstream_clients(settings: API_Settings) -> UpstreamClients:
+    """
+    Creates the clients for 2GIS Places, 2GIS Routing and Yandex SpeechKit.
+    Meant to be called once in the application lifespan.
+    """
+    logger.info("Creating pooled upstream HTTP clients")
+    return UpstreamClients(
+        places=_build_client(settings, settings.places_timeout, settings.places_http2),
+        routing=_build_client(settings, settings.routing_timeout, settings.routing_http2),
+        stt=_build_client(settings, settings.stt_timeout, settings.stt_http2),
+    )
+
+
+def get_upstream_clients(connection: HTTPConnection) -> UpstreamClients:
+    """FastAPI dependency (HTTP and WebSocket) returning the clients created in the application lifespan."""
+    return connection.app.state.upstream_clients
+
+
+@asynccontextmanager
+async def client_or_default(client: Optional[httpx.AsyncClient], timeout: float) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Yields the given shared client, or a short-lived one when the caller has none
+    (e.g. scripts running outside the FastAPI app).
+    """
+    if client is not None:
+        yield client
+    else:
+        async with httpx.AsyncClient(timeout=timeout) as own_client:
+            yield own_client
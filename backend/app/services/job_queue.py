@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from backend.app.repository.job_store import Job, JobStore
+from backend.app.services.http_clients import UpstreamClients
+from backend.app.services.resilience import request_deadline
+from backend.app.services.tracing import SpanKind, span
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+# Runs a job of one kind and returns its result as the JSON response body
+JobRunner = Callable[[Job, UpstreamClients], Awaitable[bytes]]
+
+
+class JobQueue:
+    """
+    Background execution of long pipelines (`?async=1`). Jobs are stored in a SQLite JobStore,
+    so that they survive restarts and can be run by the API processes' workers as well as by
+    standalone worker processes (backend/worker.py) sharing the database. Each process runs
+    `workers` asyncio workers; they wake up on jobs submitted in the same process and poll
+    the store every `poll_interval` seconds for the others. SQLite calls block (up to the busy
+    timeout while another process writes), so they run in a thread of their own. A job that fails with a 503 is
+    retried after a backoff, up to the store's `max_attempts`.
+    """
+
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._runners: Dict[str, JobRunner] = {}
+        self._store: Optional[JobStore] = None
+        # One thread is enough: the store serializes its calls anyway.
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        self._tasks: List[asyncio.Task] = []
+        self._submitted = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "retried": 0}
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = JobStore(
+                settings.job_db_path,
+                lease=settings.job_timeout + settings.job_lease_margin,
+                max_attempts=settings.job_max_attempts,
+                result_ttl=settings.job_result_ttl,
+            )
+        return self._store
+
+    def register(self, kind: str, runner: JobRunner) -> None:
+        self._runners[kind] = runner
+
+    async def _call(self, method: str, *args: Any) -> Any:
+        """Calls a JobStore method in the store's thread, off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, lambda: getattr(self.store, method)(*args))
+
+    async def submit(self, kind: str, params: Dict[str, Any], audio: Optional[bytes] = None) -> str:
+        if kind not in self._runners:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = await self._call("create", kind, params, audio)
+        self._counters["submitted"] += 1
+        self._submitted.set()
+        return job_id
+
+    def start(self, clients: UpstreamClients) -> None:
+        """Starts the workers; meant to be called once in the application lifespan."""
+        if self.workers <= 0:
+            return
+        purged = self.store.purge()
+        if purged:
+            logger.info(f"Purged {purged} finished jobs")
+        logger.info(f"Starting {self.workers} job workers")
+        self._tasks = [asyncio.create_task(self._worker(clients)) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stops the workers; the jobs they were running go back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, clients: UpstreamClients) -> None:
+        while True:
+            job = await self._call("claim")
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._submitted.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._submitted.clear()
+                continue
+            await self._run(job, clients)
+
+    async def _run(self, job: Job, clients: UpstreamClients) -> None:
+        runner = self._runners.get(job.kind)
+        attributes = {"job.id": job.id, "job.kind": job.kind, "job.attempt": job.attempts}
+        try:
+            if runner is None:
+                raise HTTPException(status_code=500, detail=f"No runner for jobs of kind '{job.kind}'")
+            # The deadline caps the upstream calls, the timeout the whole run (crew kickoffs
+            # included), so that the job is over before its lease expires.
+            async with asyncio.timeout(settings.job_timeout):
+                with request_deadline(settings.job_timeout), span(f"job {job.kind}", attributes, kind=SpanKind.CONSUMER):
+                    result = await runner(job, clients)
+            if await self._call("finish", job, result):
+                self._counters["completed"] += 1
+        except asyncio.CancelledError:
+            await self._call("release", job)
+            raise
+        except TimeoutError:
+            await self._fail(job, 504, f"The job did not finish in {settings.job_timeout:g} s")
+        except HTTPException as e:
+            if e.status_code == 503 and await self._retry(job, e):
+                return
+            await self._fail(job, e.status_code, str(e.detail))
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+            await self._fail(job, 500, str(e))
+        finally:
+            # Wake up the long-polls of this process; they check whether their job is the one.
+            finished, self._finished = self._finished, asyncio.Event()
+            finished.set()
+
+    async def _retry(self, job: Job, error: HTTPException) -> bool:
+        """
+        Requeues a job that failed with a transient 503 (crew pool saturated, upstream unavailable)
+        with an exponential backoff, at least the Retry-After of the error.
+        """
+        delay = settings.job_retry_backoff * 2 ** (job.attempts - 1)
+        retry_after = (error.headers or {}).get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        if not await self._call("retry", job, delay, str(error.detail)):
+            return False
+        logger.warning(f"Job {job.id} failed transiently (attempt {job.attempts}), retrying in {delay:g} s: {error.detail}")
+        self._counters["retried"] += 1
+        return True
+
+    async def _fail(self, job: Job, status_code: int, detail: str) -> None:
+        if await self._call("fail", job, status_code, detail):
+            self._counters["failed"] += 1
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """
+        Long-poll: the job as soon as it is finished, or as it is after `timeout` seconds.
+        None for an unknown (or purged) job.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self._call("get", job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.finished or remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(self._finished.wait(), min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "workers": len(self._tasks), "jobs": self.store.stats()}
+
+
+job_queue = JobQueue(settings.job_workers, settings.job_poll_interval)
@@ -0,0 +1,129 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Sequence, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram (seconds) with fixed upper bounds, Prometheus-style."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._count += 1
+            self._sum += seconds
+            for i, upper_bound in enumerate(self.buckets):
+                if seconds <= upper_bound:
+                    self._counts[i] += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "buckets": {str(upper_bound): count for upper_bound, count in zip(self.buckets, self._counts)},
+        }
+
+
+class PathStats:
+    """Request counters and latency histograms per execution path (e.g. fast path vs. LLM crew)."""
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, path: str, seconds: float) -> None:
+        histogram = self._histograms.get(path)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(path, LatencyHistogram())
+        histogram.observe(seconds)
+
+    def as_dict(self) -> Dict[str, Dict]:
+        return {path: histogram.as_dict() for path, histogram in self._histograms.items()}
+
+
+# Prometheus metrics. Stage and upstream metrics carry the endpoint the request came in
+# through; any path that is not a pipeline endpoint is "other", keeping the label set bounded.
+PIPELINE_ENDPOINTS = (
+    "/stt-route", "/stt-route/stream", "/stt-route/ws", "/stt-route-tourist", "/batch-route", "/batch-route/audio",
+)
+
+_endpoint: ContextVar[str] = ContextVar("metrics_endpoint", default="other")
+
+STAGE_SECONDS = Histogram(
+    "voice_route_stage_seconds", "Duration of the voice-to-route pipeline stages",
+    ["endpoint", "stage"], buckets=DEFAULT_LATENCY_BUCKETS,
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "voice_route_upstream_request_seconds", "Duration of single upstream API requests",
+    ["endpoint", "upstream"], buckets=DEFAULT_LATENCY_BUCKETS,
+)
+UPSTREAM_RESPONSES = Counter(
+    "voice_route_upstream_responses_total", "Upstream API responses by status code ('error' for transport errors)",
+    ["endpoint", "upstream", "status"],
+)
+LLM_TOKENS = Counter(
+    "voice_route_llm_tokens_total", "LLM tokens used by crew kickoffs",
+    ["endpoint", "crew", "kind"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "voice_route_requests_in_flight", "Requests being processed",
+    ["endpoint"],
+)
+
+
+def endpoint_label(path: str) -> str:
+    """The metrics label of a request path ("/api/stt-route" -> "/stt-route")."""
+    path = path[4:] if path.startswith("/api/") else path
+    return path if path in PIPELINE_ENDPOINTS else "other"
+
+
+def current_endpoint() -> str:
+    return _endpoint.get()
+
+
+@contextmanager
+def request_metrics(path: str) -> Iterator[None]:
+    """Labels the metrics recorded while handling the request and counts it as in flight."""
+    label = endpoint_label(path)
+    token = _endpoint.set(label)
+    gauge = REQUESTS_IN_FLIGHT.labels(label)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+        _endpoint.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times a pipeline stage into voice_route_stage_seconds, also when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(_endpoint.get(), name).observe(time.perf_counter() - started)
+
+
+def record_token_usage(crew_name: str, crew_output: Any) -> None:
+    """Counts the prompt, completion and cached prompt tokens reported by a crewAI kickoff."""
+    usage = getattr(crew_output, "token_usage", None)
+    if usage is None:
+        return
+    endpoint = _endpoint.get()
+    for kind in ("prompt_tokens", "completion_tokens", "cached_prompt_tokens"):
+        tokens = getattr(usage, kind, 0) or 0
+        if tokens:
+            LLM_TOKENS.labels(endpoint, crew_name, kind.removesuffix("_tokens")).inc(tokens)
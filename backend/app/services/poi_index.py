@@ -0,0 +1,55 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from backend.app.repository.poi_index import PoiIndex
+from backend.app.services.tracing import annotate
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+
+def load_poi_index(path: Optional[str]) -> Optional[PoiIndex]:
+    """The index at `path` (built with backend/build_poi_index.py), None if unset or unreadable."""
+    if not path:
+        return None
+    try:
+        index = PoiIndex(path)
+    except Exception as e:
+        logger.error(f"Could not load the POI index at {path}, generic places go to the Places API: {e}")
+        return None
+    logger.info(f"Loaded the POI index at {path}: {len(index)} POIs in {len(index.categories)} categories")
+    return index
+
+
+poi_index = load_poi_index(settings.poi_index_path)
+_counters = {"hits": 0, "misses": 0, "unindexed": 0}
+
+
+def find_local_poi(category: str, near_coordinates: List[float]) -> Optional[List[float]]:
+    """
+    The nearest indexed POI of the search category within `poi_search_radius` meters,
+    None when there is no index, the category is not in it, or it has no POI that close.
+    """
+    if poi_index is None:
+        return None
+    if category not in poi_index:
+        _counters["unindexed"] += 1
+        return None
+    found = poi_index.nearest(category, near_coordinates, settings.poi_search_radius)
+    annotate({"poi_index.hit": found is not None})
+    if found is None:
+        _counters["misses"] += 1
+        return None
+    _counters["hits"] += 1
+    coords, distance = found
+    logger.info(f"Found '{category}' in the local POI index at {coords}, {distance:.0f} m away")
+    return coords
+
+
+def poi_index_stats() -> Dict[str, Any]:
+    if poi_index is None:
+        return {"loaded": False}
+    return {"loaded": True, "pois": len(poi_index), "categories": len(poi_index.categories), **_counters}
@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from backend.app.services.metrics import (
+    UPSTREAM_REQUEST_SECONDS,
+    UPSTREAM_RESPONSES,
+    LatencyHistogram,
+    current_endpoint,
+)
+from backend.app.services.tracing import span
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+
+class Deadline:
+    """Monotonic time by which the current request has to be answered, None for no limit."""
+
+    def __init__(self, at: Optional[float]):
+        self.at = at
+
+    def extend(self, at: Optional[float]) -> bool:
+        """Moves the deadline to `at` (None: no limit) if that is later; True if it moved."""
+        if self.at is None or (at is not None and at <= self.at):
+            return False
+        self.at = at
+        return True
+
+
+# The deadline of the current request (None outside of requests)
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+# Statuses that say nothing about the request itself, worth retrying and counted as upstream failures
+_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+Send = Callable[[float], Awaitable[httpx.Response]]
+
+
+class UpstreamUnavailable(HTTPException):
+    """The upstream failed after the allowed retries, the deadline ran out, or its circuit breaker is open."""
+
+    def __init__(self, upstream: str, reason: str, status_code: int = 503):
+        super().__init__(status_code=status_code, detail=f"Upstream '{upstream}' is unavailable: {reason}")
+        self.upstream = upstream
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """Sets the deadline of the current request; tasks started inside inherit it."""
+    token = _deadline.set(Deadline(time.monotonic() + seconds))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """Monotonic time of the request deadline, None when no deadline is set."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline.at
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left until the request deadline, None when no deadline is set."""
+    at = current_deadline()
+    return None if at is None else at - time.monotonic()
+
+
+def detached_deadline() -> Tuple[Deadline, Context]:
+    """
+    A copy of the current context with its own copy of the request deadline, for a call
+    shared by several requests: extending that deadline leaves the request's own as it is.
+    """
+    deadline = Deadline(current_deadline())
+    context = copy_context()
+    context.run(_deadline.set, deadline)
+    return deadline, context
+
+
+def call_timeout(upstream: str, timeout: float) -> float:
+    """The upstream's own timeout, capped by what is left of the request deadline."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return timeout
+    if remaining < settings.upstream_min_timeout:
+        raise UpstreamUnavailable(upstream, "request deadline exceeded", status_code=504)
+    return min(timeout, remaining)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for `reset_timeout`
+    seconds; then lets a single probe through (half-open) that closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.opened = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Ends a call without an outcome (cancelled, or failed for its own reasons): lets another probe through."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = "closed"
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class Upstream:
+    """
+    Calls to one upstream API: deadline-capped timeouts, retries with full-jitter exponential
+    backoff, an optional hedged second request once the first is slower than the observed p95,
+    and a circuit breaker. Keeps counters and a latency histogram for /stats.
+    """
+
+    def __init__(self, name: str, timeout: float, retries: int = 0, hedge: bool = False,
+                 limit: Optional[asyncio.Semaphore] = None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge = hedge
+        # Shared by the upstreams of one provider: requests in flight to it, hedges included
+        self.limit = limit
+        self.breaker = CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_reset_timeout)
+        self.latency = LatencyHistogram()
+        self._recent = deque(maxlen=256)
+        self._counters = {"calls": 0, "failures": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0}
+
+    def hedge_delay(self) -> Optional[float]:
+        """p95 of recent successful latencies, None until there are enough samples."""
+        if len(self._recent) < settings.hedge_min_samples:
+            return None
+        recent = sorted(self._recent)
+        return max(settings.hedge_min_delay, recent[int(len(recent) * 0.95) - 1])
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(settings.upstream_backoff_max, settings.upstream_backoff_base * 2 ** (attempt - 1)))
+
+    async def _send(self, send: Send, timeout: float) -> httpx.Response:
+        if self.limit is None:
+            return await send(timeout)
+        async with self.limit:
+            return await send(timeout)
+
+    async def _hedged(self, send: Send, timeout: float) -> httpx.Response:
+        """Sends a second request if the first has not answered after the p95 delay; the first success wins."""
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            return await self._send(send, timeout)
+
+        first = asyncio.ensure_future(self._send(send, timeout))
+        tasks: List[asyncio.Future] = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self._counters["hedges"] += 1
+                tasks.append(asyncio.ensure_future(self._send(send, timeout - delay)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._counters["hedge_wins"] += 1
+                        return task.result()
+            return first.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, send: Send, retry: bool = False, hedge: bool = False) -> httpx.Response:
+        """
+        Performs `send(timeout)` with the protections enabled for this upstream; `retry` and
+        `hedge` mark the request as safe to repeat. Returns the response for any status the
+        upstream answered deliberately (including 4xx), raises UpstreamUnavailable otherwise.
+        """
+        self._counters["calls"] += 1
+        attempts = 1 + (self.retries if retry else 0)
+        reason = "circuit breaker is open"
+        for attempt in range(attempts):
+            if attempt:
+                delay = self._backoff(attempt)
+                remaining = remaining_budget()
+                if remaining is not None and delay >= remaining:
+                    break
+                self._counters["retries"] += 1
+                await asyncio.sleep(delay)
+            # Check the deadline first, so that a 504 does not take the half-open breaker's probe.
+            timeout = call_timeout(self.name, self.timeout)
+            if not self.breaker.allow():
+                self._counters["rejected"] += 1
+                break
+
+            started = time.perf_counter()
+            endpoint = current_endpoint()
+            attributes = {"upstream": self.name, "upstream.attempt": attempt + 1, "upstream.timeout": timeout}
+            recorded = False
+            try:
+                with span(f"{self.name} request", attributes) as request_span:
+                    try:
+                        if hedge and self.hedge:
+                            response = await self._hedged(send, timeout)
+                        else:
+                            response = await self._send(send, timeout)
+                    except httpx.TransportError as e:
+                        response = None
+                        reason = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+                        request_span.set_attribute("error.type", type(e).__name__)
+                    else:
+                        request_span.set_attribute("http.status_code", response.status_code)
+
+                if response is None:
+                    UPSTREAM_RESPONSES.labels(endpoint, self.name, "error").inc()
+                else:
+                    elapsed = time.perf_counter() - started
+                    UPSTREAM_RESPONSES.labels(endpoint, self.name, str(response.status_code)).inc()
+                    UPSTREAM_REQUEST_SECONDS.labels(endpoint, self.name).observe(elapsed)
+                    if response.status_code not in _RETRYABLE_STATUSES:
+                        self.latency.observe(elapsed)
+                        self._recent.append(elapsed)
+                        self.breaker.record_success()
+                        recorded = True
+                        return response
+                    reason = f"HTTP {response.status_code}"
+
+                self._counters["failures"] += 1
+                self.breaker.record_failure()
+                recorded = True
+            finally:
+                # A cancelled call, or one that raised for reasons of its own, says nothing about
+                # the upstream; it must not keep the half-open breaker's probe slot forever.
+                if not recorded:
+                    self.breaker.release()
+            logger.warning(f"{self.name} request failed (attempt {attempt + 1}/{attempts}): {reason}")
+
+        raise UpstreamUnavailable(self.name, reason)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+            "hedge_delay": self.hedge_delay(),
+            "latency": self.latency.as_dict(),
+        }
+
+
+# All 2GIS APIs share one key and its rate limit, so one bound covers all of their requests.
+gis_limit = asyncio.Semaphore(settings.gis_max_concurrent_requests)
+
+places_upstream = Upstream("places", settings.places_timeout, retries=settings.places_retries,
+                           hedge=settings.places_hedge_enabled, limit=gis_limit)
+routing_upstream = Upstream("routing", settings.routing_timeout, hedge=settings.routing_hedge_enabled,
+                            limit=gis_limit)
+distance_matrix_upstream = Upstream("distance_matrix", settings.routing_timeout, limit=gis_limit)
+stt_upstream = Upstream("stt", settings.stt_timeout)
+
+UPSTREAMS = [places_upstream, routing_upstream, distance_matrix_upstream, stt_upstream]
+
+
+def upstream_stats() -> Dict[str, Dict[str, Any]]:
+    return {upstream.name: upstream.stats() for upstream in UPSTREAMS}
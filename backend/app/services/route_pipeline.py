@@ -0,0 +1,278 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from route_planner_agent.models import ExtractedPlaces # type:ignore
+
+from backend.app.services.crew_factory import ROUTE_EXTRACTOR, ROUTE_PLANNER, TOURIST_PLANNER
+from backend.app.services.crew_results import kickoff_cached
+from backend.app.services.fast_extract import extraction_paths, fast_extract_itinerary
+from backend.app.services.geocode_prefetch import GeocodePrefetch
+from backend.app.services.geocoding import geocode_locations
+from backend.app.services.geocoding_tourist import geocode_locations_tourist
+from backend.app.services.http_clients import UpstreamClients
+from backend.app.services.metrics import stage
+from backend.app.services.routing import MAX_ROUTE_POINTS, get_2gis_route
+from backend.app.services.scheduler import build_schedule
+from backend.app.services.stop_order import optimize_stop_order, parse_location_cookie
+from backend.app.services.stt import stt
+from backend.app.services.tracing import annotate
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+
+@dataclass
+class PlannedRoute:
+    """A built route before formatting: stops in visiting order and the route geometry."""
+    route_type: str
+    transcript: str
+    route_coords: np.ndarray
+    points_to_route: List[List[float]]
+    schedule: Optional[dict] = None
+
+
+async def transcribe(audio_bytes: bytes, content_type: Optional[str], clients: UpstreamClients) -> str:
+    """Runs Speech-to-Text, raises 400 when nothing was recognized."""
+    with stage("stt"):
+        transcript = await stt(audio_bytes, content_type=content_type, client=clients.stt)
+
+    if not transcript:
+        raise HTTPException(
+            status_code=400, detail="Could not understand audio."
+        )
+    logger.debug("Transcript: %s", transcript)
+    annotate({"voice.transcript": transcript})
+    return transcript
+
+
+def geocode_prefetch(clients: UpstreamClients, user_location: Optional[str]) -> Optional[GeocodePrefetch]:
+    """Geocoding of the extracted places during the crew's time sorting task ("llm" schedule mode)."""
+    if settings.schedule_mode != "llm" or not settings.geocode_prefetch_enabled:
+        return None
+    return GeocodePrefetch(clients.places, fallback_city=user_location or "Москва")
+
+
+async def plan_itinerary(transcript: str, prefetch: Optional[GeocodePrefetch] = None):
+    """
+    Extracts the itinerary with the rule-based fast path when it is confident enough,
+    and with the RoutePlannerAgent crew otherwise: in the "deterministic" schedule mode
+    only its extraction task runs (the scheduler orders the places after geocoding),
+    in the "llm" mode both tasks do, and `prefetch` starts geocoding after the first.
+    """
+    started = time.perf_counter()
+    with stage("extraction"):
+        if settings.fast_path_enabled:
+            itinerary = fast_extract_itinerary(transcript, settings.fast_path_min_confidence)
+            if itinerary is not None:
+                extraction_paths.observe("fast_path", time.perf_counter() - started)
+                return itinerary.model_dump()
+
+        if settings.schedule_mode == "deterministic":
+            crew_result = await kickoff_cached(ROUTE_EXTRACTOR, transcript, {'text': transcript})
+            if isinstance(crew_result, dict) and 'places' in crew_result:
+                # Keep the order of the utterance, the scheduler orders the places after geocoding.
+                extracted = ExtractedPlaces.model_validate(crew_result)
+                crew_result = {
+                    'locations': [{'name': name, 'time': time} for name, time in extracted.places.items()],
+                    'current_location': extracted.current_location or "Unknown",
+                }
+        else:
+            task_callbacks = {"extract_task": prefetch.on_extract_task} if prefetch else None
+            crew_result = await kickoff_cached(ROUTE_PLANNER, transcript, {'text': transcript}, task_callbacks)
+        extraction_paths.observe("crew", time.perf_counter() - started)
+        return crew_result
+
+
+def extract_locations(crew_result, user_location: Optional[str]) -> Tuple[List[str], List[Optional[str]], str]:
+    """
+    Extracts the ordered location names, their visit times and the city from a
+    RoutePlannerAgent crew result. Raises 404 when no locations were found.
+    """
+    logger.debug("Raw crew result: %s", crew_result)
+    logger.debug("Type of crew result: %s", type(crew_result))
+
+    location_names = []
+    location_times = []
+    current_location = "Unknown"
+    
+    if hasattr(crew_result, 'locations'):
+        logger.debug("Crew result has 'locations' attribute")
+        location_objects = crew_result.locations
+        if hasattr(crew_result, 'current_location'):
+            current_location = crew_result.current_location
+        
+        for loc in location_objects:
+            if hasattr(loc, 'name'):
+                location_names.append(loc.name)
+                location_times.append(getattr(loc, 'time', None))
+            elif isinstance(loc, dict) and 'name' in loc:
+                location_names.append(loc['name'])
+                location_times.append(loc.get('time'))
+    
+    elif isinstance(crew_result, dict):
+        logger.debug("Crew result is a dictionary")
+        if 'locations' in crew_result:
+            location_objects = crew_result['locations']
+            current_location = crew_result.get('current_location', 'Unknown')
+            
+            for loc in location_objects:
+                if isinstance(loc, dict) and 'name' in loc:
+                    location_names.append(loc['name'])
+                    location_times.append(loc.get('time'))
+                elif isinstance(loc, str):
+                    location_names.append(loc)
+                    location_times.append(None)
+    
+    elif hasattr(crew_result, 'json_dict'):
+        logger.debug("Crew result has 'json_dict'")
+        result_data = crew_result.json_dict
+        if 'locations' in result_data:
+            location_objects = result_data['locations']
+            current_location = result_data.get('current_location', 'Unknown')
+            
+            for loc in location_objects:
+                if isinstance(loc, dict) and 'name' in loc:
+                    location_names.append(loc['name'])
+                    location_times.append(loc.get('time'))
+    
+    elif isinstance(crew_result, str):
+        logger.debug("Crew result is a string, trying to parse as JSON")
+        import json
+        try:
+            result_data = json.loads(crew_result)
+            if 'locations' in result_data:
+                location_objects = result_data['locations']
+                current_location = result_data.get('current_location', 'Unknown')
+                
+                for loc in location_objects:
+                    if isinstance(loc, dict) and 'name' in loc:
+                        location_names.append(loc['name'])
+                        location_times.append(loc.get('time'))
+        except:
+            pass
+    
+    logger.debug("Extracted location names: %s", location_names)
+    logger.debug("Current location: %s", current_location)
+
+    # Если не удалось определить город из crew результата
+    if current_location == "Unknown":
+        current_location = user_location or "Москва"
+        logger.debug(f"Using fallback location: {current_location}")
+
+    if not location_names:
+        # Детальная отладка
+        logger.debug("DEBUG - Crew result structure:")
+        logger.debug(f"  Type: {type(crew_result)}")
+        logger.debug(f"  Dir: {[attr for attr in dir(crew_result) if not attr.startswith('_')]}")
+        if hasattr(crew_result, '__dict__'):
+            logger.debug(f"  Dict: {crew_result.__dict__}")
+        
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Could not find locations in the transcript. Crew result: {crew_result}"
+        )
+
+    return location_names, location_times, current_location
+
+
+def schedule_stops(
+    location_names: List[str],
+    location_times: List[Optional[str]],
+    points_to_route: List[List[float]],
+    user_location: Optional[str],
+) -> Tuple[List[str], List[List[float]], dict]:
+    """
+    Orders the geocoded stops by their time windows and travel-time estimates (in the
+    "llm" schedule mode the crew order is kept and only the ETAs are computed).
+    Returns the names and points in visiting order and the schedule for the response.
+    """
+    with stage("schedule"):
+        schedule = build_schedule(
+            location_names,
+            location_times,
+            points_to_route,
+            origin=parse_location_cookie(user_location),
+            reorder=settings.schedule_mode == "deterministic",
+        )
+    order = schedule.order
+    return [location_names[i] for i in order], [points_to_route[i] for i in order], schedule.as_dict()
+
+
+async def plan_personal_route(transcript: str, user_location: Optional[str], clients: UpstreamClients) -> PlannedRoute:
+    """The personal planner (/stt-route) from the transcript on: extraction, geocoding, scheduling and routing."""
+    # 1. Use the fast path or the crew to process the transcript
+    prefetch = geocode_prefetch(clients, user_location)
+    crew_result = await plan_itinerary(transcript, prefetch)
+
+    # 2. Extract locations from crew result
+    location_names, location_times, current_location = extract_locations(crew_result, user_location)
+
+    # 3. Geocode the locations to get coordinates
+    logger.debug(f"Geocoding {len(location_names)} locations in {current_location}...")
+    with stage("geocode"):
+        if prefetch is not None:
+            await prefetch.wait()
+        points_to_route = await geocode_locations(location_names, city=current_location, client=clients.places)
+    logger.debug("Geocoded coordinates: %s", points_to_route)
+
+    # 4. Order the stops by their time windows and estimate arrival times
+    location_names, points_to_route, schedule = schedule_stops(
+        location_names, location_times, points_to_route, user_location
+    )
+
+    # 5. Get route from 2GIS API
+    logger.debug("Building route with 2GIS API...")
+    with stage("routing"):
+        route_coords = await get_2gis_route(points_to_route, client=clients.routing)
+    logger.debug(f"Route built with {len(route_coords)} points")
+    return PlannedRoute("car", transcript, route_coords, points_to_route, schedule)
+
+
+async def plan_tourist_route(transcript: str, user_location: Optional[str], clients: UpstreamClients) -> PlannedRoute:
+    """The tourist planner (/stt-route-tourist) from the transcript on: the crew's must-visit list, geocoding, stop order and routing."""
+    # Use the crew to get location names
+    inputs = {'location': transcript}
+    with stage("extraction"):
+        itinerary = await kickoff_cached(TOURIST_PLANNER, transcript, inputs)
+
+    # The result of the crew (or the cache) is the Itinerary as a dict.
+    # We need to access the 'locations' attribute to get the list.
+    location_names = [loc['name'] if isinstance(loc, dict) else loc for loc in itinerary['locations']]
+    current_location = itinerary['current_location']
+    if current_location == "Unknown":
+        raise HTTPException(
+            status_code=404, detail="Could not find current location in the transcript."
+        )
+
+    if not location_names:
+        raise HTTPException(
+            status_code=404, detail="Could not find locations in the transcript."
+        )
+
+    # Geocode the locations to get coordinates, using user_location as the city context.
+    with stage("geocode"):
+        points_to_route = await geocode_locations_tourist(location_names, city=current_location, client=clients.places)
+
+    # Order the stops for the shortest walk instead of trusting the LLM order,
+    # starting from the user's location when it is known. Long days are routed in chunks.
+    if settings.stop_order_enabled:
+        with stage("stop_order"):
+            points_to_route = await optimize_stop_order(
+                points_to_route,
+                start=parse_location_cookie(user_location),
+                max_points=None if settings.route_chunking_enabled else MAX_ROUTE_POINTS,
+                client=clients.routing,
+            )
+
+    # Get route from 2GIS API
+    with stage("routing"):
+        route_coords = await get_2gis_route(points_to_route, client=clients.routing)
+    return PlannedRoute("pedestrian", transcript, route_coords, points_to_route)
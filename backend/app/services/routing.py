@@ -1,8 +1,16 @@
+import asyncio
 import os
 import httpx
-from typing import List
+import numpy as np
+from typing import Awaitable, Callable, List, Optional
 from fastapi import HTTPException
 import logging
+from backend.app.repository.route_cache import RouteCache
+from backend.app.services.geometry import join_paths, parse_linestrings
+from backend.app.services.http_clients import client_or_default
+from backend.app.services.resilience import UpstreamUnavailable, routing_upstream
+from backend.app.services.singleflight import route_flights
+from backend.app.services.tracing import annotate, span
 from backend.app.settings.config import API_Settings
 
 settings = API_Settings()
@@ -12,66 +20,188 @@ logger = logging.getLogger(__name__)
 
 MAX_ROUTE_POINTS = 10
 
-def _parse_linestring(linestring: str) -> List[List[float]]:
-    """Helper to parse a 'LINESTRING(lon1 lat1, lon2 lat2, ...)' into a list of coordinates."""
-    points_str = linestring.replace("LINESTRING(", "").replace(")", "")
-    if not points_str:
-        return []
-    
-    return [
-        [float(coord) for coord in point.strip().split()]
-        for point in points_str.split(',')
-    ]
-
-async def get_2gis_route(points: List[List[float]]) -> List[List[float]]:
-    """
-    Builds a route between two or more points using the 2GIS Routing API.
-    """
-    if len(points) > MAX_ROUTE_POINTS:
-        logger.warning(f"More than {MAX_ROUTE_POINTS} points provided. Truncating to the first {MAX_ROUTE_POINTS}.")
-        points = points[:MAX_ROUTE_POINTS]
-        
-    if len(points) < 2:
-        raise ValueError("At least two points are required to build a route.")
+route_cache = RouteCache(
+    precision=settings.route_cache_point_precision,
+    maxsize=settings.route_cache_size,
+    ttl=settings.route_cache_ttl,
+    db_path=settings.route_cache_db_path,
+    db_maxsize=settings.route_cache_db_size,
+    stale_ttl=settings.stale_cache_ttl,
+)
 
+async def _request_route(points: List[List[float]], transport: str, client: httpx.AsyncClient) -> np.ndarray:
+    """Requests the route geometry through all points from the 2GIS Routing API as a (N, 2) array."""
     payload = {
         "points": [{"lon": p[0], "lat": p[1]} for p in points],
-        "transport": "walking",
+        "transport": transport,
         "output": "detailed"
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
+    try:
+        response = await routing_upstream.call(
+            lambda timeout: client.post(
                 settings.routing_api_url,
                 params={"key": settings.gis_key},
                 json=payload,
-                timeout=10.0
-            )
-            response.raise_for_status() # Raise an exception for 4xx or 5xx status codes
-            data = response.json()
-            
-            if data.get("type") == "error" or "result" not in data or not data["result"]:
-                error_detail = f"2GIS Routing API returned an error: {data.get('message', 'Could not build route.')}. Full response: {data}"
-                logger.error(error_detail)
-                raise HTTPException(status_code=400, detail=data.get("message", "Could not build route."))
-
-            # Extract and parse the geometry from all maneuvers
-            all_coords = []
-            maneuvers = data["result"][0].get("maneuvers", [])
-            for maneuver in maneuvers:
-                if maneuver.get("outcoming_path") and maneuver["outcoming_path"].get("geometry"):
-                    for geometry_part in maneuver["outcoming_path"]["geometry"]:
-                        if geometry_part.get("selection"):
-                            all_coords.extend(_parse_linestring(geometry_part["selection"]))
-            
-            return all_coords
-
-        except httpx.HTTPStatusError as e:
-            error_detail = f"Error from 2GIS API: {e.response.status_code} - {e.response.text}"
-            logger.error(error_detail, exc_info=True)
-            raise HTTPException(status_code=e.response.status_code, detail=error_detail)
-        except Exception as e:
-            error_detail = f"Internal error processing route: {str(e)}"
-            logger.error(error_detail, exc_info=True)
-            raise HTTPException(status_code=500, detail=error_detail)
+                timeout=timeout,
+            ),
+            hedge=True,
+        )
+        response.raise_for_status() # Raise an exception for 4xx or 5xx status codes
+        data = response.json()
+        
+        if data.get("type") == "error" or "result" not in data or not data["result"]:
+            error_detail = f"2GIS Routing API returned an error: {data.get('message', 'Could not build route.')}. Full response: {data}"
+            logger.error(error_detail)
+            raise HTTPException(status_code=400, detail=data.get("message", "Could not build route."))
+
+        # Collect the geometry of all maneuvers and parse it in one pass
+        selections = []
+        maneuvers = data["result"][0].get("maneuvers", [])
+        for maneuver in maneuvers:
+            if maneuver.get("outcoming_path") and maneuver["outcoming_path"].get("geometry"):
+                for geometry_part in maneuver["outcoming_path"]["geometry"]:
+                    if geometry_part.get("selection"):
+                        selections.append(geometry_part["selection"])
+        
+        return parse_linestrings(selections)
+
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        error_detail = f"Error from 2GIS API: {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail, exc_info=True)
+        raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except Exception as e:
+        error_detail = f"Internal error processing route: {str(e)}"
+        logger.error(error_detail, exc_info=True)
+        raise HTTPException(status_code=500, detail=error_detail)
+
+async def _gather_bounded(calls: List[Callable[[], Awaitable[np.ndarray]]]) -> List[np.ndarray]:
+    """Runs the calls concurrently, at most `route_request_concurrency` at a time, results in order."""
+    semaphore = asyncio.Semaphore(max(1, settings.route_request_concurrency))
+
+    async def run(call: Callable[[], Awaitable[np.ndarray]]) -> np.ndarray:
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+def route_windows(count: int, size: int = MAX_ROUTE_POINTS) -> List[range]:
+    """
+    Splits `count` points into windows of at most `size` points where each window starts
+    at the last point of the previous one, so the sub-routes join into one route.
+    """
+    step = size - 1
+    return [range(start, min(start + size, count)) for start in range(0, count - 1, step)]
+
+async def _route_in_chunks(points: List[List[float]], transport: str, client: httpx.AsyncClient) -> np.ndarray:
+    """
+    Routes more than MAX_ROUTE_POINTS points as overlapping windows requested concurrently
+    and stitched into one route; every window is cached like a route of its own.
+    """
+    windows = [[points[i] for i in window] for window in route_windows(len(points))]
+    chunks: List[Optional[np.ndarray]] = []
+    for window in windows:
+        entry = await route_cache.aget(route_cache.key(window, transport))
+        chunks.append(_as_route_array(entry.value) if entry is not None else None)
+
+    missing = [i for i, chunk in enumerate(chunks) if chunk is None]
+    logger.info(f"Routing {len(points)} points in {len(windows)} chunks, {len(missing)} not cached")
+    fetched = await _gather_bounded([
+        lambda window=windows[i]: _request_route(window, transport, client) for i in missing
+    ])
+    for i, chunk in zip(missing, fetched):
+        chunk.flags.writeable = False
+        await route_cache.aset(route_cache.key(windows[i], transport), chunk)
+        chunks[i] = chunk
+
+    return join_paths(chunks)
+
+async def _route_from_legs(points: List[List[float]], transport: str, client: httpx.AsyncClient) -> np.ndarray:
+    """
+    Composes the route from pairwise legs. Cached legs are reused, the missing
+    ones are requested concurrently as two-point routes and cached.
+    """
+    legs: List[Optional[np.ndarray]] = []
+    for start, end in zip(points, points[1:]):
+        entry = await route_cache.aget(route_cache.leg_key(start, end, transport))
+        legs.append(_as_route_array(entry.value) if entry is not None else None)
+
+    missing = [i for i, leg in enumerate(legs) if leg is None]
+    route_cache.legs_reused += len(legs) - len(missing)
+    route_cache.legs_fetched += len(missing)
+    fetched = await _gather_bounded([
+        lambda i=i: _request_route(points[i:i + 2], transport, client) for i in missing
+    ])
+    for i, leg in zip(missing, fetched):
+        leg.flags.writeable = False
+        await route_cache.aset(route_cache.leg_key(points[i], points[i + 1], transport), leg)
+        legs[i] = leg
+
+    return join_paths(legs)
+
+def _as_route_array(value) -> np.ndarray:
+    """Cached geometries are arrays in memory and lists when read back from SQLite."""
+    return np.asarray(value, dtype=np.float64).reshape(-1, 2)
+
+async def get_2gis_route(
+    points: List[List[float]],
+    client: Optional[httpx.AsyncClient] = None,
+    transport: str = "walking",
+) -> np.ndarray:
+    """
+    Builds a route between two or more points using the 2GIS Routing API,
+    returned as a read-only float64 (N, 2) array of [lon, lat].
+    Uses the shared Routing client when one is given. Whole routes are cached by their
+    quantized point sequence (an expired route is served while the Routing API is
+    unavailable); with `route_segment_cache_enabled` a route is composed
+    from cached legs so that changing one stop only refetches the legs around it.
+
+    The Routing API takes at most MAX_ROUTE_POINTS points per request. With
+    `route_chunking_enabled` longer routes are built from overlapping windows,
+    otherwise the points are truncated.
+    """
+    with span("get_2gis_route", {"route.points": len(points), "route.transport": transport}):
+        # Concurrent requests for the same route share one lookup.
+        key = route_cache.key(points, transport)
+        route = await route_flights.do(key, lambda: _get_route(points, client, transport))
+        annotate({"route.vertices": len(route)})
+        return route
+
+async def _get_route(points: List[List[float]], client: Optional[httpx.AsyncClient], transport: str) -> np.ndarray:
+    """Cached route lookup and request, see get_2gis_route."""
+    chunked = settings.route_chunking_enabled or settings.route_segment_cache_enabled
+    if len(points) > MAX_ROUTE_POINTS and not chunked:
+        logger.warning(f"More than {MAX_ROUTE_POINTS} points provided. Truncating to the first {MAX_ROUTE_POINTS}.")
+        points = points[:MAX_ROUTE_POINTS]
+
+    if len(points) < 2:
+        raise ValueError("At least two points are required to build a route.")
+
+    cache_key = route_cache.key(points, transport)
+    cached = await route_cache.aget(cache_key)
+    if cached is not None:
+        logger.debug(f"Route cache hit for {len(points)} points")
+        annotate({"cache.hit": True})
+        return _as_route_array(cached.value)
+
+    try:
+        async with client_or_default(client, settings.routing_timeout) as client:
+            if settings.route_segment_cache_enabled:
+                route = await _route_from_legs(points, transport, client)
+            elif len(points) > MAX_ROUTE_POINTS:
+                route = await _route_in_chunks(points, transport, client)
+            else:
+                route = await _request_route(points, transport, client)
+    except UpstreamUnavailable as e:
+        stale = await route_cache.aget_stale(cache_key)
+        if stale is None:
+            raise
+        logger.warning(f"{e.detail}. Serving a stale route for {len(points)} points")
+        return _as_route_array(stale.value)
+
+    # The array is shared through the cache, make sure nobody modifies it in place.
+    route.flags.writeable = False
+    await route_cache.aset(cache_key, route)
+    return route
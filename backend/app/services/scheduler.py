@@ -0,0 +1,319 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.app.services.fast_extract import parse_time_expression
+from backend.app.services.stop_order import haversine_matrix
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+MINUTES_PER_DAY = 24 * 60
+
+_RANGE_RE = re.compile(r"(?:с\s+)?(.+?)\s*(?:-|–|—|\bдо\b|\bпо\b)\s*(.+)")
+_AFTER_RE = re.compile(r"(?:после|не\s+раньше|позже|начиная\s+с|с)\s+(.+)")
+_BEFORE_RE = re.compile(r"(?:до|не\s+позже|раньше|к|перед)\s+(.+)")
+# Parts of the day as (earliest, latest) in minutes since midnight
+_DAYPARTS = [
+    (re.compile(r"\bутр"), (6 * 60, 12 * 60)),
+    (re.compile(r"\bобед"), (12 * 60, 15 * 60)),
+    (re.compile(r"\bдн[её]м\b|\bдень\b"), (12 * 60, 17 * 60)),
+    (re.compile(r"\bвечер"), (17 * 60, 23 * 60)),
+]
+
+
+@dataclass
+class TimeWindow:
+    """Allowed arrival interval in minutes since midnight; None means unbounded."""
+    earliest: Optional[int] = None
+    latest: Optional[int] = None
+
+
+def _parse_clock(text: str) -> Optional[int]:
+    """'18:00', '9.30', '18', '8 вечера', 'восемь вечера' -> minutes since midnight."""
+    # A bare hour ("18") is only recognized after a preposition, as in "в 18".
+    parsed = parse_time_expression(text) or parse_time_expression(f"в {text.strip()}")
+    if parsed is None:
+        return None
+    hour, minute = parsed[0].split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def parse_time_window(value: Optional[str], appointment_grace: int) -> Tuple[Optional[TimeWindow], bool]:
+    """
+    Turns an extracted time string into an arrival window. Returns the window (None when the
+    stop has no time constraint) and whether the string was understood.
+
+    "18:00" is an appointment: arrive between 18:00 and 18:00 + `appointment_grace` minutes.
+    "после 18", "с 10" give an earliest time, "до 12", "к 10" a latest time, "с 10 до 12" and
+    "10-12" both, "утром" / "днем" / "вечером" a part of the day.
+    """
+    if value is None or not value.strip():
+        return None, True
+    text = value.strip().lower().replace("ё", "е")
+
+    match = _RANGE_RE.fullmatch(text)
+    if match:
+        earliest, latest = _parse_clock(match.group(1)), _parse_clock(match.group(2))
+        if earliest is not None and latest is not None:
+            return TimeWindow(earliest, latest), True
+    match = _BEFORE_RE.fullmatch(text)
+    if match and (latest := _parse_clock(match.group(1))) is not None:
+        return TimeWindow(latest=latest), True
+    match = _AFTER_RE.fullmatch(text)
+    if match and (earliest := _parse_clock(match.group(1))) is not None:
+        return TimeWindow(earliest=earliest), True
+    clock = _parse_clock(text)
+    if clock is not None:
+        return TimeWindow(clock, clock + appointment_grace), True
+    for pattern, (earliest, latest) in _DAYPARTS:
+        if pattern.search(text):
+            return TimeWindow(earliest, latest), True
+    return None, False
+
+
+def travel_minutes_matrix(points: Sequence[Sequence[float]], speed_kmh: float, detour_factor: float) -> np.ndarray:
+    """Travel-time estimates in minutes: straight-line distance times a detour factor over the speed."""
+    meters_per_minute = speed_kmh * 1000 / 60
+    return haversine_matrix(np.asarray(points, dtype=np.float64)) * detour_factor / meters_per_minute
+
+
+def _format_minutes(minutes: Optional[float]) -> Optional[str]:
+    if minutes is None:
+        return None
+    minutes = int(round(minutes))
+    days, minutes = divmod(minutes, MINUTES_PER_DAY)
+    clock = f"{minutes // 60:02d}:{minutes % 60:02d}"
+    return clock if days == 0 else f"{clock} (+{days}d)"
+
+
+@dataclass
+class ScheduledStop:
+    index: int
+    name: str
+    requested_time: Optional[str]
+    window: Optional[TimeWindow]
+    eta: float
+    start: float
+    departure: float
+
+    @property
+    def wait(self) -> float:
+        return self.start - self.eta
+
+    @property
+    def lateness(self) -> float:
+        if self.window is None or self.window.latest is None:
+            return 0.0
+        return max(0.0, self.start - self.window.latest)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "requested_time": self.requested_time,
+            "window_start": _format_minutes(self.window.earliest) if self.window else None,
+            "window_end": _format_minutes(self.window.latest) if self.window else None,
+            "eta": _format_minutes(self.eta),
+            "departure": _format_minutes(self.departure),
+            "wait_minutes": int(round(self.wait)),
+            "late_minutes": int(round(self.lateness)),
+            "on_time": self.lateness < 0.5,
+        }
+
+
+@dataclass
+class Schedule:
+    """Stops in visiting order with their ETAs, plus what could not be satisfied."""
+    start_time: float
+    stops: List[ScheduledStop]
+    travel_minutes: float
+    unparsed_times: List[str] = field(default_factory=list)
+
+    @property
+    def order(self) -> List[int]:
+        return [stop.index for stop in self.stops]
+
+    @property
+    def feasible(self) -> bool:
+        return all(stop.lateness < 0.5 for stop in self.stops)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "start_time": _format_minutes(self.start_time),
+            "stops": [stop.as_dict() for stop in self.stops],
+            "total_travel_minutes": int(round(self.travel_minutes)),
+            "feasible": self.feasible,
+            "unparsed_times": self.unparsed_times,
+        }
+
+
+class _Simulation:
+    """Evaluates visiting orders: arrival times, waiting for windows to open, lateness."""
+
+    def __init__(self, travel: np.ndarray, windows: List[Optional[TimeWindow]], start_time: float,
+                 dwell: float, origin: Optional[int]):
+        self.travel = travel
+        self.windows = windows
+        self.start_time = start_time
+        self.dwell = dwell
+        self.origin = origin
+
+    def run(self, order: Sequence[int]) -> Tuple[List[Tuple[float, float, float]], float, float]:
+        """Returns (eta, start, departure) per stop, total lateness and total travel time."""
+        time, position = self.start_time, self.origin
+        timeline, lateness, travel_total = [], 0.0, 0.0
+        for stop in order:
+            if position is not None:
+                time += self.travel[position, stop]
+                travel_total += self.travel[position, stop]
+            eta = time
+            window = self.windows[stop]
+            if window is not None and window.earliest is not None and time < window.earliest:
+                time = window.earliest
+            if window is not None and window.latest is not None and time > window.latest:
+                lateness += time - window.latest
+            timeline.append((eta, time, time + self.dwell))
+            time += self.dwell
+            position = stop
+        return timeline, lateness, travel_total
+
+    def cost(self, order: Sequence[int]) -> Tuple[float, float]:
+        _, lateness, travel_total = self.run(order)
+        # Windows first, then the shortest travel; round so that float noise does not count as a gain.
+        return round(lateness, 3), round(travel_total, 3)
+
+
+def _window_key(window: Optional[TimeWindow]) -> Optional[int]:
+    """The stated time of a window: its start, or its end when it has no start."""
+    if window is None:
+        return None
+    return window.earliest if window.earliest is not None else window.latest
+
+
+def _seed_order(windows: List[Optional[TimeWindow]]) -> List[int]:
+    """Stops with a window by its start (or end), stops without one after the stop mentioned before them."""
+    keyed, last_key = [], -1
+    for index, window in enumerate(windows):
+        key = _window_key(window)
+        if key is not None:
+            last_key = key
+        keyed.append(((last_key if key is None else key, index), index))
+    return [index for _, index in sorted(keyed)]
+
+
+def _keeps_timed_order(order: Sequence[int], windows: List[Optional[TimeWindow]]) -> bool:
+    """Whether the stops with a stated time are visited in the order of their times."""
+    keys = [key for key in (_window_key(windows[stop]) for stop in order) if key is not None]
+    return all(a <= b for a, b in zip(keys, keys[1:]))
+
+
+def _improve(order: List[int], simulation: _Simulation, fixed_first: bool) -> List[int]:
+    """
+    Relocate and swap moves, first improvement, until the (lateness, travel) cost stops decreasing.
+    Only stops without a stated time move between the timed ones; those keep the order of their times.
+    """
+    best = simulation.cost(order)
+    first = 1 if fixed_first else 0
+    improved = True
+    while improved:
+        improved = False
+        n = len(order)
+        for i in range(first, n):
+            for j in range(first, n):
+                if i == j:
+                    continue
+                relocated = order[:i] + order[i + 1:]
+                relocated.insert(j, order[i])
+                swapped = order[:]
+                swapped[i], swapped[j] = swapped[j], swapped[i]
+                for candidate in (relocated, swapped):
+                    if not _keeps_timed_order(candidate, simulation.windows):
+                        continue
+                    cost = simulation.cost(candidate)
+                    if cost < best:
+                        order, best, improved = candidate, cost, True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return order
+
+
+def default_start_time(
+    order: Sequence[int], windows: List[Optional[TimeWindow]], travel: np.ndarray, origin: Optional[int]
+) -> float:
+    """
+    Minutes since midnight to start the walk at: the configured day start, or earlier when
+    walking the stops in `order` would otherwise reach a stop after its stated time.
+    Does not depend on the wall clock, so the same request always gets the same schedule.
+    """
+    start = float(_parse_clock(settings.schedule_day_start) or 0)
+    offset, position = 0.0, origin
+    for stop in order:
+        if position is not None:
+            offset += travel[position, stop]
+        key = _window_key(windows[stop])
+        if key is not None:
+            start = min(start, key - offset)
+        offset += settings.schedule_dwell_minutes
+        position = stop
+    return max(0.0, start)
+
+
+def build_schedule(
+    names: List[str],
+    times: List[Optional[str]],
+    points: List[List[float]],
+    origin: Optional[List[float]] = None,
+    start_time: Optional[float] = None,
+    reorder: bool = True,
+) -> Schedule:
+    """
+    Schedules the stops: parses their time strings into windows, estimates travel times
+    between the geocoded points and (with `reorder`) searches for the order that first
+    minimizes lateness against the windows, then travel time. Without `reorder` only the
+    ETAs of the given order are computed.
+
+    The walk starts at `origin` (the user's location) when given, otherwise at the first
+    stop of the seed order, at `start_time` minutes since midnight (default: the day start,
+    or earlier so that the seed order reaches every stop by its stated time, see `default_start_time`).
+    """
+    windows, unparsed = [], []
+    for name, time in zip(names, times):
+        window, understood = parse_time_window(time, settings.schedule_appointment_grace_minutes)
+        windows.append(window)
+        if not understood:
+            unparsed.append(f"{name}: {time}")
+    if unparsed:
+        logger.warning(f"Could not parse visit times, scheduling without them: {unparsed}")
+
+    nodes = list(points) + ([origin] if origin is not None else [])
+    travel = travel_minutes_matrix(nodes, settings.schedule_speed_kmh, settings.schedule_detour_factor)
+    origin_node = len(points) if origin is not None else None
+    order = list(range(len(names)))
+    seed = _seed_order(windows) if reorder else order
+    if start_time is None:
+        start_time = default_start_time(seed, windows, travel, origin_node)
+    simulation = _Simulation(travel, windows, start_time, settings.schedule_dwell_minutes, origin=origin_node)
+
+    if reorder and len(order) > 1:
+        order = _improve(seed, simulation, fixed_first=origin is None)
+
+    timeline, _, travel_total = simulation.run(order)
+    stops = [
+        ScheduledStop(index=i, name=names[i], requested_time=times[i], window=windows[i],
+                      eta=eta, start=start, departure=departure)
+        for i, (eta, start, departure) in zip(order, timeline)
+    ]
+    schedule = Schedule(start_time=start_time, stops=stops, travel_minutes=travel_total, unparsed_times=unparsed)
+    if not schedule.feasible:
+        late = [f"{stop.name} ({int(round(stop.lateness))} min late)" for stop in stops if stop.lateness >= 0.5]
+        logger.info(f"Infeasible time windows: {late}")
+    return schedule
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from backend.app.services.resilience import (
+    Deadline,
+    UpstreamUnavailable,
+    current_deadline,
+    detached_deadline,
+    remaining_budget,
+)
+from backend.app.services.tracing import annotate
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    deadline: Deadline
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for a key is in flight, further
+    calls for that key wait for its result (or its exception) instead of starting their own.
+    Unlike a cache it keeps nothing once the call is done, so it also helps with a cold
+    cache or a zero TTL.
+
+    The shared call runs as a task in the context of the caller that started it (its
+    metrics label and trace), under the latest deadline among the callers waiting for it,
+    so a caller with more time left does not get the 504 of a request about to expire.
+    Each caller still waits no longer than its own deadline. A caller that is cancelled
+    or out of time only stops waiting; the call itself is cancelled once no caller waits
+    for it any more.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._counters = {"calls": 0, "shared": 0, "extended": 0, "abandoned": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        if not settings.singleflight_enabled:
+            return await fn()
+
+        self._counters["calls"] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            deadline, context = detached_deadline()
+            flight = _Flight(asyncio.get_running_loop().create_task(fn(), context=context), deadline)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._done(key, flight))
+        else:
+            self._counters["shared"] += 1
+            if flight.deadline.extend(current_deadline()):
+                self._counters["extended"] += 1
+            annotate({"singleflight.shared": True})
+            logger.debug("Joining the in-flight %s call for %s", self.name, key)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), remaining_budget())
+        except asyncio.CancelledError:
+            self._leave(key, flight)
+            raise
+        except TimeoutError:
+            if flight.task.done():
+                # The call itself timed out.
+                raise
+            self._leave(key, flight)
+            raise UpstreamUnavailable(self.name, "request deadline exceeded", status_code=504) from None
+        finally:
+            flight.waiters -= 1
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a call for the key is in flight, i.e. `do` would join it."""
+        return key in self._flights
+
+    def _leave(self, key: Hashable, flight: _Flight) -> None:
+        """A caller stops waiting before the call is done."""
+        if flight.waiters == 1 and not flight.task.done():
+            # Nobody else wants the result: stop the call, and let the next caller start afresh.
+            self._counters["abandoned"] += 1
+            self._forget(key, flight)
+            flight.task.cancel()
+
+    def _done(self, key: Hashable, flight: _Flight) -> None:
+        self._forget(key, flight)
+        # The exception was delivered to the waiters, if any were left; do not log it as unretrieved.
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "in_flight": len(self._flights)}
+
+
+geocode_flights = SingleFlight("geocode")
+route_flights = SingleFlight("route")
+crew_flights = SingleFlight("crew")
+
+FLIGHTS = [geocode_flights, route_flights, crew_flights]
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    return {flight.name: flight.stats() for flight in FLIGHTS}
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+
+from backend.app.services.geometry import EARTH_RADIUS_M
+from backend.app.services.http_clients import client_or_default
+from backend.app.services.resilience import UpstreamUnavailable, distance_matrix_upstream
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+# Segment lengths tried by Or-opt
+_OR_OPT_SEGMENTS = (1, 2, 3)
+_EPSILON = 1e-9
+# Cost of a pair the Distance Matrix API could not route (finite, so that deltas stay defined)
+_UNREACHABLE = 1e9
+
+
+def parse_location_cookie(value: Optional[str]) -> Optional[List[float]]:
+    """Parses the "lon:lat" user_location cookie, returns None when it is missing or malformed."""
+    if not value:
+        return None
+    try:
+        lon, lat = (float(part) for part in value.split(":"))
+    except ValueError:
+        return None
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        return None
+    return [lon, lat]
+
+
+def haversine_matrix(coords: np.ndarray) -> np.ndarray:
+    """Great-circle distances in meters between all pairs of [lon, lat] points, (N, N)."""
+    radians = np.radians(np.asarray(coords, dtype=np.float64))
+    lon, lat = radians[:, 0], radians[:, 1]
+    dlon = lon[:, None] - lon[None, :]
+    dlat = lat[:, None] - lat[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+async def fetch_walking_matrix(coords: Sequence[Sequence[float]], client: Optional[httpx.AsyncClient] = None) -> np.ndarray:
+    """
+    Fetches the walking-time matrix (seconds) from the 2GIS Distance Matrix API.
+    Pairs the API cannot route get a prohibitive cost. The matrix is symmetrized
+    since 2-opt reverses sub-paths.
+    """
+    payload = {
+        "points": [{"lon": p[0], "lat": p[1]} for p in coords],
+        "sources": list(range(len(coords))),
+        "targets": list(range(len(coords))),
+        "transport": "walking",
+    }
+    async with client_or_default(client, settings.routing_timeout) as client:
+        response = await distance_matrix_upstream.call(
+            lambda timeout: client.post(
+                settings.distance_matrix_api_url,
+                params={"key": settings.gis_key, "version": "2.0"},
+                json=payload,
+                timeout=timeout,
+            )
+        )
+        response.raise_for_status()
+        data = response.json()
+
+    matrix = np.full((len(coords), len(coords)), _UNREACHABLE)
+    np.fill_diagonal(matrix, 0.0)
+    for route in data.get("routes", []):
+        if route.get("status", "OK") == "OK" and "duration" in route:
+            matrix[route["source_id"], route["target_id"]] = route["duration"]
+    return (matrix + matrix.T) / 2
+
+
+def _path_cost(path: Sequence[int], matrix: np.ndarray) -> float:
+    return float(sum(matrix[a, b] for a, b in zip(path, path[1:])))
+
+
+def nearest_neighbour_path(matrix: np.ndarray, start: int = 0) -> List[int]:
+    """Greedy open path through all nodes starting at `start`."""
+    n = len(matrix)
+    visited = np.zeros(n, dtype=bool)
+    path = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        costs = np.where(visited, np.inf, matrix[path[-1]])
+        nearest = int(np.argmin(costs))
+        path.append(nearest)
+        visited[nearest] = True
+    return path
+
+
+def _with_free_ends(matrix: np.ndarray) -> np.ndarray:
+    """Adds a virtual node (the last index) at zero distance from every node, closing the open path."""
+    n = len(matrix)
+    padded = np.zeros((n + 1, n + 1))
+    padded[:n, :n] = matrix
+    return padded
+
+
+def two_opt(path: List[int], matrix: np.ndarray, fixed_start: bool) -> List[int]:
+    """
+    2-opt for an open path: reverses the sub-path that most shortens it until no move helps.
+    The path is framed by the virtual node of `_with_free_ends`, so both ends may move
+    unless `fixed_start` pins the first stop. Each i evaluates all j at once.
+    """
+    padded = _with_free_ends(matrix)
+    virtual = len(matrix)
+    tour = np.array([virtual, *path, virtual])
+    first = 2 if fixed_start else 1
+    last = len(tour) - 2
+    improved = True
+    while improved:
+        improved = False
+        for i in range(first, last):
+            j = np.arange(i + 1, last + 1)
+            delta = (padded[tour[i - 1], tour[j]] + padded[tour[i], tour[j + 1]]
+                     - padded[tour[i - 1], tour[i]] - padded[tour[j], tour[j + 1]])
+            best = int(np.argmin(delta))
+            if delta[best] < -_EPSILON:
+                tour[i:j[best] + 1] = tour[i:j[best] + 1][::-1]
+                improved = True
+    return tour[1:-1].tolist()
+
+
+def or_opt(path: List[int], matrix: np.ndarray, fixed_start: bool) -> List[int]:
+    """
+    Or-opt for an open path: moves chains of 1-3 consecutive stops (optionally reversed)
+    to the best other position until no move helps. All insertion points of a chain
+    are evaluated at once.
+    """
+    padded = _with_free_ends(matrix)
+    virtual = len(matrix)
+    tour = [virtual, *path, virtual]
+    first = 2 if fixed_start else 1
+    improved = True
+    while improved:
+        improved = False
+        for length in _OR_OPT_SEGMENTS:
+            for i in range(first, len(tour) - 1 - length + 1):
+                chain = tour[i:i + length]
+                prev, next_ = tour[i - 1], tour[i + length]
+                removal_gain = padded[prev, chain[0]] + padded[chain[-1], next_] - padded[prev, next_]
+
+                rest = np.array(tour[:i] + tour[i + length:])
+                a, b = rest[:-1], rest[1:]
+                # Edges the chain can go into; with a fixed start nothing goes before it.
+                edges = np.arange(len(a)) >= (1 if fixed_start else 0)
+                forward = padded[a, chain[0]] + padded[chain[-1], b] - padded[a, b]
+                backward = padded[a, chain[-1]] + padded[chain[0], b] - padded[a, b]
+                insertion = np.where(edges, np.minimum(forward, backward), np.inf)
+                best = int(np.argmin(insertion))
+                if insertion[best] - removal_gain < -_EPSILON:
+                    moved = chain if forward[best] <= backward[best] else chain[::-1]
+                    rest_list = rest.tolist()
+                    tour = rest_list[:best + 1] + moved + rest_list[best + 1:]
+                    improved = True
+                    break
+            if improved:
+                break
+    return tour[1:-1]
+
+
+def _local_search(path: List[int], matrix: np.ndarray, fixed_start: bool) -> List[int]:
+    """Alternates 2-opt and Or-opt until neither shortens the path."""
+    cost = _path_cost(path, matrix)
+    while True:
+        path = or_opt(two_opt(path, matrix, fixed_start), matrix, fixed_start)
+        new_cost = _path_cost(path, matrix)
+        if new_cost >= cost - _EPSILON:
+            return path
+        cost = new_cost
+
+
+def optimize_path(matrix: np.ndarray, fixed_start: bool = False) -> List[int]:
+    """Open path through all nodes of `matrix`: nearest neighbour, then 2-opt and Or-opt to a local optimum."""
+    n = len(matrix)
+    if n <= 2:
+        return list(range(n))
+
+    starts = [0] if fixed_start else range(n)
+    path = min((nearest_neighbour_path(matrix, s) for s in starts), key=lambda p: _path_cost(p, matrix))
+    return _local_search(path, matrix, fixed_start)
+
+
+def _drop_costliest_stop(path: List[int], matrix: np.ndarray, fixed_start: bool) -> List[int]:
+    """Removes the stop whose removal shortens the path the most (never a fixed start)."""
+    padded = _with_free_ends(matrix)
+    virtual = len(matrix)
+    tour = [virtual, *path, virtual]
+    savings = [
+        padded[tour[k - 1], tour[k]] + padded[tour[k], tour[k + 1]] - padded[tour[k - 1], tour[k + 1]]
+        for k in range(2 if fixed_start else 1, len(tour) - 1)
+    ]
+    drop = int(np.argmax(savings)) + (1 if fixed_start else 0)
+    return path[:drop] + path[drop + 1:]
+
+
+def order_stops(
+    points: Sequence[Sequence[float]],
+    start: Optional[Sequence[float]] = None,
+    max_points: Optional[int] = None,
+    matrix: Optional[np.ndarray] = None,
+) -> Tuple[List[int], List[List[float]]]:
+    """
+    Orders the stops for the shortest walk through all of them.
+
+    With `start` the walk begins there; it is returned as the first point. When there are
+    more points than `max_points`, the stops that are the largest detours are dropped.
+    `matrix` may hold costs for [start, *points] (e.g. walking times); by default the
+    haversine distances are used. Returns the indices of the kept stops in `points`,
+    in visiting order, and the ordered coordinates.
+    """
+    nodes = ([list(start)] if start is not None else []) + [list(p) for p in points]
+    fixed_start = start is not None
+    if matrix is None:
+        matrix = haversine_matrix(np.array(nodes))
+
+    path = optimize_path(matrix, fixed_start=fixed_start)
+    limit = max(max_points, 2) if max_points is not None else len(path)
+    if len(path) > limit:
+        while len(path) > limit:
+            path = _drop_costliest_stop(path, matrix, fixed_start)
+        path = _local_search(path, matrix, fixed_start)
+
+    offset = 1 if fixed_start else 0
+    indices = [node - offset for node in path if node >= offset]
+    return indices, [nodes[node] for node in path]
+
+
+async def optimize_stop_order(
+    points: List[List[float]],
+    start: Optional[List[float]] = None,
+    max_points: Optional[int] = None,
+    client: Optional[httpx.AsyncClient] = None,
+) -> List[List[float]]:
+    """
+    Returns the points in walking order, starting with `start` if it is given and within
+    `stop_order_start_radius` of a stop (a user in another city should not start the walk
+    from home). Uses walking times from the Distance Matrix API when `stop_order_matrix`
+    is "api", and falls back to haversine distances if that request fails.
+    """
+    if start is not None and points:
+        distances = haversine_matrix(np.array([start, *points]))[0, 1:]
+        if distances.min() > settings.stop_order_start_radius:
+            logger.info("User location is far from all stops, ordering without a fixed start")
+            start = None
+
+    nodes = ([start] if start is not None else []) + points
+    matrix = None
+    if settings.stop_order_matrix == "api" and len(nodes) > 2:
+        try:
+            matrix = await fetch_walking_matrix(nodes, client=client)
+        except (httpx.HTTPError, UpstreamUnavailable, KeyError, IndexError, ValueError) as e:
+            logger.warning(f"Distance Matrix API request failed, ordering by straight-line distance: {e}")
+
+    # Local search over ~50 stops takes a few tens of milliseconds, keep it off the event loop.
+    indices, ordered = await asyncio.to_thread(order_stops, points, start, max_points, matrix)
+    logger.info(f"Stop order: {indices} of {len(points)} stops" + (" from the user location" if start else ""))
+    return ordered
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+# Synthetic audio of the load-test stubs (backend.benchmarks.upstream_stubs.fixture_audio):
+# an OGG (Opus) header followed by this marker and the UTF-8 transcript.
+FAKE_TRANSCRIPT_MARKER = b"STUB-TRANSCRIPT:"
+
+_SENTENCE_ENDS = (".", "!", "?")
+
+
+@dataclass
+class RecognitionResult:
+    """
+    The transcript recognized so far: finished utterances plus the current partial one.
+    `stable` is set when it ends with a finished utterance, so that it will only grow.
+    """
+    text: str
+    stable: bool = False
+
+
+class StreamingRecognizer(ABC):
+    """Turns a stream of OGG (Opus) audio chunks into growing transcripts while the user speaks."""
+
+    @abstractmethod
+    def recognize(self, audio: AsyncIterator[bytes]) -> AsyncIterator[RecognitionResult]:
+        """Yields a result whenever the transcript changes; the last one is the final transcript."""
+
+
+class YandexStreamingRecognizer(StreamingRecognizer):
+    """
+    SpeechKit API v3 streaming recognition (Recognizer/RecognizeStreaming over gRPC).
+    Partial results replace the current utterance, final results close it.
+    """
+
+    def __init__(self, endpoint: str, iam_token: str, folder_id: str):
+        self.endpoint = endpoint
+        self.iam_token = iam_token
+        self.folder_id = folder_id
+
+    @staticmethod
+    def _session_options():
+        from yandex.cloud.ai.stt.v3 import stt_pb2
+
+        return stt_pb2.StreamingRequest(
+            session_options=stt_pb2.StreamingOptions(
+                recognition_model=stt_pb2.RecognitionModelOptions(
+                    audio_format=stt_pb2.AudioFormatOptions(
+                        container_audio=stt_pb2.ContainerAudio(
+                            container_audio_type=stt_pb2.ContainerAudio.OGG_OPUS
+                        )
+                    ),
+                    text_normalization=stt_pb2.TextNormalizationOptions(
+                        text_normalization=stt_pb2.TextNormalizationOptions.TEXT_NORMALIZATION_ENABLED,
+                    ),
+                    language_restriction=stt_pb2.LanguageRestrictionOptions(
+                        restriction_type=stt_pb2.LanguageRestrictionOptions.WHITELIST,
+                        language_code=["ru-RU"],
+                    ),
+                    audio_processing_type=stt_pb2.RecognitionModelOptions.REAL_TIME,
+                )
+            )
+        )
+
+    async def recognize(self, audio: AsyncIterator[bytes]) -> AsyncIterator[RecognitionResult]:
+        # The SpeechKit v3 client comes with the yandexcloud package.
+        import grpc
+        from yandex.cloud.ai.stt.v3 import stt_pb2, stt_service_pb2_grpc
+
+        async def requests():
+            yield self._session_options()
+            async for chunk in audio:
+                yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=chunk))
+
+        metadata = (("authorization", f"Bearer {self.iam_token}"), ("x-folder-id", self.folder_id))
+        finished, current = [], ""
+        async with grpc.aio.secure_channel(self.endpoint, grpc.ssl_channel_credentials()) as channel:
+            stub = stt_service_pb2_grpc.RecognizerStub(channel)
+            async for response in stub.RecognizeStreaming(requests(), metadata=metadata):
+                event = response.WhichOneof("Event")
+                if event == "partial" and response.partial.alternatives:
+                    current = response.partial.alternatives[0].text
+                    yield RecognitionResult(" ".join(finished + [current]).strip())
+                elif event == "final":
+                    if response.final.alternatives and response.final.alternatives[0].text:
+                        finished.append(response.final.alternatives[0].text)
+                    current = ""
+                    yield RecognitionResult(" ".join(finished).strip(), stable=True)
+
+
+class FakeStreamingRecognizer(StreamingRecognizer):
+    """
+    Local stand-in for tests and load tests. Transcribes the synthetic audio of the
+    upstream stubs as it arrives, word by word, and closes an utterance at every sentence
+    end; any other audio is recognized as `fallback_transcript` once the stream ends.
+    """
+
+    def __init__(self, fallback_transcript: str = ""):
+        self.fallback_transcript = fallback_transcript
+
+    async def recognize(self, audio: AsyncIterator[bytes]) -> AsyncIterator[RecognitionResult]:
+        received, last = b"", None
+        async for chunk in audio:
+            received += chunk
+            _, marker, payload = received.partition(FAKE_TRANSCRIPT_MARKER)
+            if not marker:
+                continue
+            # Only whole words: the chunk may end inside a word or a UTF-8 sequence.
+            text = payload.decode("utf-8", errors="ignore").rsplit(" ", 1)[0].strip()
+            if text and text != last:
+                last = text
+                yield RecognitionResult(text, stable=text.endswith(_SENTENCE_ENDS))
+
+        _, marker, payload = received.partition(FAKE_TRANSCRIPT_MARKER)
+        text = payload.decode("utf-8", errors="ignore").strip() if marker else self.fallback_transcript
+        yield RecognitionResult(text, stable=True)
+
+
+def create_recognizer() -> StreamingRecognizer:
+    if settings.streaming_stt_recognizer == "fake":
+        return FakeStreamingRecognizer(settings.streaming_stt_fake_transcript)
+    return YandexStreamingRecognizer(
+        settings.streaming_stt_endpoint, settings.yandex_iam_token, settings.yandex_folder_id
+    )
+
+
+class Speculation:
+    """
+    Work started on a transcript before it is final. Only one runs at a time: a crew
+    kickoff keeps its pool slot even when its task is cancelled, so a newer transcript
+    waits until the running one is done and then starts, replacing any older waiting one.
+    `take` returns the task if the final transcript is the one it started on.
+    """
+
+    def __init__(self, start: Callable[[str], Awaitable]):
+        self._start = start
+        self._text: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Optional[str] = None
+        self.started = 0
+
+    def update(self, text: str) -> None:
+        if not text or text == (self._pending or self._text):
+            return
+        if self._task is not None and not self._task.done():
+            self._pending = text if text != self._text else None
+            return
+        self._run(text)
+
+    def _run(self, text: str) -> None:
+        self._text, self._pending = text, None
+        self._task = asyncio.ensure_future(self._start(text))
+        self._task.add_done_callback(self._done)
+        self.started += 1
+        logger.debug("Speculative extraction started for: %s", text)
+
+    def _done(self, task: asyncio.Task) -> None:
+        # A superseded speculation may fail unobserved; do not log that as an unretrieved exception.
+        if not task.cancelled():
+            task.exception()
+        if task is self._task and self._pending is not None:
+            self._run(self._pending)
+
+    def take(self, text: str) -> Optional[asyncio.Task]:
+        """The task started on `text`, None (and the stale task cancelled) otherwise."""
+        if self._task is not None and self._text == text:
+            task, self._task, self._pending = self._task, None, None
+            return task
+        self.cancel()
+        return None
+
+    def cancel(self) -> None:
+        self._pending = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
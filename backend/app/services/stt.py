@@ -3,73 +3,91 @@ import os
 import urllib
 import urllib.request
 import logging
+from backend.app.services.audio import OGG_OPUS_CONTENT_TYPE, audio_transcoder
+from backend.app.services.http_clients import client_or_default
+from backend.app.services.resilience import stt_upstream
+from backend.app.services.tracing import annotate, span
 from backend.app.settings.config import API_Settings
 import aiofiles
 import httpx
-from io import BytesIO
-from pydub import AudioSegment
+from fastapi import HTTPException
+from typing import BinaryIO, Optional, Union
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 settings = API_Settings()
 
-async def stt(audio_path: str) -> str:
+async def stt(
+    audio: Union[bytes, BinaryIO],
+    content_type: Optional[str] = None,
+    client: Optional[httpx.AsyncClient] = None,
+) -> str:
     """
-    Converts an audio file to text using Yandex SpeechKit.
-    The audio is converted to OGG (Opus) format before sending.
+    Converts audio to text using Yandex SpeechKit.
+    The audio is converted to OGG (Opus) format before sending, unless it already is.
+    Everything happens in memory; transcoding runs in the audio process pool.
 
     Args:
-        audio_path (str): Path to the audio file
+        audio (bytes | BinaryIO): Audio contents or a readable binary stream
+        content_type (str, optional): Declared MIME type of the upload
+        client (httpx.AsyncClient, optional): Shared SpeechKit client
 
     Returns:
         str: Recognized text
-    """
-    if not os.path.exists(audio_path):
-        return f"File not found: {audio_path}"
 
-    try:
-        # Convert audio to ogg format in memory
-        audio = AudioSegment.from_file(audio_path)
-        
-        with BytesIO() as ogg_buffer:
-            audio.export(ogg_buffer, format="ogg", codec="libopus")
-            contents = ogg_buffer.getvalue()
+    Raises:
+        HTTPException: 502 on an error answer of SpeechKit, 503/504 when it is unavailable
+    """
+    with span("stt", {"audio.content_type": content_type}):
+        try:
+            data = audio if isinstance(audio, bytes) else audio.read()
+            annotate({"audio.bytes": len(data)})
+            contents = await audio_transcoder.to_ogg_opus(data, content_type)
         
-        params = {
-            "topic": "general",
-            "folderId": settings.yandex_folder_id,
-            "lang": "ru-RU"
-        }
+            params = {
+                "topic": "general",
+                "folderId": settings.yandex_folder_id,
+                "lang": "ru-RU"
+            }
         
-        headers = {
-            "Authorization": f"Bearer {settings.yandex_iam_token}",
-            "Content-Type": "audio/ogg;codecs=opus"
-        }
+            headers = {
+                "Authorization": f"Bearer {settings.yandex_iam_token}",
+                "Content-Type": OGG_OPUS_CONTENT_TYPE
+            }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.yandex_stt_url,
-                params=params,
-                content=contents,
-                headers=headers
-            )
-            response.raise_for_status()
+            async with client_or_default(client, settings.stt_timeout) as client:
+                response = await stt_upstream.call(
+                    lambda timeout: client.post(
+                        settings.yandex_stt_url,
+                        params=params,
+                        content=contents,
+                        headers=headers,
+                        timeout=timeout,
+                    )
+                )
+                response.raise_for_status()
 
-        response_text = response.text
-        logger.info(f"Yandex STT API response: {response_text}")
+            response_text = response.text
+            logger.info(f"Yandex STT API response: {response_text}")
         
-        decoded_data = response.json()
+            decoded_data = response.json()
         
-        if decoded_data.get("error_code") is not None:
-            return f"Error Yandex SpeechKit: {decoded_data}"
+            if decoded_data.get("error_code") is not None:
+                raise HTTPException(status_code=502, detail=f"Error Yandex SpeechKit: {decoded_data}")
         
-        result = decoded_data.get("result", "")
-        return result
+            result = decoded_data.get("result", "")
+            annotate({"stt.transcript_chars": len(result)})
+            return result
 
-    except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP error occurred: {e.request.url} - {e.response.status_code} - {e.response.text}")
-        return f"Error Yandex SpeechKit: {e.response.text}"
-    except Exception as e:
-        logger.error(f"An unexpected error occurred in STT service: {e}")
-        return "Произошла ошибка при распознавании речи."
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error occurred: {e.request.url} - {e.response.status_code} - {e.response.text}")
+            annotate({"http.status_code": e.response.status_code})
+            raise HTTPException(status_code=502, detail=f"Error Yandex SpeechKit: {e.response.text}")
+        except HTTPException:
+            # Circuit breaker open (503), deadline exceeded (504) or an error answer of SpeechKit
+            raise
+        except Exception as e:
+            logger.error(f"An unexpected error occurred in STT service: {e}")
+            annotate({"error.type": type(e).__name__})
+            return "Произошла ошибка при распознавании речи."
@@ -0,0 +1,163 @@
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import Span, SpanKind, StatusCode
+
+from backend.app.settings.config import API_Settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+settings = API_Settings()
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends every finished span as one JSON object per line to a file."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = [json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n" for span in spans]
+        with self._lock:
+            self._file.writelines(lines)
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _create_exporter(exporter: str) -> SpanExporter:
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    if exporter == "jsonl":
+        return JsonLinesSpanExporter(settings.tracing_jsonl_path)
+    # OTLP over HTTP/protobuf to a local collector (e.g. the OpenTelemetry Collector or Jaeger on :4318)
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+
+
+def _create_provider() -> Optional[TracerProvider]:
+    """
+    A provider of our own rather than the global one, which crewAI configures for its telemetry.
+    Requests are sampled at `tracing_sample_rate`; child spans follow the request's decision.
+    """
+    if settings.tracing_exporter == "none":
+        return None
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.tracing_service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_rate)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_create_exporter(settings.tracing_exporter)))
+    logger.info(f"Tracing {settings.tracing_sample_rate:.0%} of requests to the {settings.tracing_exporter} exporter")
+    return provider
+
+
+tracer_provider = _create_provider()
+# Without an exporter every span is a no-op, so instrumented code costs next to nothing.
+tracer = tracer_provider.get_tracer(__name__) if tracer_provider else trace.NoOpTracer()
+
+
+def _attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """Span attributes without unset values (OpenTelemetry rejects None)."""
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: SpanKind = SpanKind.INTERNAL) -> Iterator[Span]:
+    """
+    Runs the block in a child span of the current one. An HTTPException sets the
+    `http.status_code` attribute (and an error status for 5xx), other exceptions
+    are recorded on the span.
+    """
+    with tracer.start_as_current_span(
+        name, kind=kind, attributes=_attributes(attributes or {}),
+        record_exception=False, set_status_on_exception=False,
+    ) as current:
+        try:
+            yield current
+        except HTTPException as e:
+            current.set_attribute("http.status_code", e.status_code)
+            if e.status_code >= 500:
+                current.set_status(StatusCode.ERROR, str(e.detail))
+            raise
+        except Exception as e:
+            current.record_exception(e)
+            current.set_status(StatusCode.ERROR, str(e))
+            raise
+
+
+def annotate(attributes: Dict[str, Any]) -> None:
+    """Adds attributes to the current span (e.g. the transcript to the request span)."""
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attributes(_attributes(attributes))
+
+
+def trace_id() -> Optional[str]:
+    """The hex id of the current trace when it is sampled, for the X-Trace-Id response header."""
+    span_context = trace.get_current_span().get_span_context()
+    return format(span_context.trace_id, "032x") if span_context.trace_flags.sampled else None
+
+
+def shutdown_tracing() -> None:
+    """Flushes the spans still queued in the batch processor."""
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+
+
+# Open crew task spans by task id: (span, context token). A kickoff runs its tasks one
+# after another in a single crew pool thread, whose context is a copy of the request's.
+_task_spans: Dict[int, Tuple[Span, object]] = {}
+
+
+def instrument_crew_tasks() -> None:
+    """Opens a span per crewAI task (extract_task, time_sorting_task, plan_trip_task, ...)."""
+    if tracer_provider is None:
+        return
+    from crewai.events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent, crewai_event_bus
+
+    def on_task_started(source: Any, event: TaskStartedEvent) -> None:
+        task = event.task
+        task_span = tracer.start_span(
+            f"crew_task {getattr(task, 'name', None) or 'task'}",
+            attributes=_attributes({
+                "crew.task": getattr(task, "name", None),
+                "crew.agent": getattr(getattr(task, "agent", None), "role", None),
+            }),
+        )
+        token = otel_context.attach(trace.set_span_in_context(task_span))
+        _task_spans[id(task)] = (task_span, token)
+
+    def on_task_finished(source: Any, event: Any) -> None:
+        task_span, token = _task_spans.pop(id(event.task), (None, None))
+        if task_span is None:
+            return
+        otel_context.detach(token)
+        if isinstance(event, TaskFailedEvent):
+            task_span.set_status(StatusCode.ERROR, event.error)
+        else:
+            task_span.set_attribute("crew.output_chars", len(getattr(event.output, "raw", "") or ""))
+        task_span.end()
+
+    crewai_event_bus.register_handler(TaskStartedEvent, on_task_started)
+    crewai_event_bus.register_handler(TaskCompletedEvent, on_task_finished)
+    crewai_event_bus.register_handler(TaskFailedEvent, on_task_finished)
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import List, Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -17,4 +18,150 @@ class API_Settings(BaseSettings):
     yandex_folder_id: str
     gis_key: str
     places_api_url: str = "https://catalog.api.2gis.com/3.0/items"
-    routing_api_url: str = "https://routing.api.2gis.com/routing/7.0.0/global"
\ No newline at end of file
+    routing_api_url: str = "https://routing.api.2gis.com/routing/7.0.0/global"
+    distance_matrix_api_url: str = "https://routing.api.2gis.com/get_dist_matrix"
+
+    # Shared upstream HTTP clients (one connection pool per upstream)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 5.0
+    places_timeout: float = 10.0
+    places_http2: bool = True
+    routing_timeout: float = 10.0
+    routing_http2: bool = True
+    stt_timeout: float = 30.0
+    stt_http2: bool = True
+
+    # Upstream resilience: every upstream timeout is capped by what is left of the request
+    # deadline; Places GETs are retried with jittered exponential backoff and hedged after
+    # the observed p95 latency; each upstream has a circuit breaker, and while it is open
+    # (or after the retries fail) expired cache entries up to stale_cache_ttl old are served
+    request_deadline: float = 60.0
+    upstream_min_timeout: float = 0.05
+    places_retries: int = 2
+    upstream_backoff_base: float = 0.1
+    upstream_backoff_max: float = 2.0
+    places_hedge_enabled: bool = True
+    routing_hedge_enabled: bool = False
+    hedge_min_delay: float = 0.05
+    hedge_min_samples: int = 20
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+    stale_cache_ttl: float = 24 * 3600
+    # Requests in flight to the 2GIS APIs (Places, Routing, Distance Matrix) across all requests
+    gis_max_concurrent_requests: int = 32
+
+    # Coalesce concurrent identical geocoding, routing and crew calls into one in-flight call
+    singleflight_enabled: bool = True
+
+    # Geocoding cache (in-process LRU + optional SQLite tier)
+    geocode_cache_size: int = 4096
+    geocode_cache_ttl: float = 7 * 24 * 3600
+    geocode_cache_negative_ttl: float = 300
+    geocode_cache_db_path: Optional[str] = None
+    geocode_cache_db_size: int = 100_000
+    geocode_cache_point_precision: int = 3
+
+    # Local POI index for generic places ("кафе", "аптека"): the nearest POI of the category within
+    # poi_search_radius meters from memory-mapped arrays, the Places API only when the index has none
+    poi_index_path: Optional[str] = None
+    poi_search_radius: float = 2000
+
+    # Max concurrent Places requests per geocode_locations call
+    geocode_concurrency: int = 8
+
+    # Request tracing: a span per request, pipeline stage, crew task and upstream call for a
+    # sampled share of requests, exported to the console, a JSONL file or an OTLP/HTTP collector
+    tracing_exporter: Literal["none", "console", "jsonl", "otlp"] = "none"
+    tracing_sample_rate: float = 0.1
+    tracing_jsonl_path: str = "traces.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_service_name: str = "voice-to-route-backend"
+
+    # Route geometry points per event in /stt-route/stream
+    stream_route_chunk_size: int = 500
+
+    # Streaming recognition for /stt-route/ws: SpeechKit API v3 over gRPC ("yandex") or the local
+    # fake ("fake", transcribes the synthetic audio of the load-test stubs, else fake_transcript);
+    # itinerary extraction starts speculatively on every finished utterance
+    streaming_stt_recognizer: Literal["yandex", "fake"] = "yandex"
+    streaming_stt_endpoint: str = "stt.api.cloud.yandex.net:443"
+    streaming_stt_fake_transcript: str = ""
+    streaming_stt_idle_timeout: float = 10.0
+    streaming_stt_speculative_extraction: bool = True
+
+    # Batch route API: items per batch and items planned at once within a batch
+    batch_max_items: int = 100
+    batch_item_concurrency: int = 8
+
+    # Background jobs (?async=1 on /stt-route-tourist) in a SQLite queue shared by the API processes
+    # and standalone workers (python -m backend.worker); job_workers asyncio workers per process.
+    # A job whose worker died is run again once its lease (job_timeout + margin) expires; one that
+    # failed with a 503 after job_retry_backoff * 2^(attempt - 1) seconds, up to job_max_attempts tries
+    job_db_path: str = "jobs.sqlite3"
+    job_workers: int = 2
+    job_poll_interval: float = 1.0
+    job_timeout: float = 120.0
+    job_lease_margin: float = 30.0
+    job_max_attempts: int = 3
+    job_retry_backoff: float = 5.0
+    job_result_ttl: float = 24 * 3600
+    job_max_wait: float = 30.0
+
+    # Audio transcoding process pool
+    audio_transcode_workers: int = 2
+    audio_transcode_max_pending: int = 16
+
+    # Crew execution pool: concurrent kickoffs, admission queue, Retry-After on 503
+    crew_max_in_flight: int = 8
+    crew_queue_size: int = 32
+    crew_retry_after: int = 5
+
+    # Rule-based place extraction that skips the LLM crew for simple utterances
+    fast_path_enabled: bool = True
+    fast_path_min_confidence: float = 1.0
+
+    # Crew result cache: exact transcript match, plus MinHash near-duplicate match for the listed crews
+    # (opt-in, e.g. CREW_CACHE_FUZZY_CREWS='["tourist_planner"]')
+    crew_cache_enabled: bool = True
+    crew_cache_size: int = 1024
+    crew_cache_ttl: float = 24 * 3600
+    crew_cache_db_path: Optional[str] = None
+    crew_cache_db_size: int = 10_000
+    crew_cache_fuzzy_crews: List[str] = []
+    crew_cache_fuzzy_threshold: float = 0.8
+
+    # Route geometry cache (whole routes, plus pairwise legs when segment caching is on)
+    route_cache_size: int = 1024
+    route_cache_ttl: float = 6 * 3600
+    route_cache_db_path: Optional[str] = None
+    route_cache_db_size: int = 50_000
+    route_cache_point_precision: int = 5
+    route_segment_cache_enabled: bool = False
+
+    # Routes over more than MAX_ROUTE_POINTS points: overlapping windows requested concurrently
+    # (at most route_request_concurrency requests per route) instead of truncation
+    route_chunking_enabled: bool = True
+    route_request_concurrency: int = 4
+
+    # Route simplification for ?zoom=: allowed deviation in screen pixels
+    route_simplify_pixel_tolerance: float = 1.0
+
+    # Tourist stop ordering: straight-line ("haversine") or walking-time ("api") costs,
+    # the user location starts the walk when it is within the radius (meters) of a stop
+    stop_order_enabled: bool = True
+    stop_order_matrix: Literal["haversine", "api"] = "haversine"
+    stop_order_start_radius: float = 10_000
+
+    # Personal itinerary scheduling: "deterministic" extracts places with one LLM task and orders
+    # them by time windows and travel estimates; "llm" keeps the time_sorting_task ordering
+    schedule_mode: Literal["deterministic", "llm"] = "deterministic"
+    # The schedule starts at the day start, or earlier when a stated time requires it
+    schedule_day_start: str = "09:00"
+    schedule_speed_kmh: float = 4.5
+    schedule_detour_factor: float = 1.3
+    schedule_dwell_minutes: float = 15
+    schedule_appointment_grace_minutes: int = 10
+    # In the "llm" mode, geocode the extracted places while the time sorting task still runs
+    geocode_prefetch_enabled: bool = True
@@ -0,0 +1,56 @@
+"""
+Micro-benchmark of the per-request crew construction cost.
+
+Compares building a crew from scratch (what every request did before the crew factory)
+with handing out a copy of the cached template. No LLM calls are made.
+
+Run from the repository root:
+    python -m backend.benchmarks.crew_construction [iterations]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'route_planner_agent', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'tourist_route_planner', 'src'))
+
+from route_planner_agent.crew import RoutePlannerAgent # type:ignore
+from tourist_route_planner.crew import TouristRoutePlanner # type:ignore
+
+from backend.app.services.crew_factory import ROUTE_PLANNER, TOURIST_PLANNER, CrewFactory
+
+
+def _measure(fn, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list) -> float:
+    mean = statistics.mean(timings)
+    p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+    print(f"  {label:<22} mean {mean:8.2f} ms   p95 {p95:8.2f} ms")
+    return mean
+
+
+def main(iterations: int = 50) -> None:
+    builders = {
+        ROUTE_PLANNER: lambda: RoutePlannerAgent().crew(),
+        TOURIST_PLANNER: lambda: TouristRoutePlanner().crew(),
+    }
+    factory = CrewFactory(builders)
+    factory.warmup()
+
+    for name, build in builders.items():
+        print(f"{name} ({iterations} iterations)")
+        fresh = _report("fresh construction", _measure(build, iterations))
+        cached = _report("factory copy", _measure(lambda: factory.create(name), iterations))
+        print(f"  saved per request      {fresh - cached:8.2f} ms ({fresh / cached:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
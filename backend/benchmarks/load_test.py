@@ -0,0 +1,219 @@
+"""
+Load test of the voice-to-route endpoints.
+
+Drives /api/stt-route and /api/stt-route-tourist with the audio of the fixtures in
+fixtures/load_test.json from `concurrency` concurrent clients, for `duration` seconds or
+`requests` requests. Reports throughput, latency percentiles and status codes per endpoint,
+and the per-stage and per-upstream breakdown from the difference of the backend's /metrics
+before and after the run.
+
+Without --audio-dir every request carries the synthetic audio that the fake STT of
+upstream_stubs transcribes back to the fixture transcript. With --audio-dir, recordings
+named after the fixture ids (errands.ogg, tourist_perm.wav, ...) are sent instead; fixtures
+without a recording keep the synthetic audio. --unique appends a request number to every
+transcript, so that the crew result cache misses and every request runs the crews.
+
+Run from the repository root, with the backend pointed at upstream_stubs (see there):
+    python -m backend.benchmarks.load_test [--url http://127.0.0.1:8000] [--concurrency 8]
+        [--duration 30 | --requests 200] [--endpoint /api/stt-route] [--audio-dir DIR] [--unique]
+"""
+import argparse
+import asyncio
+import json
+import mimetypes
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from prometheus_client.parser import text_string_to_metric_families
+
+from backend.benchmarks.upstream_stubs import fixture_audio, load_fixtures
+
+HistogramKey = Tuple[str, str, str]
+
+
+def _load_requests(endpoint: Optional[str], audio_dir: Optional[Path]) -> List[Dict[str, Any]]:
+    scenarios = []
+    for fixture in load_fixtures():
+        if endpoint and fixture["endpoint"] != endpoint:
+            continue
+        recordings = sorted(audio_dir.glob(f"{fixture['id']}.*")) if audio_dir else []
+        if recordings:
+            audio = recordings[0].read_bytes()
+            content_type = mimetypes.guess_type(recordings[0].name)[0] or "application/octet-stream"
+        else:
+            audio, content_type = None, "audio/ogg;codecs=opus"
+        scenarios.append({**fixture, "audio": audio, "content_type": content_type})
+    if not scenarios:
+        raise SystemExit(f"No fixtures for endpoint {endpoint}")
+    return scenarios
+
+
+def _histograms(metrics_text: str) -> Dict[HistogramKey, Dict[str, Any]]:
+    """Stage and upstream histograms by (metric, endpoint, stage/upstream): buckets, count, sum."""
+    histograms: Dict[HistogramKey, Dict[str, Any]] = defaultdict(lambda: {"buckets": {}, "count": 0.0, "sum": 0.0})
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name not in ("voice_route_stage_seconds", "voice_route_upstream_request_seconds"):
+            continue
+        for sample in family.samples:
+            labels = sample.labels
+            key = (family.name, labels["endpoint"], labels.get("stage") or labels.get("upstream"))
+            if sample.name.endswith("_bucket"):
+                histograms[key]["buckets"][float(labels["le"])] = sample.value
+            elif sample.name.endswith("_count"):
+                histograms[key]["count"] = sample.value
+            elif sample.name.endswith("_sum"):
+                histograms[key]["sum"] = sample.value
+    return histograms
+
+
+def _quantile(buckets: Dict[float, float], count: float, q: float) -> float:
+    """Quantile estimate from cumulative buckets, interpolating linearly within a bucket."""
+    rank, lower, below = q * count, 0.0, 0.0
+    for upper, cumulative in sorted(buckets.items()):
+        if cumulative >= rank:
+            if upper == float("inf"):
+                return lower
+            inside = cumulative - below
+            return lower + (upper - lower) * ((rank - below) / inside if inside else 1.0)
+        lower, below = upper, cumulative
+    return lower
+
+
+def _breakdown(before: str, after: str) -> List[Tuple[HistogramKey, float, float, float]]:
+    """(key, count, mean, p95) of what each histogram recorded between the two scrapes."""
+    start, end = _histograms(before), _histograms(after)
+    rows = []
+    for key, data in sorted(end.items()):
+        previous = start.get(key, {"buckets": {}, "count": 0.0, "sum": 0.0})
+        count = data["count"] - previous["count"]
+        if count <= 0:
+            continue
+        buckets = {le: value - previous["buckets"].get(le, 0.0) for le, value in data["buckets"].items()}
+        rows.append((key, count, (data["sum"] - previous["sum"]) / count, _quantile(buckets, count, 0.95)))
+    return rows
+
+
+class LoadTest:
+    def __init__(self, url: str, scenarios: List[Dict[str, Any]], unique: bool, timeout: float):
+        self.url = url.rstrip("/")
+        self.scenarios = scenarios
+        self.unique = unique
+        self.timeout = timeout
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._sent = 0
+
+    def _next_request(self) -> Tuple[str, bytes, str]:
+        scenario = self.scenarios[self._sent % len(self.scenarios)]
+        self._sent += 1
+        audio = scenario["audio"]
+        if audio is None:
+            transcript = scenario["transcript"]
+            audio = fixture_audio(f"{transcript} №{self._sent}" if self.unique else transcript)
+        return scenario["endpoint"], audio, scenario["content_type"]
+
+    async def _send(self, client: httpx.AsyncClient) -> None:
+        endpoint, audio, content_type = self._next_request()
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{self.url}{endpoint}", files={"audio": ("audio", audio, content_type)})
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        self.statuses[endpoint][status] += 1
+
+    async def _worker(self, client: httpx.AsyncClient, deadline: Optional[float], budget: List[int]) -> None:
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            if deadline is None:
+                if budget[0] <= 0:
+                    return
+                budget[0] -= 1
+            await self._send(client)
+
+    async def run(self, concurrency: int, duration: Optional[float], requests: Optional[int]) -> float:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+            deadline = time.monotonic() + duration if requests is None else None
+            budget = [requests or 0]
+            started = time.perf_counter()
+            await asyncio.gather(*(self._worker(client, deadline, budget) for _ in range(concurrency)))
+            return time.perf_counter() - started
+
+
+async def _scrape(url: str) -> Optional[str]:
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(f"{url.rstrip('/')}/metrics")
+            response.raise_for_status()
+            return response.text
+    except httpx.HTTPError as e:
+        print(f"Could not scrape /metrics, no stage breakdown: {e}")
+        return None
+
+
+def _report(test: LoadTest, elapsed: float, before: Optional[str], after: Optional[str]) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"elapsed_seconds": elapsed, "endpoints": {}, "breakdown": []}
+    print(f"\n{'endpoint':<24}{'requests':>9}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for endpoint, latencies in sorted(test.latencies.items()):
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        statuses = dict(test.statuses[endpoint])
+        report["endpoints"][endpoint] = {"requests": len(latencies), "rps": len(latencies) / elapsed,
+                                         "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "statuses": statuses}
+        print(f"{endpoint:<24}{len(latencies):>9}{len(latencies) / elapsed:>8.2f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}  {statuses}")
+
+    if before is not None and after is not None:
+        print(f"\n{'endpoint':<22}{'stage / upstream':<24}{'count':>7}{'mean ms':>9}{'p95 ms':>9}")
+        for (metric, endpoint, name), count, mean, p95 in _breakdown(before, after):
+            kind = "stage" if metric == "voice_route_stage_seconds" else "upstream"
+            report["breakdown"].append({"endpoint": endpoint, kind: name, "count": count,
+                                        "mean_ms": mean * 1000, "p95_ms": p95 * 1000})
+            label = name if kind == "stage" else f"{name} (upstream)"
+            print(f"{endpoint:<22}{label:<24}{count:>7.0f}{mean * 1000:>9.1f}{p95 * 1000:>9.1f}")
+    return report
+
+
+async def _run(args: argparse.Namespace) -> None:
+    scenarios = _load_requests(args.endpoint, Path(args.audio_dir) if args.audio_dir else None)
+    test = LoadTest(args.url, scenarios, args.unique, args.timeout)
+    if args.warmup:
+        await test.run(min(args.concurrency, args.warmup), None, args.warmup)
+        test.latencies.clear()
+        test.statuses.clear()
+
+    before = await _scrape(args.url)
+    duration = None if args.requests else args.duration
+    print(f"{len(scenarios)} fixtures, concurrency {args.concurrency}, "
+          + (f"{args.requests} requests" if args.requests else f"{duration:.0f} s"))
+    elapsed = await test.run(args.concurrency, duration, args.requests)
+    after = await _scrape(args.url) if before is not None else None
+
+    report = _report(test, elapsed, before, after)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, help="Number of requests to send")
+    parser.add_argument("--warmup", type=int, default=0, help="Requests to send before measuring")
+    parser.add_argument("--endpoint", choices=["/api/stt-route", "/api/stt-route-tourist"],
+                        help="Only this endpoint (default: both)")
+    parser.add_argument("--audio-dir", help="Directory with recorded audio named after the fixture ids")
+    parser.add_argument("--unique", action="store_true", help="Make every transcript unique (no crew cache hits)")
+    parser.add_argument("--timeout", type=float, default=120, help="Client timeout per request, seconds")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Check and timing of nearest-POI lookups in the local POI index.
+
+Builds an index of random POIs over a city-sized area in a temporary directory, then
+answers "nearest POI of the category within the radius" for random points and compares
+every answer with a brute-force search over all POIs of the category. Reports the mean
+lookup time; a Places API request for the same answer takes tens to hundreds of ms.
+
+Run from the repository root:
+    python -m backend.benchmarks.poi_index [pois_per_category] [lookups]
+"""
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from backend.app.repository.poi_index import PoiIndex, build_poi_index
+from backend.app.services.geometry import EARTH_RADIUS_M
+
+CATEGORIES = ["кафе", "аптека", "банк", "цветы"]
+# Around Perm
+MIN_LON, MIN_LAT, MAX_LON, MAX_LAT = 56.0, 57.9, 56.5, 58.15
+RADIUS = 2000
+
+
+def _distances(point: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Great-circle distances in meters from one [lon, lat] point to many."""
+    lon1, lat1 = np.radians(point)
+    lon2, lat2 = np.radians(points[:, 0]), np.radians(points[:, 1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def main(pois_per_category: int, lookups: int) -> None:
+    rng = np.random.default_rng(0)
+    pois = {c: np.column_stack((rng.uniform(MIN_LON, MAX_LON, pois_per_category),
+                                rng.uniform(MIN_LAT, MAX_LAT, pois_per_category))) for c in CATEGORIES}
+    queries = np.column_stack((rng.uniform(MIN_LON, MAX_LON, lookups), rng.uniform(MIN_LAT, MAX_LAT, lookups)))
+    categories = rng.choice(CATEGORIES, lookups)
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_poi_index(((c, lon, lat) for c, points in pois.items() for lon, lat in points), directory)
+        index = PoiIndex(directory)
+
+        started = time.perf_counter()
+        answers = [index.nearest(c, q.tolist(), RADIUS) for c, q in zip(categories, queries)]
+        elapsed = time.perf_counter() - started
+
+        mismatches = 0
+        for category, query, answer in zip(categories, queries, answers):
+            distances = _distances(query, pois[category])
+            closest = int(np.argmin(distances))
+            expected = pois[category][closest].tolist() if distances[closest] <= RADIUS else None
+            mismatches += (answer[0] if answer else None) != expected
+
+    found = sum(answer is not None for answer in answers)
+    print(f"{len(index)} POIs, {lookups} lookups, {found} found within {RADIUS} m, {mismatches} mismatches")
+    print(f"mean lookup: {elapsed / lookups * 1e6:.1f} µs")
+    if mismatches:
+        raise SystemExit("The index disagrees with the brute-force search")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 10_000)
@@ -0,0 +1,71 @@
+"""
+Check and timing of chunked routing over the local Routing API stub.
+
+Routes itineraries longer than MAX_ROUTE_POINTS through the stub (served in-process, so
+no port or API key is needed), which rejects more points per request just like the real
+API. Verifies that no request exceeded the limit and that the stitched route traces the
+route a single unlimited request would return, vertex for vertex (ignoring repeated
+junction vertices). Reports the number of requests and the wall time with the stub
+answering after a fixed delay.
+
+Run from the repository root:
+    python -m backend.benchmarks.route_chunking [stops] [latency_ms]
+"""
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from backend.app.services import routing
+from backend.app.services.geometry import parse_linestrings
+from backend.benchmarks import routing_stub
+
+
+def _without_repeats(route: np.ndarray) -> np.ndarray:
+    """Drops vertices equal to the previous one (maneuvers repeat the point where they meet)."""
+    return route[np.r_[True, np.any(route[1:] != route[:-1], axis=1)]]
+
+
+def _expected_route(points) -> np.ndarray:
+    maneuvers = routing_stub.route_maneuvers([{"lon": p[0], "lat": p[1]} for p in points])
+    return parse_linestrings(m["outcoming_path"]["geometry"][0]["selection"] for m in maneuvers)
+
+
+async def _run(stops: int, latency_ms: float) -> None:
+    rng = random.Random(0)
+    points = [[56.2 + rng.uniform(0, 0.05), 58.0 + rng.uniform(0, 0.03)] for _ in range(stops)]
+
+    class _SlowTransport(httpx.ASGITransport):
+        async def handle_async_request(self, request):
+            await asyncio.sleep(latency_ms / 1000)
+            return await super().handle_async_request(request)
+
+    routing.settings.routing_api_url = "http://stub/routing"
+    routing.settings.route_segment_cache_enabled = False
+    async with httpx.AsyncClient(transport=_SlowTransport(app=routing_stub.app)) as client:
+        for concurrency in (1, routing.settings.route_request_concurrency):
+            routing.route_cache.clear()
+            routing.settings.route_request_concurrency = concurrency
+            before = routing_stub.stats()["requests"]
+            start = time.perf_counter()
+            route = await routing.get_2gis_route(points, client=client)
+            elapsed = (time.perf_counter() - start) * 1000
+            requests = routing_stub.stats()["requests"] - before
+            print(f"  concurrency {concurrency}: {requests} requests, {elapsed:7.1f} ms, {len(route)} route points")
+
+    expected = _without_repeats(_expected_route(points))
+    assert routing_stub.stats()["max_points"] <= routing_stub.MAX_POINTS, "a request exceeded the point limit"
+    assert np.array_equal(_without_repeats(route), expected), "stitched route differs"
+    print(f"  stitched route equals the single-request route ({len(expected)} points)")
+
+
+def main(stops: int = 40, latency_ms: float = 50) -> None:
+    print(f"{stops} stops, windows of {routing.MAX_ROUTE_POINTS}, stub latency {latency_ms:.0f} ms")
+    asyncio.run(_run(stops, latency_ms))
+
+
+if __name__ == "__main__":
+    main(*(float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:3])))
@@ -0,0 +1,135 @@
+"""
+Micro-benchmark of route geometry parsing and response serialization.
+
+Builds a synthetic 2GIS Routing API payload shaped like a long walking route (many
+maneuvers, each with a short LINESTRING of 6-decimal coordinates) and compares:
+  * the per-coordinate string parser that get_2gis_route used before with the
+    single-pass NumPy parser;
+  * the default response (a validated RoutePoint per coordinate) with the compact
+    "flat" and "polyline" formats serialized by orjson;
+  * the cost and effect of zoom-aware Douglas–Peucker simplification.
+
+Run from the repository root:
+    python -m backend.benchmarks.route_parsing [route_points] [iterations]
+"""
+import math
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+import orjson
+
+from backend.app.api.v1.schemas import SttRouteResponse
+from backend.app.services.geometry import encode_polyline, parse_linestrings, simplify_route, zoom_tolerance
+
+
+def _legacy_parse_linestring(linestring: str) -> List[List[float]]:
+    """The parser get_2gis_route used before (one float() per coordinate)."""
+    points_str = linestring.replace("LINESTRING(", "").replace(")", "")
+    if not points_str:
+        return []
+    return [
+        [float(coord) for coord in point.strip().split()]
+        for point in points_str.split(',')
+    ]
+
+
+def make_payload(route_points: int, points_per_maneuver: int = 25, seed: int = 0) -> dict:
+    """
+    A Routing API response whose maneuvers add up to about `route_points` coordinates.
+    Each maneuver follows one street: a straight run of points a few meters apart with
+    GPS-like jitter, turning at the next maneuver.
+    """
+    rng = random.Random(seed)
+    lon, lat = 56.2294, 58.0105
+    maneuvers = []
+    for _ in range(max(1, route_points // points_per_maneuver)):
+        heading = rng.uniform(0, 2 * math.pi)
+        coords = []
+        for _ in range(points_per_maneuver):
+            lon += 0.00008 * math.cos(heading) + rng.uniform(-0.000003, 0.000003)
+            lat += 0.00004 * math.sin(heading) + rng.uniform(-0.000003, 0.000003)
+            coords.append(f"{lon:.6f} {lat:.6f}")
+        maneuvers.append({"outcoming_path": {"geometry": [{"selection": f"LINESTRING({', '.join(coords)})"}]}})
+    return {"type": "result", "result": [{"maneuvers": maneuvers}]}
+
+
+def _selections(payload: dict) -> List[str]:
+    return [
+        part["selection"]
+        for maneuver in payload["result"][0]["maneuvers"]
+        for part in maneuver["outcoming_path"]["geometry"]
+    ]
+
+
+def _measure(fn, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list) -> float:
+    mean = statistics.mean(timings)
+    p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+    print(f"  {label:<28} mean {mean:8.2f} ms   p95 {p95:8.2f} ms")
+    return mean
+
+
+def main(route_points: int = 20000, iterations: int = 30) -> None:
+    selections = _selections(make_payload(route_points))
+    coords = parse_linestrings(selections)
+    print(f"{len(selections)} maneuvers, {len(coords)} route points, {iterations} iterations")
+
+    print("Parsing:")
+
+    def legacy_parse():
+        all_coords = []
+        for selection in selections:
+            all_coords.extend(_legacy_parse_linestring(selection))
+        return all_coords
+
+    legacy = _report("per-coordinate (legacy)", _measure(legacy_parse, iterations))
+    vectorized = _report("NumPy single pass", _measure(lambda: parse_linestrings(selections), iterations))
+    print(f"  speedup x{legacy / vectorized:.1f}")
+
+    print("Response serialization:")
+    pivots = [{"coord": c} for c in coords[::len(coords) // 5].tolist()]
+
+    def points_response():
+        response = SttRouteResponse(
+            route_type="pedestrian",
+            transcript="",
+            route=[{"coord": c} for c in coords.tolist()],
+            pivot_route_points=pivots,
+        )
+        return response.model_dump_json().encode()
+
+    def compact_response(route_format, route):
+        content = {"route_type": "pedestrian", "transcript": "", "route_format": route_format,
+                   "route": route, "pivot_route_points": pivots}
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    points_body = points_response()
+    flat_body = compact_response("flat", coords.ravel())
+    polyline_body = compact_response("polyline", encode_polyline(coords))
+    _report(f"points ({len(points_body) // 1024} KiB)", _measure(points_response, iterations))
+    _report(f"flat ({len(flat_body) // 1024} KiB)", _measure(lambda: compact_response("flat", coords.ravel()), iterations))
+    _report(f"polyline ({len(polyline_body) // 1024} KiB)",
+            _measure(lambda: compact_response("polyline", encode_polyline(coords)), iterations))
+
+    print("Simplification (Douglas–Peucker, 1 px):")
+    latitude = float(coords[:, 1].mean())
+    for zoom in (12, 15, 18):
+        tolerance = zoom_tolerance(zoom, latitude)
+        simplified = simplify_route(coords, tolerance, keep_points=[p["coord"] for p in pivots])
+        _report(f"zoom {zoom} -> {len(simplified)} points",
+                _measure(lambda: simplify_route(coords, tolerance), iterations))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,88 @@
+"""
+Local stand-in for the 2GIS Routing and Distance Matrix APIs.
+
+Answers routing requests with a straight-line route through the requested points and
+matrix requests with straight-line walking times, in the same response shapes as the
+real APIs. Like the real Routing API it rejects more than MAX_POINTS points. It counts the requests and route legs it served (GET /stats), so the route
+caches and the stop ordering can be checked without an API key.
+
+Run from the repository root and point the backend at it:
+    uvicorn backend.benchmarks.routing_stub:app --port 8090
+    ROUTING_API_URL=http://127.0.0.1:8090/routing \
+    DISTANCE_MATRIX_API_URL=http://127.0.0.1:8090/get_dist_matrix STOP_ORDER_MATRIX=api \
+    uvicorn backend.main:app
+"""
+import math
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+
+app = FastAPI(title="2GIS Routing API stub")
+
+_counters = {"requests": 0, "legs": 0, "matrix_requests": 0, "max_points": 0}
+
+MAX_POINTS = 10
+
+# Intermediate points per leg, so the geometry looks like a real polyline
+_POINTS_PER_LEG = 20
+_WALKING_SPEED_MPS = 1.3
+
+
+def _leg_linestring(start: Dict[str, float], end: Dict[str, float]) -> str:
+    coords = []
+    for step in range(_POINTS_PER_LEG + 1):
+        t = step / _POINTS_PER_LEG
+        coords.append(f"{start['lon'] + (end['lon'] - start['lon']) * t} {start['lat'] + (end['lat'] - start['lat']) * t}")
+    return f"LINESTRING({', '.join(coords)})"
+
+
+def route_maneuvers(points: List[Dict[str, float]]) -> List[Dict[str, Any]]:
+    """Maneuvers of the route through all points, without the point limit of the endpoint."""
+    return [
+        {"outcoming_path": {"geometry": [{"selection": _leg_linestring(start, end)}]}}
+        for start, end in zip(points, points[1:])
+    ]
+
+
+@app.post("/routing")
+def route(payload: Dict[str, Any]):
+    points: List[Dict[str, float]] = payload.get("points", [])
+    if len(points) < 2:
+        return {"type": "error", "message": "At least two points are required"}
+    if len(points) > MAX_POINTS:
+        return {"type": "error", "message": f"No more than {MAX_POINTS} points are allowed"}
+
+    _counters["requests"] += 1
+    _counters["legs"] += len(points) - 1
+    _counters["max_points"] = max(_counters["max_points"], len(points))
+    return {"type": "result", "result": [{"maneuvers": route_maneuvers(points)}]}
+
+
+def _distance_m(start: Dict[str, float], end: Dict[str, float]) -> float:
+    lat = math.radians((start["lat"] + end["lat"]) / 2)
+    dx = math.radians(end["lon"] - start["lon"]) * math.cos(lat)
+    dy = math.radians(end["lat"] - start["lat"])
+    return 6_371_008.8 * math.hypot(dx, dy)
+
+
+@app.post("/get_dist_matrix")
+def distance_matrix(payload: Dict[str, Any]):
+    points: List[Dict[str, float]] = payload.get("points", [])
+    _counters["matrix_requests"] += 1
+    routes = []
+    for source in payload.get("sources", []):
+        for target in payload.get("targets", []):
+            distance = _distance_m(points[source], points[target])
+            routes.append({
+                "source_id": source,
+                "target_id": target,
+                "distance": round(distance),
+                "duration": round(distance / _WALKING_SPEED_MPS),
+                "status": "OK",
+            })
+    return {"generation_time": 0, "routes": routes}
+
+
+@app.get("/stats")
+def stats():
+    return dict(_counters)
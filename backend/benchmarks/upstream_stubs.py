@@ -0,0 +1,230 @@
+"""
+Local stand-ins for every upstream of the voice-to-route pipeline, for load tests.
+
+One app serves:
+    GET  /3.0/items                    2GIS Places API (a stable point per query, near `point` if given)
+    POST /routing, /get_dist_matrix    2GIS Routing and Distance Matrix APIs (see routing_stub)
+    POST /speech/v1/stt:recognize      Yandex SpeechKit STT
+    POST /v1/chat/completions          OpenAI-compatible chat completions, as used by the crews
+                                       through litellm and by YandexGPTLLM
+
+The fake LLM answers in the crewAI "Final Answer:" format with the places of the load-test
+fixture (fixtures/load_test.json) whose transcript, or whose places, appear in the prompt.
+The fake STT recognizes the synthetic audio made by `fixture_audio` and answers the first
+fixture's transcript for anything else (recorded audio is only passed through unchanged
+when it already is OGG (Opus)).
+
+Every upstream answers after a log-normal delay given by its median and p99, and fails a
+share of requests with 503 or by stalling for `stall_ms`. Set them with environment
+variables, e.g.
+    STUB_LATENCY="places=30/120,routing=80/300,stt=300/900,llm=800/2500"   (median/p99 ms)
+    STUB_ERROR_RATE="places=0.02,llm=0.01"
+    STUB_STALL_RATE="routing=0.01" STUB_STALL_MS=15000
+or at runtime with POST /config (same keys as GET /config). GET /stats counts requests.
+
+Run from the repository root and point the backend at it:
+    uvicorn backend.benchmarks.upstream_stubs:app --port 8090
+    PLACES_API_URL=http://127.0.0.1:8090/3.0/items \
+    ROUTING_API_URL=http://127.0.0.1:8090/routing \
+    DISTANCE_MATRIX_API_URL=http://127.0.0.1:8090/get_dist_matrix \
+    YANDEX_STT_URL=http://127.0.0.1:8090/speech/v1/stt:recognize \
+    YANDEX_IAM_TOKEN=stub YANDEX_FOLDER_ID=stub GIS_KEY=stub \
+    YANDEX_LLM_BASE_URL=http://127.0.0.1:8090/v1 \
+    MODEL=openai/stub OPENAI_API_BASE=http://127.0.0.1:8090/v1 OPENAI_API_KEY=stub \
+    uvicorn backend.main:app
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from backend.benchmarks import routing_stub
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures" / "load_test.json"
+
+# Prefix of the synthetic audio: an OGG (Opus) header, so the backend passes it through untranscoded
+_AUDIO_HEADER = b"OggS" + b"\0" * 24 + b"OpusHead"
+_AUDIO_MARKER = b"STUB-TRANSCRIPT:"
+
+UPSTREAMS = ("places", "routing", "distance_matrix", "stt", "llm")
+_PATH_UPSTREAMS = {
+    "/3.0/items": "places",
+    "/routing": "routing",
+    "/get_dist_matrix": "distance_matrix",
+    "/speech/v1/stt:recognize": "stt",
+    "/v1/chat/completions": "llm",
+}
+# Median and p99 latency in ms, roughly what the real APIs answer in
+_DEFAULT_LATENCY = {"places": (40, 150), "routing": (120, 400), "distance_matrix": (80, 250),
+                    "stt": (350, 1000), "llm": (900, 3000)}
+
+# Around the centre of Perm, where most fixtures are
+_CENTER = (56.2294, 58.0105)
+
+
+def load_fixtures() -> List[Dict[str, Any]]:
+    return json.loads(FIXTURES_PATH.read_text(encoding="utf-8"))
+
+
+def fixture_audio(transcript: str) -> bytes:
+    """Synthetic 'recording' the fake STT transcribes back to `transcript`."""
+    return _AUDIO_HEADER + _AUDIO_MARKER + transcript.encode("utf-8")
+
+
+def _parse_spec(value: Optional[str]) -> Dict[str, str]:
+    """'places=30/120,llm=800/2500' -> {'places': '30/120', 'llm': '800/2500'}"""
+    spec = {}
+    for part in (value or "").split(","):
+        if "=" in part:
+            name, setting = part.split("=", 1)
+            spec[name.strip()] = setting.strip()
+    return spec
+
+
+def _initial_config() -> Dict[str, Dict[str, float]]:
+    latency, errors, stalls = (_parse_spec(os.getenv(name)) for name in
+                               ("STUB_LATENCY", "STUB_ERROR_RATE", "STUB_STALL_RATE"))
+    config = {}
+    for name in UPSTREAMS:
+        median, p99 = _DEFAULT_LATENCY[name]
+        if name in latency:
+            median, p99 = (float(v) for v in latency[name].split("/"))
+        config[name] = {
+            "median_ms": float(median),
+            "p99_ms": float(p99),
+            "error_rate": float(errors.get(name, 0)),
+            "stall_rate": float(stalls.get(name, 0)),
+            "stall_ms": float(os.getenv("STUB_STALL_MS", 15000)),
+        }
+    return config
+
+
+_config = _initial_config()
+_counters = {name: {"requests": 0, "errors": 0, "stalls": 0} for name in UPSTREAMS}
+_fixtures = load_fixtures()
+
+app = FastAPI(title="Voice route upstream stubs")
+
+
+def _delay_seconds(median_ms: float, p99_ms: float) -> float:
+    """Log-normal delay with the given median and 99th percentile."""
+    if median_ms <= 0:
+        return 0.0
+    sigma = math.log(max(p99_ms, median_ms) / median_ms) / 2.326
+    return random.lognormvariate(math.log(median_ms), sigma) / 1000
+
+
+@app.middleware("http")
+async def inject_latency_and_errors(request: Request, call_next):
+    name = _PATH_UPSTREAMS.get(request.url.path)
+    if name is None:
+        return await call_next(request)
+    config, counters = _config[name], _counters[name]
+    counters["requests"] += 1
+    roll = random.random()
+    if roll < config["stall_rate"]:
+        counters["stalls"] += 1
+        await asyncio.sleep(config["stall_ms"] / 1000)
+    else:
+        await asyncio.sleep(_delay_seconds(config["median_ms"], config["p99_ms"]))
+    if roll >= 1 - config["error_rate"]:
+        counters["errors"] += 1
+        return Response(json.dumps({"message": "stub error"}), status_code=503, media_type="application/json")
+    return await call_next(request)
+
+
+def _point(query: str, near: Optional[str]) -> Dict[str, float]:
+    """A stable point for the query within ~3 km of the centre (or ~500 m of `near`)."""
+    digest = hashlib.sha1(query.encode("utf-8")).digest()
+    dx, dy = (int.from_bytes(digest[i:i + 4], "big") / 2 ** 32 - 0.5 for i in (0, 4))
+    if near:
+        lon, lat = (float(v) for v in near.split(","))
+        return {"lon": lon + dx * 0.015, "lat": lat + dy * 0.009}
+    return {"lon": _CENTER[0] + dx * 0.09, "lat": _CENTER[1] + dy * 0.055}
+
+
+@app.get("/3.0/items")
+def places(q: str, point: Optional[str] = None):
+    return {
+        "meta": {"code": 200},
+        "result": {"total": 1, "items": [{"name": q, "point": _point(q, point)}]},
+    }
+
+
+app.add_api_route("/routing", routing_stub.route, methods=["POST"])
+app.add_api_route("/get_dist_matrix", routing_stub.distance_matrix, methods=["POST"])
+
+
+@app.post("/speech/v1/stt:recognize")
+async def recognize(request: Request):
+    audio = await request.body()
+    _, marker, transcript = audio.partition(_AUDIO_MARKER)
+    if not marker:
+        return {"result": _fixtures[0]["transcript"]}
+    return {"result": transcript.decode("utf-8")}
+
+
+def _fixture_for(prompt: str) -> Dict[str, Any]:
+    for fixture in _fixtures:
+        if fixture["transcript"] in prompt:
+            return fixture
+    for fixture in _fixtures:
+        if all(name in prompt for name in fixture["places"]):
+            return fixture
+    return _fixtures[0]
+
+
+def _answer(prompt: str) -> Dict[str, Any]:
+    """The JSON the task in the prompt asks for: extracted places or an itinerary."""
+    fixture = _fixture_for(prompt)
+    if "Extract ALL the places" in prompt:
+        return {"places": fixture["places"], "current_location": fixture["city"]}
+    return {
+        "current_location": fixture["city"],
+        "locations": [{"name": name, "time": time_} for name, time_ in fixture["places"].items()],
+    }
+
+
+@app.post("/v1/chat/completions")
+def chat_completions(payload: Dict[str, Any]):
+    prompt = "\n".join(str(message.get("content", "")) for message in payload.get("messages", []))
+    content = ("Thought: I now can give a great answer\nFinal Answer: "
+               + json.dumps(_answer(prompt), ensure_ascii=False))
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+@app.get("/config")
+def get_config():
+    return _config
+
+
+@app.post("/config")
+def update_config(changes: Dict[str, Dict[str, float]]):
+    """Changes the latency or error settings of some upstreams, e.g. {"llm": {"error_rate": 0.1}}."""
+    unknown = set(changes) - set(_config)
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown upstreams: {sorted(unknown)}")
+    for name, settings in changes.items():
+        _config[name].update({key: float(value) for key, value in settings.items() if key in _config[name]})
+    return _config
+
+
+@app.get("/stats")
+def stats():
+    return {**_counters, "routing_stub": routing_stub.stats()}
@@ -0,0 +1,147 @@
+"""
+Builds the local POI index that answers generic place lookups ("кафе", "аптека") without
+the Places API; point POI_INDEX_PATH at the output directory to use it.
+
+The POIs come from file dumps, from a bulk export of the Places API, or both:
+    --dump FILE   JSON lines with a "category" (a search query of PLACE_TYPE_MAPPING) and either
+                  "lon"/"lat" or a Places API "point", e.g.
+                  {"category": "кафе", "name": "...", "point": {"lon": 56.2434, "lat": 58.0104}}
+    --bbox BBOX   every category searched around the nodes of a grid over the area
+                  "min_lon,min_lat,max_lon,max_lat", --step km apart, up to --pages pages each;
+                  --save-dump keeps the exported POIs as a dump for later rebuilds
+
+Run from the repository root:
+    python -m backend.build_poi_index --out data/poi_index --dump pois.jsonl [--dump more.jsonl]
+    python -m backend.build_poi_index --out data/poi_index --bbox 56.1,57.95,56.35,58.07
+        [--step 2] [--pages 5] [--page-size 10] [--save-dump pois.jsonl]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import httpx
+
+from backend.app.repository.poi_index import build_poi_index
+from backend.app.services.geocoding import PLACE_TYPE_MAPPING
+from backend.app.services.resilience import places_upstream
+from backend.app.settings.config import API_Settings
+
+settings = API_Settings()
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = sorted(set(PLACE_TYPE_MAPPING.values()))
+
+
+def read_dump(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as dump:
+        for number, line in enumerate(dump, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            point = record.get("point") or record
+            if "category" not in record or "lon" not in point or "lat" not in point:
+                logger.warning(f"{path}:{number}: no category or coordinates, skipped")
+                continue
+            yield {"category": record["category"], "name": record.get("name"),
+                   "lon": float(point["lon"]), "lat": float(point["lat"])}
+
+
+def grid_nodes(bbox: List[float], step_km: float) -> List[Tuple[float, float]]:
+    """Nodes of a grid with `step_km` spacing covering the bbox."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    lat_step = step_km / 111.32
+    lon_step = step_km / (111.32 * math.cos(math.radians((min_lat + max_lat) / 2)))
+    rows = max(1, math.ceil((max_lat - min_lat) / lat_step))
+    columns = max(1, math.ceil((max_lon - min_lon) / lon_step))
+    return [(min_lon + (c + 0.5) * lon_step, min_lat + (r + 0.5) * lat_step)
+            for r in range(rows) for c in range(columns)]
+
+
+async def _search(client: httpx.AsyncClient, category: str, node: Tuple[float, float],
+                  radius: int, pages: int, page_size: int) -> List[Dict[str, Any]]:
+    found = []
+    for page in range(1, pages + 1):
+        params = {
+            "q": category,
+            "key": settings.gis_key,
+            "fields": "items.point,items.name",
+            "point": f"{node[0]},{node[1]}",
+            "radius": radius,
+            "sort": "distance",
+            "page": page,
+            "page_size": page_size,
+        }
+        response = await places_upstream.call(
+            lambda timeout: client.get(settings.places_api_url, params=params, timeout=timeout), retry=True
+        )
+        if response.status_code == 404:
+            break
+        response.raise_for_status()
+        items = response.json().get("result", {}).get("items", [])
+        found += [{"category": category, "name": item.get("name"), **item["point"]} for item in items if "point" in item]
+        if len(items) < page_size:
+            break
+    return found
+
+
+async def export_places(bbox: List[float], step_km: float, pages: int, page_size: int,
+                        concurrency: int) -> List[Dict[str, Any]]:
+    """Searches every category around every grid node, with radii that cover the whole bbox."""
+    nodes = grid_nodes(bbox, step_km)
+    # Half the diagonal of a grid cell, so the circles around the nodes leave no gaps
+    radius = math.ceil(step_km * 1000 / math.sqrt(2))
+    semaphore = asyncio.Semaphore(concurrency)
+    print(f"Exporting {len(CATEGORIES)} categories around {len(nodes)} grid nodes ({radius} m radius)")
+
+    async with httpx.AsyncClient(timeout=settings.places_timeout) as client:
+        async def search(category: str, node: Tuple[float, float]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return await _search(client, category, node, radius, pages, page_size)
+                except Exception as e:
+                    logger.warning(f"Export of '{category}' around {node} failed: {e}")
+                    return []
+
+        results = await asyncio.gather(*(search(c, n) for c in CATEGORIES for n in nodes))
+    return [record for found in results for record in found]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--out", required=True, help="Directory to write the index to")
+    parser.add_argument("--dump", action="append", default=[], help="JSON lines dump of POIs (repeatable)")
+    parser.add_argument("--bbox", help="Export from the Places API: min_lon,min_lat,max_lon,max_lat")
+    parser.add_argument("--step", type=float, default=2.0, help="Grid spacing of the export, km")
+    parser.add_argument("--pages", type=int, default=5, help="Result pages per category and grid node")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent export requests")
+    parser.add_argument("--save-dump", help="Write the exported POIs to this JSON lines file")
+    parser.add_argument("--cell-size", type=float, default=0.01, help="Grid cell of the index, degrees")
+    args = parser.parse_args()
+    if not args.dump and not args.bbox:
+        parser.error("give at least one --dump or a --bbox to export")
+
+    records = [record for path in args.dump for record in read_dump(path)]
+    if args.bbox:
+        bbox = [float(value) for value in args.bbox.split(",")]
+        exported = asyncio.run(export_places(bbox, args.step, args.pages, args.page_size, args.concurrency))
+        if args.save_dump:
+            Path(args.save_dump).write_text(
+                "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in exported), encoding="utf-8"
+            )
+        records += exported
+
+    counts = build_poi_index(((r["category"], r["lon"], r["lat"]) for r in records), args.out, args.cell_size)
+    for category, count in sorted(counts.items()):
+        print(f"{category:<20}{count:>8}")
+    print(f"{sum(counts.values())} POIs written to {args.out}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
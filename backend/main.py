@@ -5,22 +5,61 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'route_planner_agent', 'src'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'tourist_route_planner', 'src'))
 
+import asyncio
+import logging
 import uvicorn
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from backend.app.api.user_location import router as location_router
 from backend.app.api.v1.stt_route import router as stt_router
 from backend.app.api.v1.stt_route_tourist import router as stt_route_tourist_router
+from backend.app.api.v1.batch_route import router as batch_route_router
+from backend.app.api.v1.jobs import router as jobs_router
+from backend.app.api.v1.stats import router as stats_router
+from backend.app.api.v1.metrics import router as metrics_router
+from backend.app.services.audio import audio_transcoder
+from backend.app.services.crew_executor import crew_executor
+from backend.app.services.crew_factory import crew_factory
+from backend.app.services.http_clients import create_upstream_clients
+from backend.app.services.job_queue import job_queue
+from backend.app.services.metrics import request_metrics
+from backend.app.services.resilience import request_deadline
+from backend.app.services.tracing import SpanKind, annotate, shutdown_tracing, span, trace_id
 from backend.app.settings.config import API_Settings
 
 settings = API_Settings()
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Creates app-scoped resources on startup and releases them on shutdown."""
+    app.state.upstream_clients = create_upstream_clients(settings)
+    try:
+        # Parse the crew configs and create the LLM clients once, before the first request.
+        await asyncio.to_thread(crew_factory.warmup)
+    except Exception as e:
+        logger.error(f"Crew warmup failed, crews will be built on first request: {e}", exc_info=True)
+    job_queue.start(app.state.upstream_clients)
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        await app.state.upstream_clients.aclose()
+        audio_transcoder.shutdown()
+        crew_executor.shutdown()
+        shutdown_tracing()
+
+
 app = FastAPI(title="Voice to Route API",
             docs_url="/api/openapi",
-            openapi_url="/api/openapi.json")
+            openapi_url="/api/openapi.json",
+            lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -31,10 +70,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    """
+    Gives every request an overall deadline that caps the upstream timeouts, the
+    endpoint label its metrics are recorded under and a root span (sampled requests
+    return its trace id in X-Trace-Id).
+    """
+    attributes = {"http.method": request.method, "http.target": request.url.path}
+    with request_deadline(settings.request_deadline), request_metrics(request.url.path), \
+            span(f"{request.method} {request.url.path}", attributes, kind=SpanKind.SERVER):
+        response = await call_next(request)
+        annotate({"http.status_code": response.status_code})
+        current_trace_id = trace_id()
+        if current_trace_id is not None:
+            response.headers["X-Trace-Id"] = current_trace_id
+        return response
+
 # Include API routers
 app.include_router(stt_router, prefix="/api", tags=["STT Route"])
 app.include_router(stt_route_tourist_router, prefix="/api", tags=["STT Route Tourist"])
+app.include_router(batch_route_router, prefix="/api", tags=["Batch Route"])
+app.include_router(jobs_router, prefix="/api", tags=["Jobs"])
 app.include_router(location_router, prefix="/api", tags=["User Location"])
+app.include_router(stats_router, prefix="/api", tags=["Stats"])
+app.include_router(metrics_router, tags=["Metrics"])
 
 
 @app.get("/health", tags=["Health Check"])
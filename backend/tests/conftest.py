@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Add the route_planner_agent to the python path, as backend/main.py does
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'route_planner_agent', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'tourist_route_planner', 'src'))
@@ -0,0 +1,160 @@
+"""
+Leases and retries of the SQLite job store, and the job queue's workers running jobs
+from a temporary database.
+
+Run from the repository root:
+    python -m pytest backend/tests
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from backend.app.repository.job_store import JobStore
+from backend.app.services import job_queue
+from backend.app.services.job_queue import JobQueue
+
+
+def _store(tmp_path, lease: float = 60.0, max_attempts: int = 3) -> JobStore:
+    return JobStore(str(tmp_path / "jobs.sqlite3"), lease=lease, max_attempts=max_attempts, result_ttl=3600)
+
+
+def test_claim_takes_the_oldest_queued_job(tmp_path):
+    store = _store(tmp_path)
+    first = store.create("route", {"n": 1}, audio=b"audio")
+    store.create("route", {"n": 2})
+
+    job = store.claim()
+
+    assert job.id == first and job.status == "running" and job.attempts == 1
+    assert job.params == {"n": 1} and job.audio == b"audio"
+    assert store.claim().params == {"n": 2}
+    assert store.claim() is None
+
+
+def test_finished_job_keeps_result_and_drops_audio(tmp_path):
+    store = _store(tmp_path)
+    job_id = store.create("route", {}, audio=b"audio")
+    assert store.finish(store.claim(), b'{"ok": true}')
+
+    job = store.get(job_id, with_audio=True)
+    assert job.finished and job.status_code == 200
+    assert job.result == b'{"ok": true}' and job.audio is None
+
+
+def test_expired_lease_is_claimed_again_and_the_old_outcome_dropped(tmp_path):
+    store = _store(tmp_path, lease=0.0)
+    job_id = store.create("route", {})
+    stale = store.claim()
+    time.sleep(0.01)
+
+    again = store.claim()
+
+    assert again.id == job_id and again.attempts == 2
+    assert not store.finish(stale, b"stale")
+    assert store.finish(again, b"fresh")
+    assert store.get(job_id).result == b"fresh"
+
+
+def test_job_interrupted_on_every_attempt_fails(tmp_path):
+    store = _store(tmp_path, lease=0.0, max_attempts=2)
+    job_id = store.create("route", {})
+    store.claim()
+    time.sleep(0.01)
+    store.claim()
+    time.sleep(0.01)
+
+    assert store.claim() is None
+    job = store.get(job_id)
+    assert job.status == "failed" and job.status_code == 500
+    assert "interrupted 2 times" in job.detail
+
+
+def test_retry_waits_for_its_backoff(tmp_path):
+    store = _store(tmp_path)
+    job_id = store.create("route", {})
+    assert store.retry(store.claim(), delay=60.0, detail="busy")
+    assert store.claim() is None
+    assert store.get(job_id).status == "queued"
+
+    store.retry(store.get(job_id), delay=0.0, detail="busy")  # not running: a no-op
+    assert store.claim() is None
+
+
+def test_retry_stops_at_max_attempts(tmp_path):
+    store = _store(tmp_path, max_attempts=2)
+    store.create("route", {})
+    assert store.retry(store.claim(), delay=0.0, detail="busy")
+    last = store.claim()
+
+    assert last.attempts == 2
+    assert not store.retry(last, delay=0.0, detail="busy")
+
+
+def test_released_job_does_not_count_the_attempt(tmp_path):
+    store = _store(tmp_path)
+    store.create("route", {})
+    store.release(store.claim())
+
+    assert store.claim().attempts == 1
+
+
+@pytest.fixture
+def _queue_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(job_queue.settings, "job_db_path", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_queue.settings, "job_timeout", 0.5)
+    monkeypatch.setattr(job_queue.settings, "job_lease_margin", 1.0)
+    monkeypatch.setattr(job_queue.settings, "job_max_attempts", 3)
+    monkeypatch.setattr(job_queue.settings, "job_retry_backoff", 0.0)
+
+
+def _run_job(runner):
+    queue = JobQueue(workers=1, poll_interval=0.01)
+    queue.register("test", runner)
+
+    async def run():
+        queue.start(clients=None)
+        try:
+            job_id = await queue.submit("test", {})
+            return await queue.wait(job_id, timeout=5.0)
+        finally:
+            await queue.stop()
+
+    return asyncio.run(run()), queue.stats()
+
+
+def test_transient_failure_is_retried(_queue_settings):
+    attempts = []
+
+    async def runner(job, clients):
+        attempts.append(job.attempts)
+        if job.attempts == 1:
+            raise HTTPException(status_code=503, detail="Crew pool is saturated")
+        return b"{}"
+
+    job, stats = _run_job(runner)
+
+    assert job.status == "done" and job.result == b"{}"
+    assert attempts == [1, 2]
+    assert stats["retried"] == 1 and stats["completed"] == 1
+
+
+def test_persistent_transient_failure_gives_up(_queue_settings):
+    async def runner(job, clients):
+        raise HTTPException(status_code=503, detail="Crew pool is saturated")
+
+    job, stats = _run_job(runner)
+
+    assert job.status == "failed" and job.status_code == 503
+    assert job.attempts == 3 and stats["retried"] == 2
+
+
+def test_job_over_its_timeout_fails_with_504(_queue_settings):
+    async def runner(job, clients):
+        await asyncio.sleep(10)
+
+    job, stats = _run_job(runner)
+
+    assert job.status == "failed" and job.status_code == 504
+    assert stats["failed"] == 1 and stats["retried"] == 0
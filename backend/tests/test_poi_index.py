@@ -0,0 +1,76 @@
+"""
+PoiIndex.nearest against a brute-force search, with points and queries around the
+grid cell boundaries, where a lookup has to visit the neighbouring cells.
+
+Run from the repository root:
+    python -m pytest backend/tests
+"""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from backend.app.repository.poi_index import PoiIndex, build_poi_index
+from backend.app.services.geometry import EARTH_RADIUS_M
+
+CELL_SIZE = 0.01
+
+
+def _distances(points: np.ndarray, point) -> np.ndarray:
+    lon1, lat1 = math.radians(point[0]), math.radians(point[1])
+    lon2, lat2 = np.radians(points[:, 0]), np.radians(points[:, 1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _near_boundary(rng: random.Random, base: float) -> float:
+    """A coordinate within a few meters of a cell boundary near `base`."""
+    return round(base / CELL_SIZE + rng.randint(-3, 3)) * CELL_SIZE + rng.uniform(-5e-5, 5e-5)
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    rng = random.Random(7)
+    records = [("cafe", _near_boundary(rng, 37.6), _near_boundary(rng, 55.75)) for _ in range(400)]
+    records += [("museum", 37.6 + rng.uniform(0, 0.05), 55.75 + rng.uniform(0, 0.05)) for _ in range(50)]
+    path = tmp_path_factory.mktemp("poi_index")
+    counts = build_poi_index(records, str(path), cell_size=CELL_SIZE)
+    assert counts == {"cafe": 400, "museum": 50}
+    return PoiIndex(str(path)), np.asarray([r[1:] for r in records if r[0] == "cafe"])
+
+
+@pytest.mark.parametrize("radius", [30.0, 300.0, 1500.0])
+def test_nearest_matches_brute_force_across_cell_boundaries(index, radius):
+    poi_index, cafes = index
+    rng = random.Random(int(radius))
+    for _ in range(200):
+        point = [_near_boundary(rng, 37.6), _near_boundary(rng, 55.75)]
+        distances = _distances(cafes, point)
+        found = poi_index.nearest("cafe", point, radius)
+
+        if distances.min() > radius:
+            assert found is None
+            continue
+        coords, distance = found
+        assert distance == pytest.approx(distances.min(), abs=1e-6)
+        assert coords == cafes[int(np.argmin(distances))].tolist()
+
+
+def test_query_exactly_on_a_cell_corner(index):
+    poi_index, _ = index
+    corner = [37.6, 55.75]
+    neighbours = [[37.6 - 1e-5, 55.75 - 1e-5], [37.6 + 2e-5, 55.75 + 2e-5]]
+    path = poi_index.path + "_corner"
+    build_poi_index([("atm", lon, lat) for lon, lat in neighbours], path, cell_size=CELL_SIZE)
+
+    coords, distance = PoiIndex(path).nearest("atm", corner, 10.0)
+
+    assert coords == neighbours[0] and distance < 2
+
+
+def test_unknown_category_and_empty_radius(index):
+    poi_index, _ = index
+    assert "cafe" in poi_index and "bank" not in poi_index
+    assert poi_index.nearest("bank", [37.6, 55.75], 1000.0) is None
+    assert poi_index.nearest("museum", [30.3, 59.9], 1000.0) is None
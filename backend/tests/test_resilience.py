@@ -0,0 +1,170 @@
+"""
+The circuit breaker and the retries and hedging of Upstream.call, against fake senders.
+
+Run from the repository root:
+    python -m pytest backend/tests
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.app.services import resilience
+from backend.app.services.resilience import CircuitBreaker, Upstream, UpstreamUnavailable
+
+
+@pytest.fixture(autouse=True)
+def _fast_backoff(monkeypatch):
+    monkeypatch.setattr(resilience.settings, "upstream_backoff_base", 0.001)
+    monkeypatch.setattr(resilience.settings, "upstream_backoff_max", 0.001)
+
+
+def _upstream(retries: int = 0, threshold: int = 2, reset_timeout: float = 60.0, hedge: bool = False) -> Upstream:
+    upstream = Upstream("test", timeout=1.0, retries=retries, hedge=hedge)
+    upstream.breaker = CircuitBreaker(threshold, reset_timeout)
+    return upstream
+
+
+def _sender(*outcomes):
+    """A send that answers with the given statuses (or raises the given exceptions) in turn."""
+    outcomes = list(outcomes)
+    calls = []
+
+    async def send(timeout: float) -> httpx.Response:
+        calls.append(timeout)
+        outcome = outcomes.pop(0) if len(outcomes) > 1 else outcomes[0]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return httpx.Response(outcome)
+
+    return send, calls
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 1
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 2
+    assert not breaker.allow()
+
+
+def test_released_probe_lets_another_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.allow()
+
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_call_opens_breaker_and_rejects_without_sending():
+    upstream = _upstream(threshold=2)
+    send, calls = _sender(httpx.ConnectError("refused"))
+
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailable):
+            asyncio.run(upstream.call(send))
+    with pytest.raises(UpstreamUnavailable) as error:
+        asyncio.run(upstream.call(send))
+
+    assert len(calls) == 2
+    assert "circuit breaker is open" in error.value.detail
+    assert upstream.stats()["breaker"] == "open" and upstream.stats()["rejected"] == 1
+
+
+def test_deliberate_client_errors_do_not_count_as_failures():
+    upstream = _upstream(threshold=1)
+    send, _ = _sender(404)
+
+    response = asyncio.run(upstream.call(send))
+
+    assert response.status_code == 404
+    assert upstream.breaker.state == "closed"
+
+
+def test_retries_transient_statuses():
+    upstream = _upstream(retries=2, threshold=5)
+    send, calls = _sender(503, 502, 200)
+
+    response = asyncio.run(upstream.call(send, retry=True))
+
+    assert response.status_code == 200 and len(calls) == 3
+    assert upstream.stats()["retries"] == 2 and upstream.breaker.state == "closed"
+
+
+def test_cancelled_probe_releases_the_half_open_breaker():
+    upstream = _upstream(threshold=1, reset_timeout=0.0)
+    upstream.breaker.record_failure()
+
+    async def hang(timeout: float) -> httpx.Response:
+        await asyncio.sleep(10)
+
+    async def cancel_probe():
+        task = asyncio.create_task(upstream.call(hang))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+
+    # Without the release every later call would be rejected as if a probe were still running.
+    send, _ = _sender(200)
+    assert asyncio.run(upstream.call(send)).status_code == 200
+    assert upstream.breaker.state == "closed"
+
+
+def test_hedged_request_wins_over_a_slow_first(monkeypatch):
+    monkeypatch.setattr(resilience.settings, "hedge_min_samples", 3)
+    monkeypatch.setattr(resilience.settings, "hedge_min_delay", 0.01)
+    upstream = _upstream(hedge=True)
+    fast, _ = _sender(200)
+    for _ in range(3):
+        asyncio.run(upstream.call(fast, hedge=True))
+
+    sent = []
+
+    async def slow_then_fast(timeout: float) -> httpx.Response:
+        sent.append(timeout)
+        if len(sent) == 1:
+            await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    started = time.perf_counter()
+    response = asyncio.run(upstream.call(slow_then_fast, hedge=True))
+
+    assert response.status_code == 200 and len(sent) == 2
+    assert time.perf_counter() - started < 1
+    assert upstream.stats()["hedges"] == 1 and upstream.stats()["hedge_wins"] == 1
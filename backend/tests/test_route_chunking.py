@@ -0,0 +1,118 @@
+"""
+Chunked routing against the local Routing API stub, served in-process, which rejects
+more than MAX_POINTS points per request like the real API.
+
+Run from the repository root:
+    python -m pytest backend/tests
+"""
+import asyncio
+import json
+import random
+from typing import List
+
+import httpx
+import numpy as np
+import pytest
+
+from backend.app.services import routing
+from backend.app.services.geometry import parse_linestrings
+from backend.benchmarks import routing_stub
+
+
+class _RecordingTransport(httpx.ASGITransport):
+    """Serves the stub and remembers the number of points of every routing request."""
+
+    def __init__(self):
+        super().__init__(app=routing_stub.app)
+        self.requests: List[int] = []
+
+    async def handle_async_request(self, request):
+        self.requests.append(len(json.loads(request.content)["points"]))
+        return await super().handle_async_request(request)
+
+
+@pytest.fixture(autouse=True)
+def _stub_routing(monkeypatch):
+    monkeypatch.setattr(routing.settings, "routing_api_url", "http://stub/routing")
+    monkeypatch.setattr(routing.settings, "route_chunking_enabled", True)
+    monkeypatch.setattr(routing.settings, "route_segment_cache_enabled", False)
+    routing.route_cache.clear()
+    yield
+    routing.route_cache.clear()
+
+
+def _points(count: int) -> List[List[float]]:
+    rng = random.Random(count)
+    return [[56.2 + rng.uniform(0, 0.05), 58.0 + rng.uniform(0, 0.03)] for _ in range(count)]
+
+
+def _without_repeats(route: np.ndarray) -> np.ndarray:
+    """Drops vertices equal to the previous one (maneuvers repeat the point where they meet)."""
+    return route[np.r_[True, np.any(route[1:] != route[:-1], axis=1)]]
+
+
+def _single_request_route(points: List[List[float]]) -> np.ndarray:
+    """The route one request without the point limit would return."""
+    maneuvers = routing_stub.route_maneuvers([{"lon": p[0], "lat": p[1]} for p in points])
+    return parse_linestrings(m["outcoming_path"]["geometry"][0]["selection"] for m in maneuvers)
+
+
+def _route(points: List[List[float]]):
+    transport = _RecordingTransport()
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await routing.get_2gis_route(points, client=client)
+
+    return asyncio.run(run()), transport.requests
+
+
+@pytest.mark.parametrize("count", range(2, 40))
+def test_windows_overlap_and_cover_all_points(count):
+    windows = routing.route_windows(count)
+
+    assert all(2 <= len(window) <= routing.MAX_ROUTE_POINTS for window in windows)
+    assert windows[0][0] == 0 and windows[-1][-1] == count - 1
+    for previous, window in zip(windows, windows[1:]):
+        assert window[0] == previous[-1]
+    assert [i for window in windows for i in window[:-1]] + [count - 1] == list(range(count))
+
+
+def test_short_route_is_one_request():
+    points = _points(routing.MAX_ROUTE_POINTS)
+    route, requests = _route(points)
+
+    assert requests == [routing.MAX_ROUTE_POINTS]
+    assert np.array_equal(_without_repeats(route), _without_repeats(_single_request_route(points)))
+
+
+@pytest.mark.parametrize("count", [11, 19, 20, 37])
+def test_long_route_is_stitched_from_windows(count):
+    points = _points(count)
+    route, requests = _route(points)
+
+    assert len(requests) == len(routing.route_windows(count))
+    assert max(requests) <= routing_stub.MAX_POINTS
+    assert np.array_equal(_without_repeats(route), _without_repeats(_single_request_route(points)))
+
+
+def test_windows_are_cached_separately():
+    points = _points(25)
+    _route(points)
+
+    # Only the window with the changed stop is requested again.
+    points[-1] = [56.3, 58.1]
+    route, requests = _route(points)
+
+    assert len(requests) == 1
+    assert np.array_equal(_without_repeats(route), _without_repeats(_single_request_route(points)))
+
+
+def test_long_route_is_truncated_without_chunking(monkeypatch):
+    monkeypatch.setattr(routing.settings, "route_chunking_enabled", False)
+    points = _points(15)
+    route, requests = _route(points)
+
+    assert requests == [routing.MAX_ROUTE_POINTS]
+    expected = _single_request_route(points[:routing.MAX_ROUTE_POINTS])
+    assert np.array_equal(_without_repeats(route), _without_repeats(expected))
@@ -0,0 +1,94 @@
+"""
+Time windows of the deterministic scheduler: parsing the extracted visit times, and
+ordering the stops so that they are reached within their windows.
+
+Run from the repository root:
+    python -m pytest backend/tests
+"""
+import pytest
+
+from backend.app.services import scheduler
+from backend.app.services.scheduler import TimeWindow, build_schedule, parse_time_window
+
+GRACE = 10
+
+# Stops a few minutes' walk apart in the centre of Moscow
+POINTS = [[37.600, 55.750], [37.610, 55.760], [37.620, 55.750], [37.605, 55.755]]
+
+
+@pytest.fixture(autouse=True)
+def _schedule_settings(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "schedule_day_start", "09:00")
+    monkeypatch.setattr(scheduler.settings, "schedule_dwell_minutes", 15)
+    monkeypatch.setattr(scheduler.settings, "schedule_appointment_grace_minutes", GRACE)
+
+
+@pytest.mark.parametrize("value, window", [
+    ("18:00", TimeWindow(18 * 60, 18 * 60 + GRACE)),
+    ("в 19:30", TimeWindow(19 * 60 + 30, 19 * 60 + 30 + GRACE)),
+    ("с 10 до 12", TimeWindow(10 * 60, 12 * 60)),
+    ("10-12", TimeWindow(10 * 60, 12 * 60)),
+    ("после 18", TimeWindow(earliest=18 * 60)),
+    ("до 12", TimeWindow(latest=12 * 60)),
+    ("к 10", TimeWindow(latest=10 * 60)),
+    ("вечером", TimeWindow(17 * 60, 23 * 60)),
+])
+def test_parse_time_window(value, window):
+    assert parse_time_window(value, GRACE) == (window, True)
+
+
+@pytest.mark.parametrize("value, understood", [(None, True), ("  ", True), ("когда-нибудь", False)])
+def test_parse_time_window_without_constraint(value, understood):
+    assert parse_time_window(value, GRACE) == (None, understood)
+
+
+def test_stops_are_reordered_into_their_windows():
+    schedule = build_schedule(["ужин", "музей", "кафе"], ["в 19:00", "утром", None], POINTS[:3])
+
+    assert schedule.order[0] == 1 and schedule.order[-1] == 0
+    assert schedule.feasible
+    dinner = schedule.stops[-1]
+    assert dinner.start == 19 * 60 and dinner.wait > 0
+
+
+def test_arrival_waits_for_an_earliest_time():
+    schedule = build_schedule(["парк", "театр"], [None, "после 18"], POINTS[:2], start_time=10 * 60)
+
+    theatre = schedule.stops[schedule.order.index(1)]
+    assert theatre.eta < 18 * 60 and theatre.start == 18 * 60
+    assert theatre.as_dict()["wait_minutes"] == round(theatre.wait)
+
+
+def test_latest_times_are_met_from_an_earlier_start():
+    names = ["a", "b", "c", "d"]
+    times = [None, "к 9:30", None, "до 10"]
+
+    schedule = build_schedule(names, times, POINTS)
+
+    assert schedule.feasible
+    assert schedule.start_time <= 9 * 60
+    assert all(stop.lateness < 0.5 for stop in schedule.stops)
+
+
+def test_conflicting_appointments_are_reported_late():
+    far = [[37.60, 55.75], [37.80, 55.85]]
+
+    schedule = build_schedule(["встреча", "обед"], ["12:00", "12:00"], far)
+
+    assert not schedule.feasible
+    late = [stop for stop in schedule.stops if stop.lateness >= 0.5]
+    assert len(late) == 1 and not late[0].as_dict()["on_time"]
+
+
+def test_without_reorder_the_given_order_is_kept():
+    schedule = build_schedule(["ужин", "музей"], ["в 19:00", "утром"], POINTS[:2], reorder=False)
+
+    assert schedule.order == [0, 1]
+    assert not schedule.feasible
+
+
+def test_unparsed_times_are_listed():
+    schedule = build_schedule(["музей"], ["когда удобно"], POINTS[:1])
+
+    assert schedule.unparsed_times == ["музей: когда удобно"]
+    assert schedule.stops[0].window is None
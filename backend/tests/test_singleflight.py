@@ -0,0 +1,132 @@
+"""
+Coalescing of concurrent identical calls, and the crew kickoffs shared through it.
+
+Run from the repository root:
+    python -m pytest backend/tests
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.app.services import crew_results, singleflight
+from backend.app.services.resilience import UpstreamUnavailable, request_deadline
+from backend.app.services.singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def _enabled(monkeypatch):
+    monkeypatch.setattr(singleflight.settings, "singleflight_enabled", True)
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(run()) == [1] * 5
+    assert calls == [1]
+    assert flights.stats() == {"calls": 5, "shared": 4, "extended": 0, "abandoned": 0, "in_flight": 0}
+
+
+def test_exception_is_delivered_to_every_caller():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(flights.do("key", fail), flights.do("key", fail), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError, ValueError]
+
+
+def test_caller_out_of_time_stops_waiting_alone():
+    flights = SingleFlight("test")
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return "done"
+
+    async def impatient():
+        with request_deadline(0.05):
+            return await flights.do("key", slow)
+
+    async def run():
+        return await asyncio.gather(impatient(), flights.do("key", slow), return_exceptions=True)
+
+    timed_out, result = asyncio.run(run())
+    assert isinstance(timed_out, UpstreamUnavailable) and timed_out.status_code == 504
+    assert result == "done"
+
+
+def test_call_is_cancelled_once_nobody_waits():
+    flights = SingleFlight("test")
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        task = asyncio.create_task(flights.do("key", slow))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert cancelled == [1]
+    assert flights.stats()["abandoned"] == 1 and flights.stats()["in_flight"] == 0
+
+
+class _Task:
+    def __init__(self, name):
+        self.name = name
+        self.callback = None
+
+
+class _Crew:
+    """Runs two tasks, the second one long enough for another request to join."""
+
+    def __init__(self):
+        self.tasks = [_Task("extract_task"), _Task("time_sorting_task")]
+
+    def kickoff(self, inputs):
+        for task in self.tasks:
+            task.callback(SimpleNamespace(task=task.name))
+            time.sleep(0.1)
+        return SimpleNamespace(json_dict={"locations": []}, token_usage=None)
+
+
+def test_crew_kickoff_is_shared_up_to_case_and_spacing(monkeypatch):
+    monkeypatch.setattr(crew_results.settings, "crew_cache_enabled", False)
+    created = []
+    monkeypatch.setattr(crew_results.crew_factory, "create", lambda name: created.append(name) or _Crew())
+    seen = {"first": [], "joiner": []}
+
+    async def plan(caller, transcript, delay):
+        await asyncio.sleep(delay)
+        callbacks = {"extract_task": lambda output: seen[caller].append(output.task)}
+        return await crew_results.kickoff_cached("route_planner", transcript, {}, callbacks)
+
+    async def run():
+        return await asyncio.gather(plan("first", "Кремль и  Арбат", 0), plan("joiner", "кремль и арбат ", 0.05))
+
+    first, joined = asyncio.run(run())
+
+    assert len(created) == 1 and first is joined
+    # The joiner came after extract_task finished: its output is replayed to the joiner's callback.
+    assert seen == {"first": ["extract_task"], "joiner": ["extract_task"]}
+    assert crew_results._flight_outputs == {}
@@ -0,0 +1,62 @@
+"""
+Standalone background job worker: runs the jobs submitted with ?async=1 from the SQLite
+queue at JOB_DB_PATH, next to (or instead of) the workers of the API processes. Start as many
+as needed on the host; set JOB_WORKERS=0 for the API processes to leave all jobs to them.
+
+Run from the repository root:
+    JOB_WORKERS=4 python -m backend.worker
+"""
+import sys
+import os
+
+# Add the route_planner_agent to the python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'route_planner_agent', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'tourist_route_planner', 'src'))
+
+import asyncio
+import logging
+import signal
+
+# Importing the endpoints registers the runners of their jobs.
+import backend.app.api.v1.stt_route_tourist  # noqa: F401
+from backend.app.services.audio import audio_transcoder
+from backend.app.services.crew_executor import crew_executor
+from backend.app.services.crew_factory import crew_factory
+from backend.app.services.http_clients import create_upstream_clients
+from backend.app.services.job_queue import job_queue
+from backend.app.services.tracing import shutdown_tracing
+from backend.app.settings.config import API_Settings
+
+settings = API_Settings()
+
+logger = logging.getLogger(__name__)
+
+
+async def run() -> None:
+    if job_queue.workers <= 0:
+        raise SystemExit("JOB_WORKERS must be at least 1 for a standalone worker")
+    clients = create_upstream_clients(settings)
+    try:
+        await asyncio.to_thread(crew_factory.warmup)
+    except Exception as e:
+        logger.error(f"Crew warmup failed, crews will be built on first job: {e}", exc_info=True)
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+
+    job_queue.start(clients)
+    try:
+        await stopped.wait()
+    finally:
+        await job_queue.stop()
+        await clients.aclose()
+        audio_transcoder.shutdown()
+        crew_executor.shutdown()
+        shutdown_tracing()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
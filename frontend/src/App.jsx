@@ -31,6 +31,12 @@ const AppContent = () => {
     const audioChunksRef = useRef([]);
 
     const API_URL = 'http://localhost:8000/api';
+    const WS_URL = API_URL.replace(/^http/, 'ws');
+    // Streaming recognition while the user speaks is opt-in (VITE_STREAMING_STT=true)
+    // until it has been verified against Yandex SpeechKit; the upload flow is the default.
+    const STREAMING_STT_ENABLED = import.meta.env.VITE_STREAMING_STT === 'true';
+    // Containers the backend can pass to streaming recognition while the user speaks
+    const STREAMING_MIME_TYPES = ['audio/ogg;codecs=opus', 'audio/webm;codecs=opus'];
 
     // Get and send user's location on initial load
     useEffect(() => {
@@ -84,14 +90,16 @@ const AppContent = () => {
         setStatus('Запрос доступа к микрофону...');
         try {
             const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+            // Opus in Ogg/WebM is sent to SpeechKit without server-side transcoding.
             const preferredMimeTypes = [
+                'audio/ogg;codecs=opus',
+                'audio/webm;codecs=opus',
                 'audio/wav',
                 'audio/mpeg', // .mp3
                 'audio/ogg',
                 'audio/flac',
                 'audio/mp4', // .m4a
                 'audio/aac',
-                'audio/webm;codecs=opus', // Fallback
                 'audio/webm', // Fallback
             ];
 
@@ -106,6 +114,13 @@ const AppContent = () => {
             mediaRecorderRef.current = new MediaRecorder(stream, { mimeType });
             audioChunksRef.current = [];
 
+            // With streaming enabled the personal planner recognizes speech while it is recorded;
+            // otherwise, for other formats and for the tourist planner the whole recording is uploaded when it stops.
+            if (STREAMING_STT_ENABLED && !isTouristMode && STREAMING_MIME_TYPES.includes(mimeType) && 'WebSocket' in window) {
+                startStreaming(mediaRecorderRef.current);
+                return;
+            }
+
             mediaRecorderRef.current.addEventListener('dataavailable', event => {
                 audioChunksRef.current.push(event.data);
             });
@@ -124,6 +139,69 @@ const AppContent = () => {
         }
     };
 
+    const startStreaming = (recorder) => {
+        const socket = new WebSocket(`${WS_URL}/stt-route/ws`);
+        const routeChunks = [];
+
+        recorder.addEventListener('dataavailable', event => {
+            if (event.data.size > 0 && socket.readyState === WebSocket.OPEN) {
+                socket.send(event.data);
+            }
+        });
+        // 'stop' comes after the last 'dataavailable', so the end marker follows all the audio.
+        recorder.addEventListener('stop', () => {
+            if (socket.readyState === WebSocket.OPEN) {
+                socket.send(JSON.stringify({ type: 'end' }));
+            }
+        });
+
+        socket.addEventListener('open', () => {
+            recorder.start(250);
+            setRecordingState('recording');
+            setStatus('Идёт запись...');
+        });
+        socket.addEventListener('message', message => {
+            const event = JSON.parse(message.data);
+            switch (event.event) {
+                case 'partial_transcript':
+                    setResponse({ transcript: event.transcript });
+                    break;
+                case 'transcript':
+                    setResponse({ transcript: event.transcript });
+                    setStatus('Строим маршрут...');
+                    break;
+                case 'route_chunk':
+                    routeChunks.push(...event.route);
+                    break;
+                case 'complete':
+                    setResponse({
+                        route_type: event.route_type,
+                        transcript: event.transcript,
+                        route: routeChunks,
+                        pivot_route_points: event.pivot_route_points,
+                    });
+                    setStatus('Маршрут построен!');
+                    break;
+                case 'error':
+                    setStatus(`Ошибка: ${event.detail}`);
+                    setResponse({ error: 'Не удалось построить маршрут.' });
+                    break;
+                default:
+                    break;
+            }
+        });
+        socket.addEventListener('close', () => {
+            if (recorder.state === 'recording') {
+                recorder.stop();
+            }
+            recorder.stream.getTracks().forEach(track => track.stop());
+            setRecordingState('idle');
+        });
+        socket.addEventListener('error', () => {
+            setStatus('Ошибка соединения с сервером распознавания.');
+        });
+    };
+
     const stopRecordingAndSend = () => {
         if (mediaRecorderRef.current && mediaRecorderRef.current.state === 'recording') {
             mediaRecorderRef.current.stop();
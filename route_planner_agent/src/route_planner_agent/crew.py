@@ -54,4 +54,13 @@ class RoutePlannerAgent():
             tasks=self.tasks,
             process=Process.sequential,
             verbose=True,
-        )
\ No newline at end of file
+        )
+
+    def extract_crew(self) -> Crew:
+        """Creates a crew with the extraction task only, ordering and timing are left to the backend scheduler"""
+        return Crew(
+            agents=[self.extracter()],
+            tasks=[self.extract_task()],
+            process=Process.sequential,
+            verbose=True,
+        )
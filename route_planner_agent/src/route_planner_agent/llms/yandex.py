@@ -1,8 +1,30 @@
 from crewai import BaseLLM
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 import os
+import threading
 import openai
 
+YANDEX_LLM_BASE_URL = os.getenv("YANDEX_LLM_BASE_URL", "https://llm.api.cloud.yandex.net/v1")
+
+# One OpenAI client (and connection pool) per credentials, shared by all YandexGPTLLM instances.
+_clients: Dict[Tuple[str, str], openai.OpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(api_key: str, folder_id: str) -> openai.OpenAI:
+    """Returns the process-wide OpenAI client for the given Yandex Cloud credentials."""
+    key = (api_key, folder_id)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=YANDEX_LLM_BASE_URL,
+                project=folder_id
+            )
+            _clients[key] = client
+        return client
+
 class YandexGPTLLM(BaseLLM):
     """A custom LLM class for YandexGPT that uses the OpenAI SDK compatibility layer."""
 
@@ -24,11 +46,7 @@ class YandexGPTLLM(BaseLLM):
         if not self.api_key or not self.folder_id:
             raise ValueError("Yandex API key and Folder ID must be provided either as arguments or as environment variables (YANDEX_API_KEY, YANDEX_FOLDER_ID).")
 
-        self.client = openai.OpenAI(
-            api_key=self.api_key,
-            base_url="https://llm.api.cloud.yandex.net/v1",
-            project=self.folder_id
-        )
+        self.client = _get_client(self.api_key, self.folder_id)
 
     def call(
         self,
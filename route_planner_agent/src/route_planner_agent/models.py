@@ -13,4 +13,5 @@ class Itinerary(BaseModel):
 
 class ExtractedPlaces(BaseModel):
     """A model to represent extracted places with times."""
-    places: Dict[str, Optional[str]] = Field(description="Dictionary of place names and their times")
\ No newline at end of file
+    places: Dict[str, Optional[str]] = Field(description="Dictionary of place names and their times")
+    current_location: Optional[str] = Field(description="The city mentioned in the text, if any", default=None)
\ No newline at end of file